@@ -0,0 +1,101 @@
+"""Memory and write benchmark for the columnar repository.
+
+Holds the synthetic catalogue of bench_model_memory in a MemoryRepository and in a ColumnarRepository, and reports
+the bytes allocated per movie by each, split into the search index, measured by building the repository's kind of
+index alone, and the rest; then the time a ColumnarRepository takes to answer a read after appending one movie. Run
+from the repository root with:
+
+    python -m benchmarks.bench_columnar_memory [number_of_movies]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from movie.adapters.columnar_repository import ColumnarRepository
+from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.search_index import SearchIndex, GrowingSearchIndex
+
+from benchmarks.bench_model_memory import build_catalogue
+
+
+def memory_repository(number_of_movies: int):
+    repo = MemoryRepository()
+    movies, genres, actors, directors = build_catalogue(number_of_movies)
+    for movie in movies:
+        repo.add_movie(movie)
+    for genre in genres:
+        repo.add_genre(genre)
+    for actor in actors:
+        repo.add_actor(actor)
+    for director in directors:
+        repo.add_director(director)
+    repo.catalogue_loaded()
+    return repo
+
+
+def columnar_repository(number_of_movies: int):
+    repo = ColumnarRepository()
+    number_of_actors = number_of_movies // 4
+    number_of_directors = number_of_movies // 10
+    for rank in range(1, number_of_movies + 1):
+        append_movie(repo, rank, number_of_actors, number_of_directors)
+    repo.catalogue_loaded()
+    return repo
+
+
+def search_index(index_class, number_of_movies: int):
+    index = index_class()
+    for rank in range(1, number_of_movies + 1):
+        index.add(rank, *movie_text(rank))
+    if index_class is GrowingSearchIndex:
+        index.compact()
+    return index
+
+
+def movie_text(rank: int):
+    return 'Movie %d' % rank, 'Description of movie %d' % rank
+
+
+def append_movie(repo: ColumnarRepository, rank: int, number_of_actors: int, number_of_directors: int):
+    title, description = movie_text(rank)
+    repo.append_movie(
+        rank, title, description=description, year=1900 + rank % 120,
+        runtime=90 + rank % 60,
+        genres=list(dict.fromkeys(['Genre %d' % (rank % 20), 'Genre %d' % ((rank * 7) % 20)])),
+        actors=['Actor %d' % ((rank * 3 + offset) % number_of_actors) for offset in range(4)],
+        directors=['Director %d' % (rank % number_of_directors)]
+    )
+
+
+def allocated_by(build, *args) -> int:
+    gc.collect()
+    tracemalloc.start()
+    built = build(*args)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return allocated
+
+
+def main(number_of_movies: int = 100000, appends: int = 20):
+    for name, build, index_class in (('memory', memory_repository, SearchIndex),
+                                     ('columnar', columnar_repository, GrowingSearchIndex)):
+        allocated = allocated_by(build, number_of_movies)
+        index_allocated = allocated_by(search_index, index_class, number_of_movies)
+        print('%-8s %d movies: %.1f MiB, %.0f bytes per movie (search index %.0f, the rest %.0f)' % (
+            name, number_of_movies, allocated / 2 ** 20, allocated / number_of_movies,
+            index_allocated / number_of_movies, (allocated - index_allocated) / number_of_movies))
+
+    repo = columnar_repository(number_of_movies)
+    start = time.perf_counter()
+    for rank in range(number_of_movies + 1, number_of_movies + appends + 1):
+        append_movie(repo, rank, number_of_movies // 4, number_of_movies // 10)
+        repo.get_first_movie()
+    elapsed = (time.perf_counter() - start) / appends
+    print('columnar append and read at %d movies: %.2f ms' % (number_of_movies, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
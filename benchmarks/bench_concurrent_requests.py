@@ -0,0 +1,85 @@
+"""Load benchmark for the database repository's per-request session lifecycle.
+
+Starts the application on a temporary SQLite database and has concurrent clients request a genre listing, then
+reports the mean latency per request and the number of failed requests. The same load is run with the session
+lifecycle the application used before, which built a new scoped_session registry at the start of every request, for
+comparison. Run from the repository root with:
+
+    python -m benchmarks.bench_concurrent_requests [number_of_clients] [requests_per_client]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from flask import _app_ctx_stack
+from sqlalchemy.orm import scoped_session
+
+from movie import create_app
+from movie.adapters import repository
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+
+def run_clients(app, number_of_clients: int, requests_per_client: int):
+    failures = list()
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(requests_per_client):
+            try:
+                if test_client.get('/movies_by_genre?genre=Action').status_code != 200:
+                    failures.append(None)
+            except Exception as exception:
+                failures.append(exception)
+
+    threads = [threading.Thread(target=client) for _ in range(number_of_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failures)
+
+
+def use_registry_per_request(app, session_cm):
+    # The previous lifecycle: close the session and build a new registry before every request. Threads share the
+    # one attribute, so a request can lose its session to another thread's reset, and the sessions of replaced
+    # registries are never closed, keeping their pooled connections checked out.
+    session_factory = session_cm._SessionContextManager__session_factory
+
+    @app.before_request
+    def reset_session():
+        session_cm._SessionContextManager__session.close()
+        session_cm._SessionContextManager__session = scoped_session(
+            session_factory, scopefunc=_app_ctx_stack.__ident_func__)
+
+
+def main(number_of_clients: int = 8, requests_per_client: int = 20):
+    with tempfile.TemporaryDirectory() as directory:
+        for lifecycle in ('registry per request', 'long-lived registry'):
+            app = create_app({
+                'TESTING': 'True',
+                'REPOSITORY': 'database',
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'movies.db'),
+                'SQLALCHEMY_ECHO': False,
+                'TEST_DATA_PATH': DATA_PATH,
+                'WTF_CSRF_ENABLED': False,
+                # Fail fast rather than wait for a connection that was never returned to the pool.
+                'SQLALCHEMY_POOL_TIMEOUT': 1
+            })
+            if lifecycle == 'registry per request':
+                use_registry_per_request(app, repository.repo_instance._session_cm)
+
+            run_clients(app, 1, 5)  # Warm up.
+            seconds, failures = run_clients(app, number_of_clients, requests_per_client)
+            number_of_requests = number_of_clients * requests_per_client
+            print('%s: %.2f ms per request, %d of %d requests failed, %d clients' % (
+                lifecycle, seconds / number_of_requests * 1e3 * number_of_clients, failures, number_of_requests,
+                number_of_clients))
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:3]))
@@ -0,0 +1,63 @@
+"""Ingestion benchmark for Data1000Movies-format files.
+
+Writes synthetic movie files of increasing size and streams each through read_movie_batches, reporting the time per
+row and the peak memory allocated while reading. Time per row should stay flat as the files grow, and peak memory
+should depend on the batch size and the number of distinct names, not on the number of rows. Run from the repository
+root with:
+
+    python -m benchmarks.bench_ingest [largest_number_of_rows]
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from movie.adapters.ingest import read_movie_batches
+
+NUMBER_OF_GENRES = 20
+NUMBER_OF_PEOPLE = 5000
+HEADER = ['Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)', 'Rating',
+          'Votes', 'Revenue (Millions)', 'Metascore']
+
+
+def write_movies(filename: str, number_of_rows: int):
+    with open(filename, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(HEADER)
+        for rank in range(1, number_of_rows + 1):
+            writer.writerow([
+                rank, 'Movie %d' % rank,
+                ','.join('Genre %d' % ((rank * k) % NUMBER_OF_GENRES) for k in (1, 3, 7)),
+                'Description of movie %d' % rank,
+                'Person %d' % (rank % NUMBER_OF_PEOPLE),
+                ', '.join('Person %d' % ((rank * k) % NUMBER_OF_PEOPLE) for k in (2, 5, 11, 13)),
+                1900 + rank % 120, 90 + rank % 60, '7.%d' % (rank % 10), rank,
+                'N/A' if rank % 9 == 0 else '%d.5' % (rank % 500), rank % 100
+            ])
+
+
+def main(largest_number_of_rows: int = 1000000):
+    with tempfile.TemporaryDirectory() as directory:
+        number_of_rows = 10000
+        while number_of_rows <= largest_number_of_rows:
+            filename = os.path.join(directory, 'Data1000Movies.csv')
+            write_movies(filename, number_of_rows)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            for batch in read_movie_batches(filename):
+                pass
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print('%d rows: %.2f us per row, peak %.1f MiB' % (
+                number_of_rows, seconds / number_of_rows * 1e6, peak / 2 ** 20))
+            number_of_rows *= 10
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:2]))
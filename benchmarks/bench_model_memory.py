@@ -0,0 +1,71 @@
+"""Memory benchmark for the domain model.
+
+Builds a synthetic catalogue of Movies, linked to Genres, Actors and Directors as the repositories link them, and
+reports the bytes allocated per Movie, with the domain model as it is and as it was at a baseline revision, read
+from git. Run from the repository root with:
+
+    python -m benchmarks.bench_model_memory [number_of_movies [baseline_revision]]
+"""
+
+import gc
+import subprocess
+import sys
+import tracemalloc
+import types
+
+from movie.domain import model
+
+# The domain model before its classes declared __slots__.
+BASELINE_REVISION = '348d763'
+
+
+def model_at(revision: str):
+    source = subprocess.run(['git', 'show', revision + ':movie/domain/model.py'], capture_output=True, check=True,
+                            text=True).stdout
+    module = types.ModuleType('model_at_' + revision)
+    exec(compile(source, revision + ':movie/domain/model.py', 'exec'), module.__dict__)
+    return module
+
+
+def build_catalogue(number_of_movies: int, domain=model):
+    genres = [domain.Genre('Genre %d' % i) for i in range(20)]
+    actors = [domain.Actor('Actor %d' % i) for i in range(number_of_movies // 4)]
+    directors = [domain.Director('Director %d' % i) for i in range(number_of_movies // 10)]
+
+    movies = list()
+    for rank in range(1, number_of_movies + 1):
+        movie = domain.Movie('Movie %d' % rank, 1900 + rank % 120, rank)
+        movie.description = 'Description of movie %d' % rank
+        movie.runtime_minutes = 90 + rank % 60
+
+        # Link both sides directly; make_*_association checks for duplicates with a linear scan.
+        for genre in (genres[rank % 20], genres[(rank * 7) % 20]):
+            movie.add_genre(genre)
+            genre.add_genre_movie(movie)
+        for offset in range(4):
+            actor = actors[(rank * 3 + offset) % len(actors)]
+            movie.add_actor(actor)
+            actor.add_actor_movie(movie)
+        director = directors[rank % len(directors)]
+        movie.add_director(director)
+        director.add_movie(movie)
+        movies.append(movie)
+
+    return movies, genres, actors, directors
+
+
+def main(number_of_movies: int = 100000, baseline_revision: str = BASELINE_REVISION):
+    for name, domain in (('model at ' + baseline_revision, model_at(baseline_revision)), ('current model', model)):
+        gc.collect()
+        tracemalloc.start()
+        catalogue = build_catalogue(number_of_movies, domain)
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del catalogue
+
+        print('%-16s %d movies: %.1f MiB, %.0f bytes per movie' % (
+            name, number_of_movies, allocated / 2 ** 20, allocated / number_of_movies))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, *sys.argv[2:3])
@@ -0,0 +1,84 @@
+"""Listing benchmark for the SQLAlchemy backend.
+
+Fills an in-memory SQLite database with a synthetic catalogue, then times converting a page of Movies to the dicts the
+listing templates use, once by loading mapped Movies with the 'listing' fetch plan and once from column-only MovieRows.
+Reports the cost per Movie of each. Run from the repository root with:
+
+    python -m benchmarks.bench_movie_rows [page_size]
+"""
+
+import sys
+import timeit
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from movie.adapters import orm
+from movie.adapters.database_repository import FETCH_PLANS, select_movie_rows
+from movie.domain.model import Movie
+from movie.news.services import movies_to_dict, movie_rows_to_dict
+
+NUMBER_OF_MOVIES = 1000
+NUMBER_OF_GENRES = 20
+NUMBER_OF_USERS = 50
+
+
+def build_database():
+    engine = create_engine('sqlite://')
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.users.insert(), [
+            {'id': i, 'username': 'user%d' % i, 'password': 'password'} for i in range(1, NUMBER_OF_USERS + 1)
+        ])
+        connection.execute(orm.genres.insert(), [
+            {'id': i, 'name': 'Genre %d' % i} for i in range(1, NUMBER_OF_GENRES + 1)
+        ])
+        connection.execute(orm.movies.insert(), [
+            {'rank': rank, 'title': 'Movie %d' % rank, 'discription': 'Description of movie %d' % rank,
+             'year': 1900 + rank % 120, 'runtime': 90 + rank % 60, 'rating': '7.0', 'votes': rank, 'revenue': 'N/A',
+             'metascore': rank % 100}
+            for rank in range(1, NUMBER_OF_MOVIES + 1)
+        ])
+        connection.execute(orm.movie_genres.insert(), [
+            {'movie_rank': rank, 'genre_id': genre_id}
+            for rank in range(1, NUMBER_OF_MOVIES + 1)
+            for genre_id in {rank % NUMBER_OF_GENRES + 1, (rank * 7) % NUMBER_OF_GENRES + 1}
+        ])
+        connection.execute(orm.reviews.insert(), [
+            {'user_id': (rank + i) % NUMBER_OF_USERS + 1, 'movie_rank': rank, 'review': 'Review %d' % i,
+             'rating': 1 + i, 'timestamp': datetime(2020, 1, 1)}
+            for rank in range(1, NUMBER_OF_MOVIES + 1)
+            for i in range(rank % 4)
+        ])
+    return engine
+
+
+def main(page_size: int = 30):
+    engine = build_database()
+    clear_mappers()
+    orm.map_model_to_tables()
+    session_factory = sessionmaker(bind=engine)
+    ranks = list(range(1, NUMBER_OF_MOVIES + 1, NUMBER_OF_MOVIES // page_size))[:page_size]
+
+    def load_movies():
+        # A fresh session each time, as for a request, so nothing is served from the identity map.
+        session = session_factory()
+        movies = session.query(Movie).options(*FETCH_PLANS['listing']).filter(Movie._Movie__rank.in_(ranks)).all()
+        movies_to_dict(movies)
+        session.close()
+
+    def load_rows():
+        session = session_factory()
+        movie_rows_to_dict(select_movie_rows(session, ranks))
+        session.close()
+
+    for name, load in (('mapped Movies', load_movies), ('MovieRows', load_rows)):
+        repeats, seconds = timeit.Timer(load).autorange()
+        print('%s: %.1f us per movie (page of %d)' % (name, seconds / repeats / page_size * 1e6, page_size))
+
+    clear_mappers()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,97 @@
+"""Memory benchmark for repositories shared by forked worker processes.
+
+Populates a repository from a synthetic catalogue in the parent process, then forks workers that each read every
+movie, its genres and actors, and run a few searches, as serving requests would. Reports the memory each worker has
+written to (Private_Dirty), which is not shared with the parent or the other workers, for a MemoryRepository and for a
+FrozenColumnarRepository. Linux only. Run from the repository root with:
+
+    python -m benchmarks.bench_preload_fork [number_of_movies] [number_of_workers]
+"""
+
+import gc
+import os
+import sys
+import tempfile
+
+from benchmarks.bench_ingest import write_movies
+from movie.adapters import columnar_repository, memory_repository
+from movie.adapters.memory_repository import MemoryRepository
+
+
+def write_data(directory: str, number_of_movies: int):
+    write_movies(os.path.join(directory, 'Data1000Movies.csv'), number_of_movies)
+    with open(os.path.join(directory, 'users.csv'), 'w') as outfile:
+        outfile.write('id,username,password\n1,thorke,cLQ^C#oFXloS\n')
+    with open(os.path.join(directory, 'reviews.csv'), 'w') as outfile:
+        outfile.write('id,author-id,movie-rank,review-text,rating\n1,1,1,Loved it,8\n')
+
+
+def private_dirty_kib() -> int:
+    with open('/proc/self/smaps_rollup') as infile:
+        for line in infile:
+            if line.startswith('Private_Dirty:'):
+                return int(line.split()[1])
+
+
+def serve(repo, number_of_movies: int):
+    for rank in range(1, number_of_movies + 1):
+        movie = repo.get_movie(rank)
+        movie.title
+        list(movie.genres)
+        list(movie.actors)
+    for query in ('movie', 'description of movie 7', 'movie 123'):
+        repo.search_movie_ranks(query)
+
+
+def measure_workers(repo, number_of_movies: int, number_of_workers: int):
+    gc.collect()
+    readers = list()
+    for _ in range(number_of_workers):
+        read_end, write_end = os.pipe()
+        if os.fork() == 0:
+            os.close(read_end)
+            baseline = private_dirty_kib()
+            serve(repo, number_of_movies)
+            gc.collect()
+            os.write(write_end, str(private_dirty_kib() - baseline).encode())
+            os._exit(0)
+        os.close(write_end)
+        readers.append(read_end)
+
+    written = [int(os.read(read_end, 64)) for read_end in readers]
+    for _ in readers:
+        os.wait()
+    return written
+
+
+def populate_memory(directory: str):
+    repo = MemoryRepository()
+    memory_repository.populate(directory, repo)
+    return repo
+
+
+def populate_frozen(directory: str):
+    return columnar_repository.populate_frozen(directory, os.path.join(directory, 'movies.frozen'))
+
+
+def main(number_of_movies: int = 20000, number_of_workers: int = 4):
+    with tempfile.TemporaryDirectory() as directory:
+        write_data(directory, number_of_movies)
+
+        # Write the frozen file beforehand, as an earlier start would have, so that its master only maps it.
+        if os.fork() == 0:
+            populate_frozen(directory)
+            os._exit(0)
+        os.wait()
+
+        for name, populate in (('MemoryRepository', populate_memory), ('FrozenColumnarRepository', populate_frozen)):
+            # Each repository is populated in a process of its own, as a server's master process would.
+            if os.fork() == 0:
+                written = measure_workers(populate(directory), number_of_movies, number_of_workers)
+                print('%s: %.1f MiB written per worker' % (name, sum(written) / len(written) / 1024), flush=True)
+                os._exit(0)
+            os.wait()
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:3]))
@@ -0,0 +1,52 @@
+"""Write benchmark for the SQLAlchemy repository's unit of work.
+
+Adds Users to a temporary SQLite database one at a time, once committing each add and once inside a single unit of
+work, and reports the cost per User of each. Run from the repository root with:
+
+    python -m benchmarks.bench_unit_of_work [number_of_users]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from movie.adapters import orm
+from movie.adapters.database_repository import SqlAlchemyRepository
+from movie.domain.model import User
+
+
+def add_users(repo, first: int, number_of_users: int):
+    for i in range(first, first + number_of_users):
+        repo.add_user(User('user%d' % i, 'password'))
+
+
+def main(number_of_users: int = 1000):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine('sqlite:///' + os.path.join(directory, 'movies.db'))
+        orm.metadata.create_all(engine)
+        clear_mappers()
+        orm.map_model_to_tables()
+        repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+
+        start = time.perf_counter()
+        add_users(repo, 0, number_of_users)
+        seconds = time.perf_counter() - start
+        print('commit per add: %.1f us per user' % (seconds / number_of_users * 1e6))
+
+        start = time.perf_counter()
+        with repo.unit_of_work():
+            add_users(repo, number_of_users, number_of_users)
+        seconds = time.perf_counter() - start
+        print('unit of work: %.1f us per user' % (seconds / number_of_users * 1e6))
+
+        repo.close_session()
+        engine.dispose()
+        clear_mappers()
+
+
+if __name__ == '__main__':
+    main(*(int(argument) for argument in sys.argv[1:2]))
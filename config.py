@@ -20,5 +20,41 @@ class Config:
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pool for server databases, and for SQLite files when SQLITE_POOL is 'queue'.
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(environ.get('SQLALCHEMY_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_TIMEOUT = int(environ.get('SQLALCHEMY_POOL_TIMEOUT', 30))
+    SQLALCHEMY_POOL_PRE_PING = environ.get('SQLALCHEMY_POOL_PRE_PING', 'True') == 'True'
+    SQLALCHEMY_POOL_RECYCLE = int(environ.get('SQLALCHEMY_POOL_RECYCLE', 3600))
+
+    # SQLite files: 'queue' pools connections, 'static' shares one connection and 'null' opens one per session.
+    SQLITE_POOL = environ.get('SQLITE_POOL', 'queue')
+    SQLITE_WAL = environ.get('SQLITE_WAL', 'True') == 'True'
+
     REPOSITORY = environ.get('REPOSITORY')
+    REPOSITORY_SNAPSHOT = environ.get('REPOSITORY_SNAPSHOT')
+    REPOSITORY_FROZEN_FILE = environ.get('REPOSITORY_FROZEN_FILE', 'movie-repository.frozen')
+
+    # Memory repositories: 'eager' loads before serving, 'background' loads while serving, 'on_demand' on first use.
+    REPOSITORY_LOADING = environ.get('REPOSITORY_LOADING', 'eager')
+
+    # Movies kept in the Editor's picks pool, drawn from without using the repository (0 to draw from the repository
+    # every time), and the seconds after which the pool is replaced.
+    EDITORS_PICKS_POOL_SIZE = int(environ.get('EDITORS_PICKS_POOL_SIZE', 0))
+    EDITORS_PICKS_REFRESH_SECONDS = float(environ.get('EDITORS_PICKS_REFRESH_SECONDS', 60))
+
+    # Cache for the services: 'none', 'memory' (per process) or 'disk' (an SQLite file shared by the processes that open
+    # it; put it on /dev/shm to keep it in shared memory). Values expire after CACHE_DEFAULT_TTL seconds (0 never).
+    CACHE_BACKEND = environ.get('CACHE_BACKEND', 'none')
+    CACHE_MAX_BYTES = int(environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_DEFAULT_TTL = float(environ.get('CACHE_DEFAULT_TTL', 300))
+    CACHE_FILE = environ.get('CACHE_FILE', 'movie-cache.sqlite3')
+
+    # Rendered pages kept for anonymous requests to the home and listing pages; 0 disables the page cache.
+    PAGE_CACHE_SIZE = int(environ.get('PAGE_CACHE_SIZE', 0))
+    # Serves the page cache's statistics at /page_cache.
+    PAGE_CACHE_STATS = environ.get('PAGE_CACHE_STATS', 'False') == 'True'
+
+    # Number of processes used to hash passwords when bulk-loading users; 1 hashes in the loading process.
+    PASSWORD_HASH_PROCESSES = int(environ.get('PASSWORD_HASH_PROCESSES', 1))
 
@@ -1,17 +1,20 @@
 """Initialize Flask app."""
 
+import hashlib
 import os
+import uuid
 
 from flask import Flask
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import clear_mappers, sessionmaker
-from sqlalchemy.pool import NullPool
 
 import movie.adapters.repository as repo
-from movie.adapters import memory_repository, database_repository
-from movie.adapters.orm import metadata, map_model_to_tables
+from movie.adapters import memory_repository, database_repository, columnar_repository
+from movie.adapters.cache import create_cache
+from movie.adapters.orm import metadata, map_model_to_tables, upgrade_schema
 from movie.adapters.memory_repository import MemoryRepository, populate
+from movie.utilities.page_cache import PageCache
+from movie.utilities.sampler import MovieSampler
 
 
 def create_app(test_config=None):
@@ -29,21 +32,52 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
 
-    if app.config['REPOSITORY'] == 'memory':
-        # Create the MemoryRepository instance for a memory-based repository.
-        repo.repo_instance = memory_repository.MemoryRepository()
-        memory_repository.populate(data_path, repo.repo_instance)
+    hash_processes = app.config.get('PASSWORD_HASH_PROCESSES')
 
+    if app.config['REPOSITORY'] == 'memory':
+        snapshot = app.config.get('REPOSITORY_SNAPSHOT')
+        if snapshot:
+            # Keep the snapshot in the instance folder rather than wherever the app was started from.
+            os.makedirs(app.instance_path, exist_ok=True)
+            snapshot = os.path.join(app.instance_path, snapshot)
+
+        def load(repository):
+            if snapshot:
+                # Warm start from a snapshot of the populated repository, rebuilding it if the data has changed.
+                memory_repository.populate_from_snapshot(data_path, repository, snapshot, hash_processes)
+            else:
+                memory_repository.populate(data_path, repository, hash_processes)
+
+        loading = app.config.get('REPOSITORY_LOADING', 'eager')
+        if loading == 'eager':
+            # Create the MemoryRepository instance for a memory-based repository.
+            repo.repo_instance = memory_repository.MemoryRepository()
+            load(repo.repo_instance)
+        elif loading in ('background', 'on_demand'):
+            # Serve straight away, loading the repository in a background thread or on its first use.
+            repo.repo_instance = memory_repository.LazyMemoryRepository(load)
+            if loading == 'background':
+                repo.repo_instance.start_loading()
+        else:
+            raise ValueError(f'Unknown REPOSITORY_LOADING {loading!r}')
 
-    elif app.config['REPOSITORY'] == 'database':
+    elif app.config['REPOSITORY'] == 'columnar':
+        # Create the ColumnarRepository instance, which holds movie data in NumPy arrays.
+        repo.repo_instance = columnar_repository.ColumnarRepository()
+        columnar_repository.populate(data_path, repo.repo_instance, hash_processes)
 
-        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    elif app.config['REPOSITORY'] == 'frozen':
+        # Map a file of the movie columns read-only, building it if the data has changed. Run with gunicorn --preload
+        # so that the workers share the mapping; each worker keeps its own users and reviews.
+        repo.repo_instance = columnar_repository.populate_frozen(
+            data_path, app.config['REPOSITORY_FROZEN_FILE'], hash_processes)
 
-        database_echo = app.config['SQLALCHEMY_ECHO']
+    elif app.config['REPOSITORY'] == 'database':
 
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
+        # Create an engine whose connection pool suits the database's dialect.
 
-                                        echo=database_echo)
+        database_engine = database_repository.create_database_engine(app.config)
+        search_index = None
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
 
@@ -63,11 +97,19 @@ def create_app(test_config=None):
 
             map_model_to_tables()
 
-            database_repository.populate(database_engine, data_path)
+            search_index = database_repository.populate(database_engine, data_path, hash_processes)
 
 
         else:
 
+            # Add any tables, columns and indexes that the existing database lacks.
+
+            upgrade_schema(database_engine)
+
+            # Fill the tables the upgrade created, such as the actors and directors, from the movie file.
+
+            database_repository.backfill_entities(database_engine, data_path)
+
             # Solely generate mappings that map domain model classes to the database tables.
 
             map_model_to_tables()
@@ -78,7 +120,24 @@ def create_app(test_config=None):
 
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
 
-        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory, search_index)
+
+    # Draws the random Editor's picks for the sidebar, from a pool redrawn on a timer if EDITORS_PICKS_POOL_SIZE is set.
+    app.extensions['movie_sampler'] = MovieSampler(
+        app.config.get('EDITORS_PICKS_POOL_SIZE', 0), app.config.get('EDITORS_PICKS_REFRESH_SECONDS', 60))
+
+    # Caches what the services read from the repository, if CACHE_BACKEND is set. Processes share entries only if they
+    # read the same data: a database, or a repository loaded by the process they were forked from.
+    if app.config['REPOSITORY'] == 'database':
+        # Hashed, as the URI may hold credentials and the namespace is written into every key of a shared cache.
+        cache_namespace = hashlib.sha1(app.config['SQLALCHEMY_DATABASE_URI'].encode('utf-8')).hexdigest()
+    else:
+        cache_namespace = uuid.uuid4().hex
+    app.extensions['cache'] = create_cache(app.config, cache_namespace)
+
+    # Keeps the rendered pages of anonymous requests if PAGE_CACHE_SIZE is set.
+    if app.config.get('PAGE_CACHE_SIZE', 0) > 0:
+        app.extensions['page_cache'] = PageCache(app.config['PAGE_CACHE_SIZE'])
 
     # Create the MemoryRepository implementation for a memory-based repository.
     #repo.repo_instance = MemoryRepository()
@@ -99,12 +158,8 @@ def create_app(test_config=None):
         from .utilities import utilities
         app.register_blueprint(utilities.utilities_blueprint)
 
-        @app.before_request
-        def before_flask_http_request_function():
-            if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
-                repo.repo_instance.reset_session()
-
-        # Register a tear-down method that will be called after each request has been processed.
+        # Register a tear-down method that will be called after each request has been processed. It removes the
+        # request's session from the repository's session registry; the next request on the thread gets a new one.
         @app.teardown_appcontext
         def shutdown_session(exception=None):
             if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
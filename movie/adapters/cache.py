@@ -0,0 +1,273 @@
+import abc
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class AbstractCache(abc.ABC):
+    # Values are pickled when they are stored, so each get() returns a copy that callers may change, and the bytes a
+    # cache holds can be bounded. Keys and tags are tuples or strings of plain values.
+    #
+    # A value may be stored with tags. Bumping a tag makes every value stored under it stale, for all processes
+    # sharing the cache. Taking tag_versions() before reading the data a value is built from, and storing the value
+    # with those versions, keeps a value built while its tag was bumped from being served.
+
+    def __init__(self, namespace: str = '', default_ttl: float = None):
+        self._namespace = namespace
+        self._default_ttl = default_ttl
+
+    @abc.abstractmethod
+    def get(self, key, default=None):
+        """ Returns the value stored under key, or default if there is none, it has expired or its tags were bumped. """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl: float = None, tags=()):
+        """ Stores value under key for ttl seconds, or the cache's default TTL, or until it is evicted.
+
+        tags is either an iterable of tags, or a dict of the tag versions to store the value with, as returned by
+        tag_versions() before the value was built. Values larger than the cache are not stored.
+        """
+        if not isinstance(tags, dict):
+            tags = self.tag_versions(tags)
+        if ttl is None:
+            ttl = self._default_ttl
+        self._store(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl, tags)
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """ Removes the value stored under key, if any. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def tag_versions(self, tags) -> dict:
+        """ Returns the current version of each of tags. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def bump_tag(self, tag):
+        """ Makes the values stored under tag stale. """
+        raise NotImplementedError
+
+    def get_or_set(self, key, build, ttl: float = None, tags=()):
+        """ Returns the value stored under key, or builds it with build() and stores it. """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            versions = self.tag_versions(tags)
+            value = build()
+            self.set(key, value, ttl, versions)
+        return value
+
+    @abc.abstractmethod
+    def _store(self, key, data: bytes, ttl: float, tags: dict):
+        raise NotImplementedError
+
+
+_MISSING = object()
+
+
+class MemoryCache(AbstractCache):
+    # An LRU cache in the process's memory, holding at most max_bytes of pickled values. It isn't shared, so keys
+    # aren't prefixed with the namespace.
+
+    def __init__(self, max_bytes: int, namespace: str = '', default_ttl: float = None, clock=time.monotonic):
+        super().__init__(namespace, default_ttl)
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Key -> (expiry time or None, tag versions, pickled value), least recently used first.
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._tags = dict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, tags, data = entry
+            if (expires is not None and self._clock() >= expires) or \
+                    any(self._tags.get(tag, 0) != version for tag, version in tags.items()):
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def tag_versions(self, tags) -> dict:
+        with self._lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump_tag(self, tag):
+        with self._lock:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def _store(self, key, data: bytes, ttl: float, tags: dict):
+        if len(data) > self._max_bytes:
+            return
+        expires = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires, tags, data)
+            self._bytes += len(data)
+            while self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+
+
+class DiskCache(AbstractCache):
+    # A cache in an SQLite file, shared by every process that opens the same file, e.g. the workers of a server.
+    # Putting the file on a memory file system such as /dev/shm keeps it off the disk. Entries are evicted least
+    # recently used first once the file holds more than max_bytes of values; the time an entry was last used is only
+    # written when it is a second old, so that most reads don't write.
+
+    ACCESS_RESOLUTION = 1.0
+
+    def __init__(self, filename: str, max_bytes: int, namespace: str = '', default_ttl: float = None,
+                 clock=time.time):
+        super().__init__(namespace, default_ttl)
+        self._filename = filename
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._local = threading.local()
+
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, expires REAL, tags TEXT NOT NULL, accessed REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)')
+            connection.execute('CREATE TABLE IF NOT EXISTS tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            # The total size of the values, kept up to date by each write rather than summed.
+            connection.execute('CREATE TABLE IF NOT EXISTS size (bytes INTEGER NOT NULL)')
+            if connection.execute('SELECT COUNT(*) FROM size').fetchone()[0] == 0:
+                connection.execute('INSERT INTO size VALUES (0)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # Each thread of each process has its own connection; connections aren't carried over a fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._filename, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def _key(self, key) -> str:
+        return repr((self._namespace, key))
+
+    def get(self, key, default=None):
+        key = self._key(key)
+        connection = self._connection()
+        row = connection.execute('SELECT value, expires, tags, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        data, expires, tags, accessed = row
+        tags = json.loads(tags)
+        now = self._clock()
+        if (expires is not None and now >= expires) or self._tag_versions(connection, tags.keys()) != tags:
+            with self._transaction() as connection:
+                self._remove(connection, key)
+            return default
+        if now - accessed >= self.ACCESS_RESOLUTION:
+            connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(data)
+
+    def delete(self, key):
+        with self._transaction() as connection:
+            self._remove(connection, self._key(key))
+
+    def tag_versions(self, tags) -> dict:
+        tags = {self._key(tag): tag for tag in tags}
+        versions = self._tag_versions(self._connection(), tags.keys())
+        return {tags[key]: version for key, version in versions.items()}
+
+    def bump_tag(self, tag):
+        with self._transaction() as connection:
+            connection.execute('INSERT OR IGNORE INTO tags VALUES (?, 0)', (self._key(tag),))
+            connection.execute('UPDATE tags SET version = version + 1 WHERE tag = ?', (self._key(tag),))
+
+    def _store(self, key, data: bytes, ttl: float, tags: dict):
+        if len(data) > self._max_bytes:
+            return
+        key = self._key(key)
+        tags = json.dumps({self._key(tag): version for tag, version in tags.items()})
+        now = self._clock()
+        with self._transaction() as connection:
+            self._remove(connection, key)
+            connection.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, data, len(data), None if ttl is None else now + ttl, tags, now))
+            connection.execute('UPDATE size SET bytes = bytes + ?', (len(data),))
+
+            excess = connection.execute('SELECT bytes FROM size').fetchone()[0] - self._max_bytes
+            while excess > 0:
+                oldest = connection.execute('SELECT key, size FROM entries ORDER BY accessed LIMIT 64').fetchall()
+                for oldest_key, size in oldest:
+                    if excess <= 0:
+                        break
+                    self._remove(connection, oldest_key)
+                    excess -= size
+
+    @staticmethod
+    def _tag_versions(connection, tags) -> dict:
+        tags = list(tags)
+        versions = dict.fromkeys(tags, 0)
+        if tags:
+            versions.update(connection.execute(
+                'SELECT tag, version FROM tags WHERE tag IN (%s)' % ', '.join('?' * len(tags)), tags))
+        return versions
+
+    @staticmethod
+    def _remove(connection, key: str):
+        row = connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            connection.execute('UPDATE size SET bytes = bytes - ?', (row[0],))
+
+
+class _Transaction:
+    # Runs a block of writes as one transaction, taking the write lock at the start so that the sizes read within it
+    # stay current.
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._connection.execute('BEGIN IMMEDIATE')
+        return self._connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+
+def create_cache(config, namespace: str = ''):
+    """ Creates the cache named by config['CACHE_BACKEND'], or returns None for 'none'.
+
+    The cache holds up to CACHE_MAX_BYTES of values for CACHE_DEFAULT_TTL seconds each. A disk cache is kept in
+    CACHE_FILE. Keys and tags are prefixed with namespace, so that applications sharing a file don't share entries.
+    """
+    backend = config.get('CACHE_BACKEND', 'none') or 'none'
+    max_bytes = config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    default_ttl = config.get('CACHE_DEFAULT_TTL', 300) or None
+
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryCache(max_bytes, namespace, default_ttl)
+    if backend == 'disk':
+        return DiskCache(config.get('CACHE_FILE', 'movie-cache.sqlite3'), max_bytes, namespace, default_ttl)
+    raise ValueError(f'Unknown CACHE_BACKEND {backend!r}')
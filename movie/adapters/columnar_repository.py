@@ -0,0 +1,737 @@
+import os
+import weakref
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+from movie.adapters.repository import AbstractRepository, RepositoryException
+from movie.adapters.frozen import StringColumn, GrowingStringColumn, KeyIndex, GrowingKeyIndex, read_arrays, write_arrays
+from movie.adapters.ingest import read_movie_records
+from movie.adapters.memory_repository import load_users, load_reviews, data_checksum
+from movie.adapters.search_index import GrowingSearchIndex, FrozenSearchIndex
+from movie.domain.model import User, Movie, Actor, Genre, Review, Director, make_review
+
+
+class ColumnarRepository(AbstractRepository):
+    # Movies are held column by column in NumPy arrays rather than as Movie objects. Movie, Genre, Actor and
+    # Director objects are built on demand from the columns and the CSR-style link arrays. Strings, the lookups by
+    # rank and by name, and the search index are held in arrays too, as a FrozenColumnarRepository's are.
+
+    def __init__(self):
+        super().__init__()
+
+        # Rows appended since the arrays were last built.
+        self._pending = {column: list() for column in _NUMERIC_COLUMNS}
+        self._pending_links = {kind: list() for kind in _LINK_KINDS}
+
+        self._columns = {column: np.empty(0, dtype=dtype) for column, dtype in _NUMERIC_COLUMNS.items()}
+        self._titles = GrowingStringColumn()
+        self._descriptions = GrowingStringColumn()
+        self._row_of_rank = _RankIndex()
+
+        # Entity names, indexed by entity id, and the reverse lookup.
+        self._names = {kind: GrowingStringColumn() for kind in _LINK_KINDS}
+        self._ids = {kind: GrowingKeyIndex(self._names[kind]) for kind in _LINK_KINDS}
+
+        # CSR links: movie row -> entity ids, and entity id -> movie rows.
+        self._movie_links = {kind: _Csr.empty() for kind in _LINK_KINDS}
+        self._entity_links = {kind: _Csr.empty() for kind in _LINK_KINDS}
+
+        self._title_order = np.empty(0, dtype=np.int64)
+        self._years = np.empty(0, dtype=np.int16)
+
+        self._stale = False
+        self._materialised = weakref.WeakValueDictionary()
+        self._entities = {kind: dict() for kind in _LINK_KINDS}
+
+        self._users = list()
+        self._users_index = dict()
+        self._reviews = list()
+        self._reviews_by_rank = dict()
+        self._search_index = GrowingSearchIndex()
+
+    # ============================================
+    # Column maintenance
+    # ============================================
+
+    def append_movie(self, rank, title, description='', year=None, runtime=None, rating=None, votes=None,
+                     revenue=None, metascore=None, genres=(), actors=(), directors=()):
+        """ Appends one movie row to the columns, without building a Movie object. """
+        row = len(self._titles)
+        self._row_of_rank[rank] = row
+        self._titles.append(title)
+        self._descriptions.append(description)
+        self._search_index.add(rank, title, description)
+
+        values = (rank, year, runtime, rating, votes, revenue, metascore)
+        for column, value in zip(_NUMERIC_COLUMNS, values):
+            self._pending[column].append(_MISSING[column] if value is None else value)
+
+        for kind, names in zip(_LINK_KINDS, (genres, actors, directors)):
+            for name in names:
+                self._pending_links[kind].append((row, self._entity_id(kind, name)))
+
+        self._materialised.pop(rank, None)
+        self._stale = True
+        self._entity_added('movie')
+
+    def _entity_id(self, kind, name):
+        entity_id = self._ids[kind].get(name)
+        if entity_id is None:
+            entity_id = len(self._names[kind])
+            self._names[kind].append(name)
+            self._ids[kind].add(name, entity_id)
+            self._entity_added(kind)
+        return entity_id
+
+    def catalogue_loaded(self):
+        # Called by the loaders once the movies, genres, actors and directors are in, before the users and reviews.
+        self._search_index.compact()
+        self._build()
+
+    def _build(self):
+        # Fold pending rows and links into the arrays. Runs lazily, on the first read after a write, and only redoes
+        # what the writes since the last build require: appended movies and their links are merged into the arrays,
+        # and a kind's link arrays are only rebuilt when links are added to movies built into them already.
+        if not self._stale:
+            return
+
+        number_of_built_movies = len(self._columns['rank'])
+        for column, dtype in _NUMERIC_COLUMNS.items():
+            pending = np.asarray(self._pending[column], dtype=dtype)
+            self._columns[column] = np.concatenate((self._columns[column], pending))
+            self._pending[column] = list()
+        self._row_of_rank.merge()
+
+        number_of_movies = len(self._titles)
+        for kind in _LINK_KINDS:
+            self._ids[kind].merge()
+            rows, ids = np.asarray(self._pending_links[kind], dtype=np.int64).reshape(-1, 2).T
+            self._pending_links[kind] = list()
+            number_of_entities = len(self._names[kind])
+            movie_links = self._movie_links[kind]
+            if len(rows) > 0 and rows.min() < number_of_built_movies:
+                # Links to built movies fall within the arrays, so the kind's arrays are built afresh.
+                built_rows, built_ids = movie_links.pairs()
+                rows = np.concatenate((built_rows, rows))
+                ids = np.concatenate((built_ids, ids))
+                self._movie_links[kind] = _Csr.from_pairs(rows, ids, number_of_movies, number_of_entities)
+                self._entity_links[kind] = _Csr.from_pairs(ids, rows, number_of_entities, number_of_movies)
+            else:
+                self._movie_links[kind] = movie_links.with_rows_added(rows, ids, number_of_movies, number_of_entities)
+                self._entity_links[kind] = self._entity_links[kind].with_later_targets_added(
+                    ids, rows, number_of_entities, number_of_movies)
+
+        years = self._columns['year']
+        new_rows = range(number_of_built_movies, number_of_movies)
+        if len(new_rows) * 64 >= number_of_built_movies:
+            year_list = years.tolist()
+            self._title_order = np.array(
+                sorted(range(number_of_movies), key=lambda row: (self._titles[row], year_list[row])), dtype=np.int64)
+        elif len(new_rows) > 0:
+            # A few movies are appended: each is placed among the ordered rows by a binary search.
+            keys = sorted((self._titles[row], int(years[row]), row) for row in new_rows)
+            self._title_order = np.insert(self._title_order, [self._title_position(key) for key in keys],
+                                          [row for _, _, row in keys])
+        new_years = years[number_of_built_movies:]
+        self._years = np.union1d(self._years, new_years[new_years != _MISSING['year']])
+        self._stale = False
+
+    def _title_position(self, key) -> int:
+        # The index in the title order before which the movie with key, (title, year, row), goes.
+        low, high = 0, len(self._title_order)
+        while low < high:
+            middle = (low + high) // 2
+            row = int(self._title_order[middle])
+            if (self._titles[row], int(self._columns['year'][row]), row) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # ============================================
+    # Materialisation of domain objects
+    # ============================================
+
+    def _movie_at(self, row: int) -> Movie:
+        self._build()
+        rank = int(self._columns['rank'][row])
+        movie = self._materialised.get(rank)
+        if movie is not None:
+            return movie
+
+        year = int(self._columns['year'][row])
+        movie = Movie(self._titles[row], year if year != _MISSING['year'] else None, rank)
+        movie.description = self._descriptions[row]
+        runtime = int(self._columns['runtime'][row])
+        if runtime > 0:
+            movie.runtime_minutes = runtime
+
+        for genre_id in self._movie_links['genre'].row(row):
+            movie.add_genre(self._entity('genre', int(genre_id)))
+        for actor_id in self._movie_links['actor'].row(row):
+            movie.add_actor(self._entity('actor', int(actor_id)))
+        for director_id in self._movie_links['director'].row(row):
+            movie.add_director(self._entity('director', int(director_id)))
+        for review in self._reviews_by_rank.get(rank, ()):
+            movie.add_review(review)
+
+        self._materialised[rank] = movie
+        return movie
+
+    def _movies_at(self, rows) -> List[Movie]:
+        return [self._movie_at(int(row)) for row in rows]
+
+    def _entity(self, kind, entity_id: int):
+        entities = self._entities[kind]
+        if entity_id not in entities:
+            entities[entity_id] = _ENTITY_CLASSES[kind](self._names[kind][entity_id], self, entity_id)
+        return entities[entity_id]
+
+    def _rows_for_entity(self, kind, name):
+        self._build()
+        entity_id = self._ids[kind].get(name)
+        if entity_id is None or entity_id >= self._entity_links[kind].number_of_rows:
+            return np.empty(0, dtype=np.int64)
+        return self._entity_links[kind].row(entity_id)
+
+    def _ranks_for_entity(self, kind, name) -> List[int]:
+        rows = self._rows_for_entity(kind, name)
+        return np.sort(self._columns['rank'][rows]).tolist()
+
+    # ============================================
+    # Vectorised queries
+    # ============================================
+
+    def find_movie_ranks(self, year=None, min_rating=None, min_metascore=None, genre=None, actor=None,
+                         director=None, order_by='rank', descending=False, limit=None) -> List[int]:
+        """ Returns the ranks of Movies matching all the given criteria, sorted by the column order_by.
+
+        Movies with a missing value in order_by are placed last, whichever direction is requested.
+        """
+        self._build()
+        mask = np.ones(len(self._titles), dtype=bool)
+        if year is not None:
+            mask &= self._columns['year'] == year
+        if min_rating is not None:
+            mask &= self._columns['rating'] >= min_rating
+        if min_metascore is not None:
+            mask &= self._columns['metascore'] >= min_metascore
+        for kind, name in (('genre', genre), ('actor', actor), ('director', director)):
+            if name is not None:
+                linked = np.zeros(len(self._titles), dtype=bool)
+                linked[self._rows_for_entity(kind, name)] = True
+                mask &= linked
+
+        rows = np.flatnonzero(mask)
+        if order_by == 'title':
+            rows = self._title_order[mask[self._title_order]]
+            if descending:
+                rows = rows[::-1]
+        else:
+            keys = self._columns[order_by][rows]
+            missing = np.isnan(keys) if keys.dtype.kind == 'f' else keys == _MISSING[order_by]
+            keys = -keys if descending else keys
+            rows = rows[np.lexsort((keys, missing))]
+
+        if limit is not None:
+            rows = rows[:limit]
+        return self._columns['rank'][rows].tolist()
+
+    def get_movies_by_ranks_sorted(self, rank_list, order_by, descending=False) -> List[Movie]:
+        """ Returns the Movies whose ranks are in rank_list, sorted by the column order_by. """
+        self._build()
+        rows = np.array([self._row_of_rank[rank] for rank in rank_list if rank in self._row_of_rank], dtype=np.int64)
+        keys = self._columns[order_by][rows]
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        return self._movies_at(rows[order])
+
+    def column(self, name):
+        """ Returns a read-only view of the numeric column name, indexed by row. """
+        self._build()
+        view = self._columns[name].view()
+        view.flags.writeable = False
+        return view
+
+    # ============================================
+    # AbstractRepository implementation
+    # ============================================
+
+    @contextmanager
+    def unit_of_work(self):
+        # Objects are stored as they are added, so there is nothing to defer.
+        yield self
+
+    def add_user(self, user: User):
+        self._users.append(user)
+        self._users_index.setdefault(user.user_name, user)
+        self._changed()
+
+    def get_user(self, username) -> User:
+        return self._users_index.get(username)
+
+    def add_movie(self, movie: Movie):
+        self.append_movie(
+            rank=movie.rank,
+            title=movie.title,
+            description=movie.description,
+            year=movie.year,
+            runtime=movie.runtime_minutes,
+            genres=[genre.genre_name for genre in movie.genres],
+            actors=[actor.actor_full_name for actor in movie.actors],
+            directors=[director.director_full_name for director in movie.director]
+        )
+        self._materialised[movie.rank] = movie
+
+    def get_movie(self, rank: int, fetch_plan: str = None) -> Movie:
+        movie = None
+
+        row = self._row_of_rank.get(rank)
+        if row is not None:
+            movie = self._movie_at(row)
+        return movie
+
+    def get_movies_by_year(self, y) -> List[Movie]:
+        self._build()
+        if y is None:
+            mask = self._columns['year'] == _MISSING['year']
+        else:
+            mask = self._columns['year'] == y
+        return self._movies_at(self._title_order[mask[self._title_order]])
+
+    def get_number_of_movies(self):
+        return len(self._titles)
+
+    def get_movie_ranks(self) -> List[int]:
+        self._build()
+        return np.sort(self._columns['rank']).tolist()
+
+    def get_first_movie(self):
+        movie = None
+
+        self._build()
+        if len(self._title_order) > 0:
+            movie = self._movie_at(self._title_order[0])
+        return movie
+
+    def get_last_movie(self):
+        movie = None
+
+        self._build()
+        if len(self._title_order) > 0:
+            movie = self._movie_at(self._title_order[-1])
+        return movie
+
+    def get_movies_by_rank(self, rank_list, fetch_plan: str = None):
+        # Strip out any ranks in rank_list that don't represent Movies in the repository.
+        return [self._movie_at(self._row_of_rank[rank]) for rank in rank_list if rank in self._row_of_rank]
+
+    def add_genre(self, genre: Genre):
+        self._add_entity('genre', genre.genre_name, genre.genre_movie)
+
+    def get_genre(self) -> List[Genre]:
+        return [self._entity('genre', genre_id) for genre_id in range(len(self._names['genre']))]
+
+    def get_movie_ranks_for_genre(self, genre_name: str):
+        return self._ranks_for_entity('genre', genre_name)
+
+    def add_actor(self, actor: Actor):
+        self._add_entity('actor', actor.actor_full_name, actor.actor_movie)
+
+    def get_actor(self) -> List[Actor]:
+        return [self._entity('actor', actor_id) for actor_id in range(len(self._names['actor']))]
+
+    def get_movie_ranks_for_actor(self, actor_name: str):
+        return self._ranks_for_entity('actor', actor_name)
+
+    def add_director(self, director: Director):
+        self._add_entity('director', director.director_full_name, director.directed_movie)
+
+    def get_director(self) -> List[Director]:
+        return [self._entity('director', director_id) for director_id in range(len(self._names['director']))]
+
+    def get_movie_ranks_for_director(self, director_name: str):
+        return self._ranks_for_entity('director', director_name)
+
+    def _add_entity(self, kind, name, movies):
+        # Links that are already stored are dropped as duplicates when the arrays are next built.
+        entity_id = self._entity_id(kind, name)
+        for movie in movies:
+            row = self._row_of_rank.get(movie.rank)
+            if row is not None:
+                self._pending_links[kind].append((row, entity_id))
+        self._stale = True
+        # The name may be known already, with only its links new.
+        self._changed()
+
+    def get_movies_page(self, entity: str, name: str, after_rank: int = None, limit: int = 3,
+                        descending: bool = False, fetch_plan: str = None) -> List[Movie]:
+        if entity not in _LINK_KINDS:
+            raise RepositoryException('Unknown entity ' + entity)
+        rows = self._rows_for_entity(entity, name)
+        ranks = np.sort(self._columns['rank'][rows])
+
+        if not descending:
+            start = 0 if after_rank is None else np.searchsorted(ranks, after_rank, side='right')
+            page_ranks = ranks[start:start + limit]
+        else:
+            end = len(ranks) if after_rank is None else np.searchsorted(ranks, after_rank, side='left')
+            page_ranks = ranks[max(0, end - limit):end][::-1]
+
+        return [self._movie_at(self._row_of_rank[rank]) for rank in page_ranks.tolist()]
+
+    def get_number_of_movies_for(self, entity: str, name: str) -> int:
+        if entity not in _LINK_KINDS:
+            raise RepositoryException('Unknown entity ' + entity)
+        return len(self._rows_for_entity(entity, name))
+
+    def get_year_of_previous_movie(self, movie: Movie):
+        self._build()
+        index = np.searchsorted(self._years, movie.year, side='left')
+        return int(self._years[index - 1]) if index > 0 else None
+
+    def get_year_of_next_movie(self, movie: Movie):
+        self._build()
+        index = np.searchsorted(self._years, movie.year, side='right')
+        return int(self._years[index]) if index < len(self._years) else None
+
+    def get_movies_by_director(self, d) -> List[Movie]:
+        rows = self._rows_for_entity('director', d)
+        ranks = self._columns['rank'][rows]
+        return self._movies_at(rows[np.argsort(ranks, kind='stable')])
+
+    def search_movie_ranks(self, query: str) -> List[int]:
+        return self._search_index.search(query)
+
+    def add_review(self, review: Review):
+        super().add_review(review)
+        self._reviews.append(review)
+        self._reviews_by_rank.setdefault(review.movie.rank, list()).append(review)
+        self._changed()
+
+    def get_reviews(self):
+        return self._reviews
+
+
+class FrozenColumnarRepository(ColumnarRepository):
+    """ A ColumnarRepository whose movies, genres, actors and directors are read from arrays in a memory-mapped file.
+
+    Nothing writes to the arrays, so no reference counts or other object headers are stored in their pages: worker
+    processes forked after the file is opened share those pages, and processes that open the same file share the
+    operating system's page cache. Users and reviews are loaded into an ordinary mutable overlay held by each process,
+    so registrations and reviews in one worker are not seen by the others. Movies and entities cannot be added.
+    """
+
+    def __init__(self, arrays):
+        super().__init__()
+        self._columns = {column: arrays['column_' + column] for column in _NUMERIC_COLUMNS}
+        self._titles = StringColumn(arrays['title_offsets'], arrays['titles'])
+        self._descriptions = StringColumn(arrays['description_offsets'], arrays['descriptions'])
+        self._row_of_rank = KeyIndex(self._columns['rank'], arrays['rank_order'])
+
+        for kind in _LINK_KINDS:
+            self._names[kind] = StringColumn(arrays[kind + '_name_offsets'], arrays[kind + '_names'])
+            self._ids[kind] = KeyIndex(self._names[kind], arrays[kind + '_name_order'])
+            self._movie_links[kind] = _Csr(arrays[kind + '_movie_indptr'], arrays[kind + '_movie_indices'])
+            self._entity_links[kind] = _Csr(arrays[kind + '_entity_indptr'], arrays[kind + '_entity_indices'])
+
+        self._title_order = arrays['title_order']
+        self._years = arrays['years']
+        self._search_index = FrozenSearchIndex(
+            {name[len('search_'):]: array for name, array in arrays.items() if name.startswith('search_')})
+
+        # The overlay starts with the users and reviews the file was built with.
+        user_names = StringColumn(arrays['user_name_offsets'], arrays['user_names'])
+        passwords = StringColumn(arrays['password_offsets'], arrays['passwords'])
+        users = [User(name=user_names[i], password=passwords[i]) for i in range(len(user_names))]
+        for user in users:
+            self.add_user(user)
+
+        review_texts = StringColumn(arrays['review_text_offsets'], arrays['review_texts'])
+        for i, (user_row, rank, rating) in enumerate(zip(
+                arrays['review_users'].tolist(), arrays['review_ranks'].tolist(), arrays['review_ratings'].tolist())):
+            self.add_review(make_review(
+                review_text=review_texts[i],
+                user=users[user_row],
+                movie=self.get_movie(rank),
+                review_num=rating
+            ))
+
+    def append_movie(self, *args, **kwargs):
+        raise RepositoryException('Movies cannot be added to a frozen repository')
+
+    def _add_entity(self, kind, name, movies):
+        raise RepositoryException('Entities cannot be added to a frozen repository')
+
+
+class _RankIndex:
+    # A mapping from movie ranks to rows, held as the ranks in order and each one's row. Ranks set since the arrays
+    # were last merged are held in a dict until merge() is called.
+
+    def __init__(self):
+        self._ranks = np.empty(0, dtype=np.int64)
+        self._rows = np.empty(0, dtype=np.int64)
+        self._recent = dict()
+
+    def get(self, rank, default=None):
+        row = self._recent.get(rank)
+        if row is not None:
+            return row
+        i = np.searchsorted(self._ranks, rank)
+        if i < len(self._ranks) and self._ranks[i] == rank:
+            return int(self._rows[i])
+        return default
+
+    def __contains__(self, rank):
+        return self.get(rank) is not None
+
+    def __getitem__(self, rank):
+        row = self.get(rank)
+        if row is None:
+            raise KeyError(rank)
+        return row
+
+    def __setitem__(self, rank, row: int):
+        self._recent[rank] = row
+
+    def merge(self):
+        """ Merges the ranks set since the last merge into the arrays. """
+        if not self._recent:
+            return
+        ranks = np.array(sorted(self._recent), dtype=np.int64)
+        rows = np.array([self._recent[rank] for rank in ranks.tolist()], dtype=np.int64)
+        positions = np.searchsorted(self._ranks, ranks)
+        # A rank that is there already moves to its new row.
+        found = positions < len(self._ranks)
+        found[found] = self._ranks[positions[found]] == ranks[found]
+        self._rows[positions[found]] = rows[found]
+        self._ranks = np.insert(self._ranks, positions[~found], ranks[~found])
+        self._rows = np.insert(self._rows, positions[~found], rows[~found])
+        self._recent.clear()
+
+
+class _Csr:
+    # Compressed sparse rows: the targets of row i are indices[indptr[i]:indptr[i + 1]].
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_pairs(cls, sources, targets, number_of_sources, number_of_targets):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        # Drop duplicate links, then order by source and target.
+        keys = np.unique(sources * max(number_of_targets, 1) + targets)
+        sources = keys // max(number_of_targets, 1)
+        targets = keys % max(number_of_targets, 1)
+
+        indptr = np.zeros(number_of_sources + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=number_of_sources), out=indptr[1:])
+        return cls(indptr, targets)
+
+    @property
+    def number_of_rows(self):
+        return len(self.indptr) - 1
+
+    def row(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def pairs(self):
+        sources = np.repeat(np.arange(self.number_of_rows, dtype=np.int64), np.diff(self.indptr))
+        return sources, self.indices
+
+    def with_rows_added(self, sources, targets, number_of_sources, number_of_targets):
+        # Returns the arrays grown to number_of_sources rows, with the links of the new rows, which all sources are.
+        if len(sources) == 0 and number_of_sources == self.number_of_rows:
+            return self
+        added = _Csr.from_pairs(sources - self.number_of_rows, targets, number_of_sources - self.number_of_rows,
+                                number_of_targets)
+        return _Csr(np.concatenate((self.indptr, added.indptr[1:] + self.indptr[-1])),
+                    np.concatenate((self.indices, added.indices)))
+
+    def with_later_targets_added(self, sources, targets, number_of_sources, number_of_targets):
+        # Returns the arrays grown to number_of_sources rows, with links to targets that follow every target stored,
+        # so that each goes at the end of its row.
+        if len(sources) == 0 and number_of_sources == self.number_of_rows:
+            return self
+        added = _Csr.from_pairs(sources, targets, number_of_sources, number_of_targets)
+        indptr = np.concatenate((
+            self.indptr, np.full(number_of_sources - self.number_of_rows, self.indptr[-1], dtype=np.int64)))
+        positions = np.repeat(indptr[1:], np.diff(added.indptr))
+        return _Csr(indptr + added.indptr, np.insert(self.indices, positions, added.indices))
+
+
+class _ColumnarGenre(Genre):
+    # A Genre whose movies are read from the repository's link arrays instead of a list of its own.
+
+    def __init__(self, name, repo: ColumnarRepository, genre_id: int):
+        super().__init__(name)
+        self._repo = repo
+        self._id = genre_id
+
+    @property
+    def genre_movie(self):
+        return iter(self._repo._movies_at(self._repo._rows_for_entity('genre', self.genre_name)))
+
+    @property
+    def number_of_genre_movie(self):
+        return len(self._repo._rows_for_entity('genre', self.genre_name))
+
+    def is_applied_to(self, movie: Movie) -> bool:
+        return movie.rank in self._repo.get_movie_ranks_for_genre(self.genre_name)
+
+
+class _ColumnarActor(Actor):
+
+    def __init__(self, name, repo: ColumnarRepository, actor_id: int):
+        super().__init__(name)
+        self._repo = repo
+        self._id = actor_id
+
+    @property
+    def actor_movie(self):
+        return iter(self._repo._movies_at(self._repo._rows_for_entity('actor', self.actor_full_name)))
+
+    @property
+    def number_of_actor_movie(self):
+        return len(self._repo._rows_for_entity('actor', self.actor_full_name))
+
+    def is_applied_to(self, movie: Movie) -> bool:
+        return movie.rank in self._repo.get_movie_ranks_for_actor(self.actor_full_name)
+
+
+class _ColumnarDirector(Director):
+
+    def __init__(self, name, repo: ColumnarRepository, director_id: int):
+        super().__init__(name)
+        self._repo = repo
+        self._id = director_id
+
+    @property
+    def directed_movie(self):
+        return iter(self._repo.get_movies_by_director(self.director_full_name))
+
+    @property
+    def number_of_actor_movie(self):
+        return len(self._repo._rows_for_entity('director', self.director_full_name))
+
+    def is_applied_to(self, movie: Movie) -> bool:
+        return movie.rank in self._repo.get_movie_ranks_for_director(self.director_full_name)
+
+
+_NUMERIC_COLUMNS = {
+    'rank': np.int64,
+    'year': np.int16,
+    'runtime': np.int16,
+    'rating': np.float32,
+    'votes': np.int64,
+    'revenue': np.float32,
+    'metascore': np.float32,
+}
+
+# Sentinels stored for missing values.
+_MISSING = {
+    'rank': -1,
+    'year': -1,
+    'runtime': -1,
+    'rating': np.nan,
+    'votes': -1,
+    'revenue': np.nan,
+    'metascore': np.nan,
+}
+
+_LINK_KINDS = ('genre', 'actor', 'director')
+
+_ENTITY_CLASSES = {
+    'genre': _ColumnarGenre,
+    'actor': _ColumnarActor,
+    'director': _ColumnarDirector,
+}
+
+
+def load_movies(data_path: str, repo: ColumnarRepository):
+    for record in read_movie_records(os.path.join(data_path, 'Data1000Movies.csv')):
+        repo.append_movie(
+            rank=record.rank,
+            title=record.title,
+            description=record.description,
+            year=record.year,
+            runtime=record.runtime,
+            rating=record.rating,
+            votes=record.votes,
+            revenue=record.revenue,
+            metascore=record.metascore,
+            genres=record.genres,
+            actors=record.actors,
+            directors=record.directors
+        )
+
+
+def populate(data_path: str, repo: ColumnarRepository, hash_processes: int = None):
+    # Load movies, with their genre, actor and director links, into the columns.
+    load_movies(data_path, repo)
+    repo.catalogue_loaded()
+
+    # Load users into the repository.
+    users = load_users(data_path, repo, hash_processes)
+
+    # Load reviews into the repository.
+    load_reviews(data_path, repo, users)
+
+
+def frozen_arrays(repo: ColumnarRepository):
+    # The arrays a FrozenColumnarRepository is built from, taken from a populated repository.
+    repo._build()
+    arrays = {'column_' + column: repo._columns[column] for column in _NUMERIC_COLUMNS}
+    arrays['title_offsets'], arrays['titles'] = StringColumn.arrays(repo._titles)
+    arrays['description_offsets'], arrays['descriptions'] = StringColumn.arrays(repo._descriptions)
+    arrays['rank_order'] = np.argsort(repo._columns['rank'], kind='stable')
+
+    for kind in _LINK_KINDS:
+        names = repo._names[kind]
+        arrays[kind + '_name_offsets'], arrays[kind + '_names'] = StringColumn.arrays(names)
+        arrays[kind + '_name_order'] = np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.int64)
+        arrays[kind + '_movie_indptr'] = repo._movie_links[kind].indptr
+        arrays[kind + '_movie_indices'] = repo._movie_links[kind].indices
+        arrays[kind + '_entity_indptr'] = repo._entity_links[kind].indptr
+        arrays[kind + '_entity_indices'] = repo._entity_links[kind].indices
+
+    arrays['title_order'] = repo._title_order
+    arrays['years'] = repo._years
+    for name, array in repo._search_index.arrays().items():
+        arrays['search_' + name] = array
+
+    arrays['user_name_offsets'], arrays['user_names'] = StringColumn.arrays(user.user_name for user in repo._users)
+    arrays['password_offsets'], arrays['passwords'] = StringColumn.arrays(user.password for user in repo._users)
+    user_rows = {id(user): row for row, user in enumerate(repo._users)}
+    arrays['review_users'] = np.array([user_rows[id(review.user)] for review in repo._reviews], dtype=np.int64)
+    arrays['review_ranks'] = np.array([review.movie.rank for review in repo._reviews], dtype=np.int64)
+    arrays['review_text_offsets'], arrays['review_texts'] = StringColumn.arrays(
+        review.review_text for review in repo._reviews)
+    # Reviews without a rating are loaded with 0, which Review also stores as no rating.
+    arrays['review_ratings'] = np.array(
+        [review.rating if review.rating is not None else 0 for review in repo._reviews], dtype=np.int64)
+    return arrays
+
+
+def populate_frozen(data_path: str, filename: str, hash_processes: int = None) -> FrozenColumnarRepository:
+    """ Returns a FrozenColumnarRepository mapping filename, first writing the file if it wasn't built from the data.
+
+    Under a pre-fork server, call this in the master process (e.g. gunicorn --preload) so that every worker shares
+    the one mapping.
+    """
+    checksum = data_checksum(data_path)
+    arrays = read_arrays(filename, checksum)
+    if arrays is None:
+        repo = ColumnarRepository()
+        populate(data_path, repo, hash_processes)
+        write_arrays(filename, frozen_arrays(repo), checksum)
+        arrays = read_arrays(filename, checksum)
+    return FrozenColumnarRepository(arrays)
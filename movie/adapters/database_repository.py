@@ -1,27 +1,136 @@
 import csv
 import os
+import threading
+from contextlib import contextmanager
+from itertools import tee, groupby, chain
 
-from datetime import date
+from datetime import date, datetime
 from typing import List
 
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, select, create_engine, event, inspect
 from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
-from werkzeug.security import generate_password_hash
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm import scoped_session, selectinload, joinedload
 from flask import _app_ctx_stack
 
 from movie.domain.model import User, Movie, Review, Genre, Actor, Director
-from movie.adapters.repository import AbstractRepository
+from movie.adapters.hashing import hash_passwords
+from movie.adapters.ingest import MovieRecord, read_movie_batches
+from movie.adapters import orm
+from movie.adapters.repository import AbstractRepository, RepositoryException, MovieRow, GenreRow, ReviewRow, \
+    LruDict, MAX_CACHED_ENTITIES
+from movie.adapters.search_index import SearchIndex
+
+
+# Entity -> (entity table, association table, association column referencing the entity table).
+ENTITY_LINKS = {
+    'genre': ('genres', 'movie_genres', 'genre_id'),
+    'actor': ('actors', 'movie_actors', 'actor_id'),
+    'director': ('directors', 'movie_directors', 'director_id'),
+}
+
+# Named fetch plans: the loader options applied when Movies are loaded for a particular use. Relationships are lazy by
+# default, so converting a page of Movies with movie_to_dict would otherwise issue queries for the reviews, the
+# reviewers and the genres of every Movie, and then the Movies of every genre. Each selectinload adds one query per
+# page whatever its size.
+FETCH_PLANS = {
+    # Only the Movie columns.
+    'lazy': (),
+    # A Movie with its genres, as shown in the picks sidebar.
+    'summary': (
+        selectinload('_Movie__genres'),
+    ),
+    # A Movie with its reviews and their users, as shown in the reviews list.
+    'reviews': (
+        selectinload('_Movie__reviews').joinedload('_Review__user_name'),
+    ),
+    # Everything movie_to_dict touches.
+    'listing': (
+        selectinload('_Movie__reviews').joinedload('_Review__user_name'),
+        selectinload('_Movie__genres').selectinload('_Genre__movie_list'),
+    ),
+}
+
+# The row of the versions table raised when objects of each class are inserted.
+VERSION_KINDS = {
+    User: 'user',
+    Review: 'review',
+    Movie: 'movie',
+    Genre: 'genre',
+    Actor: 'actor',
+    Director: 'director',
+}
+
+# Pool classes for file-based SQLite databases, selected by the SQLITE_POOL setting.
+SQLITE_POOLS = {
+    'queue': QueuePool,
+    'static': StaticPool,
+    'null': NullPool,
+}
+
+
+def create_database_engine(config) -> Engine:
+    """ Creates an engine for config['SQLALCHEMY_DATABASE_URI'], pooling connections to suit its dialect.
+
+    Server databases get a QueuePool sized by SQLALCHEMY_POOL_SIZE and SQLALCHEMY_MAX_OVERFLOW, which waits up to
+    SQLALCHEMY_POOL_TIMEOUT seconds for a free connection, checks connections with SQLALCHEMY_POOL_PRE_PING and replaces them after SQLALCHEMY_POOL_RECYCLE seconds. An in-memory
+    SQLite database exists only within its connection, so it always has a single connection shared by all threads.
+    File-based SQLite databases use the pool named by SQLITE_POOL and, if SQLITE_WAL is set, write-ahead logging, so
+    that readers don't wait for a writer.
+    """
+    database_uri = config['SQLALCHEMY_DATABASE_URI']
+    echo = config.get('SQLALCHEMY_ECHO', False)
+    url = make_url(database_uri)
+
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(
+            database_uri, echo=echo, poolclass=QueuePool,
+            pool_size=config.get('SQLALCHEMY_POOL_SIZE', 5),
+            max_overflow=config.get('SQLALCHEMY_MAX_OVERFLOW', 10),
+            pool_timeout=config.get('SQLALCHEMY_POOL_TIMEOUT', 30),
+            pool_pre_ping=config.get('SQLALCHEMY_POOL_PRE_PING', True),
+            pool_recycle=config.get('SQLALCHEMY_POOL_RECYCLE', -1)
+        )
+
+    # Pooled SQLite connections are used by whichever thread checks them out.
+    connect_args = {'check_same_thread': False}
+    if url.database in (None, '', ':memory:'):
+        return create_engine(database_uri, echo=echo, connect_args=connect_args, poolclass=StaticPool)
+
+    pool_name = config.get('SQLITE_POOL', 'queue')
+    if pool_name not in SQLITE_POOLS:
+        raise ValueError('Unknown SQLite pool ' + pool_name)
+    pool_args = dict()
+    if SQLITE_POOLS[pool_name] is QueuePool:
+        pool_args = {
+            'pool_size': config.get('SQLALCHEMY_POOL_SIZE', 5),
+            'max_overflow': config.get('SQLALCHEMY_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('SQLALCHEMY_POOL_TIMEOUT', 30)
+        }
+    engine = create_engine(database_uri, echo=echo, connect_args=connect_args, poolclass=SQLITE_POOLS[pool_name],
+                           **pool_args)
+
+    if config.get('SQLITE_WAL', True):
+        @event.listens_for(engine, 'connect')
+        def use_write_ahead_log(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            # With WAL, a sync at each checkpoint rather than each commit is still safe against corruption.
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+
+    return engine
 
-genres = None
-directors = None
-actors = None
 
 class SessionContextManager:
     def __init__(self, session_factory):
         self.__session_factory = session_factory
+        # One registry for the life of the application. It holds a session per thread (or greenlet), created on first
+        # use, so concurrent requests never share a session.
         self.__session = scoped_session(self.__session_factory, scopefunc=_app_ctx_stack.__ident_func__)
 
     def __enter__(self):
@@ -41,36 +150,133 @@ class SessionContextManager:
         self.__session.rollback()
 
     def reset_session(self):
-        # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
+        # Discards the current thread's session; the registry creates a new one when it's next used.
         self.close_current_session()
-        self.__session = scoped_session(self.__session_factory, scopefunc=_app_ctx_stack.__ident_func__)
 
     def close_current_session(self):
-        if not self.__session is None:
-            self.__session.close()
+        # Closes the current thread's session and removes it from the registry, e.g. at the end of each request.
+        self.__session.remove()
 
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, search_index: SearchIndex = None):
+        super().__init__()
         self._session_cm = SessionContextManager(session_factory)
 
+        # The search index is held in memory, and built from a scan of the movies table unless populate built it.
+        if search_index is None:
+            search_index = build_search_index(session_factory)
+        self._search_index = search_index
+
+        # (Versions, movie count) per (entity, name) of the most recently used names with movies. A count is used while
+        # the versions of the movies and the entity are those it was counted at, whichever process raised them.
+        self._movie_counts = LruDict(MAX_CACHED_ENTITIES)
+
+        # Objects added within each thread's unit of work, waiting to be written when it ends.
+        self._work = threading.local()
+
+        # The total of the versions table when the version last changed.
+        add_missing_versions(session_factory)
+        self._database_version = None
+
     def close_session(self):
         self._session_cm.close_current_session()
 
     def reset_session(self):
         self._session_cm.reset_session()
 
-    def add_user(self, user: User):
+    @contextmanager
+    def unit_of_work(self):
+        if getattr(self._work, 'pending', None) is not None:
+            # A nested unit of work is part of the outer one.
+            yield self
+            return
+
+        self._work.pending = list()
+        try:
+            yield self
+            pending = self._work.pending
+        except BaseException:
+            # Objects linked to persistent ones may have been cascaded into the session already.
+            self._session_cm.rollback()
+            raise
+        finally:
+            self._work.pending = None
+
+        with self._session_cm as scm:
+            if any(_has_related_objects(obj) for obj in pending):
+                # Cascade to the related objects, and let the session order the inserts they depend on.
+                scm.session.add_all(pending)
+            else:
+                # Each run of objects of one class is inserted in bulk, skipping the session's bookkeeping. Returning
+                # their generated keys leaves the objects detached rather than transient, so they are attached to the
+                # session afterwards and callers may go on using them, e.g. to make reviews.
+                for _, objects in groupby(pending, key=type):
+                    scm.session.bulk_save_objects(list(objects), return_defaults=True)
+                scm.session.add_all(pending)
+            self._raise_versions(pending)
+            scm.commit()
+        self._added(pending)
+
+    def _add(self, obj):
+        pending = getattr(self._work, 'pending', None)
+        if pending is not None:
+            pending.append(obj)
+            return
+
         with self._session_cm as scm:
-            scm.session.add(user)
+            scm.session.add(obj)
+            self._raise_versions([obj])
             scm.commit()
+        self._added([obj])
+
+    def _raise_versions(self, objects):
+        # Raises the versions of the objects about to be committed, and of the new objects they cascade to, in the same
+        # transaction, so that no process sees the rows without the versions or the other way round.
+        session = self._session_cm.session
+        kinds = {VERSION_KINDS[type(obj)] for obj in chain(objects, session.new)}
+        session.execute(orm.versions.update().where(orm.versions.c.kind.in_(kinds)).values(
+            version=orm.versions.c.version + 1))
+
+    def _read_versions(self) -> dict:
+        # Kind -> version, read once per transaction of the session, so that they match what the rest of it reads.
+        session = self._session_cm.session()
+        cached = session.info.get('versions')
+        if cached is None or cached[0] is not session.transaction:
+            rows = session.execute(select([orm.versions.c.kind, orm.versions.c.version])).fetchall()
+            cached = session.info['versions'] = (session.transaction, dict(rows))
+        return cached[1]
+
+    def get_entity_version(self, kind: str) -> int:
+        # Read from the database rather than counted by this process, so that the keys of a cache shared by several
+        # processes mean the same in each, and an add by one process is seen by all of them.
+        return self._read_versions()[kind]
+
+    def get_version(self) -> int:
+        # The total of the versions table, which is the same in every process reading the database.
+        database_version = sum(self._read_versions().values())
+        if database_version != self._database_version:
+            self._database_version = database_version
+            self._changed()
+        return database_version
+
+    def _added(self, objects):
+        # Brings the caches up to date with committed objects.
+        for obj in objects:
+            if isinstance(obj, Movie):
+                self._entity_added('movie')
+                self._search_index.add(obj.rank, obj.title, obj.description)
+            elif isinstance(obj, (Genre, Actor, Director)):
+                self._entity_added(type(obj).__name__.lower())
+
+    def add_user(self, user: User):
+        self._add(user)
 
     def get_user(self, username) -> User:
         user = None
         try:
-            user = self._session_cm.session.query(User).filter_by(_username=username).one()
+            user = self._session_cm.session.query(User).filter_by(_User__user_name=username).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -78,14 +284,20 @@ class SqlAlchemyRepository(AbstractRepository):
         return user
 
     def add_movie(self, movie: Movie):
-        with self._session_cm as scm:
-            scm.session.add(movie)
-            scm.commit()
-
-    def get_movie(self, rank: int) -> Movie:
-        movie = []
+        self._add(movie)
+
+    def _query_movies(self, fetch_plan: str = None):
+        query = self._session_cm.session.query(Movie)
+        if fetch_plan is not None:
+            if fetch_plan not in FETCH_PLANS:
+                raise RepositoryException('Unknown fetch plan ' + fetch_plan)
+            query = query.options(*FETCH_PLANS[fetch_plan])
+        return query
+
+    def get_movie(self, rank: int, fetch_plan: str = None) -> Movie:
+        movie = None
         try:
-            movie = self._session_cm.session.query(Movie).filter(Movie.rank == rank).one()
+            movie = self._query_movies(fetch_plan).filter(Movie._Movie__rank == rank).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -98,49 +310,109 @@ class SqlAlchemyRepository(AbstractRepository):
             return movies
         else:
             # Return articles matching target_date; return an empty list if there are no matches.
-            movies = self._session_cm.session.query(Movie).filter(Movie.year == target_year).all()
+            movies = self._session_cm.session.query(Movie).filter(Movie._Movie__year == target_year).all()
             return movies
 
-    def get_number_of_articles(self):
+    def get_number_of_movies(self):
         number_of_movies = self._session_cm.session.query(Movie).count()
         return number_of_movies
 
-    def get_first_article(self):
-        movie = self._session_cm.session.query(Movie).first()
+    def get_movie_ranks(self) -> List[int]:
+        rows = self._session_cm.session.execute(select([orm.movies.c.rank]).order_by(orm.movies.c.rank))
+        return [rank for rank, in rows]
+
+    def get_first_movie(self):
+        # Movies are ordered as Movie.__lt__ orders them, by title and then year.
+        movie = self._session_cm.session.query(Movie).order_by(
+            asc(Movie._Movie__title), asc(Movie._Movie__year)).first()
         return movie
 
-    def get_last_article(self):
-        movie = self._session_cm.session.query(Movie).order_by(desc(Movie.rank)).first()
+    def get_last_movie(self):
+        movie = self._session_cm.session.query(Movie).order_by(
+            desc(Movie._Movie__title), desc(Movie._Movie__year)).first()
         return movie
 
-    def get_movies_by_rank(self, rank_list):
-        movies = self._session_cm.session.query(Movie).filter(Movie.rank.in_(rank_list)).all()
+    def get_movies_by_rank(self, rank_list, fetch_plan: str = None):
+        movies = self._query_movies(fetch_plan).filter(Movie._Movie__rank.in_(rank_list)).all()
         return movies
 
+    def get_movie_rows(self, rank_list) -> List[MovieRow]:
+        return select_movie_rows(self._session_cm.session, rank_list)
+
+    def _movie_ranks_for(self, entity: str, name: str):
+        entity_table, link_table, link_column = ENTITY_LINKS[entity]
+
+        # Use native SQL to retrieve movie ranks, since there are no mapped classes for the association tables.
+        rows = self._session_cm.session.execute(
+            f'SELECT l.movie_rank FROM {link_table} l JOIN {entity_table} e ON e.id = l.{link_column} '
+            f'WHERE e.name = :name ORDER BY l.movie_rank ASC',
+            {'name': name}
+        ).fetchall()
+        return [row[0] for row in rows]
+
     def get_movie_ranks_for_genre(self, genre_name: str):
-        movie_ranks = []
+        return self._movie_ranks_for('genre', genre_name)
 
-        # Use native SQL to retrieve article ids, since there is no mapped class for the article_tags table.
-        row = self._session_cm.session.execute('SELECT rank FROM genres WHERE name = :genre_name', {'genre_name': genre_name}).fetchone()
+    def get_movie_ranks_for_actor(self, actor_name: str):
+        return self._movie_ranks_for('actor', actor_name)
 
-        if row is None:
-            # No tag with the name tag_name - create an empty list.
-            movie_ranks = list()
-        else:
-            genre_rank = row[0]
+    def get_movie_ranks_for_director(self, director_name: str):
+        return self._movie_ranks_for('director', director_name)
+
+    def get_movies_by_director(self, d) -> List[Movie]:
+        movies = self._session_cm.session.query(Movie).join(Movie._Movie__director).filter(
+            Director._Director__name == d).order_by(asc(Movie._Movie__rank)).all()
+        return movies
 
-            # Retrieve article ids of articles associated with the tag.
-            movie_ranks = self._session_cm.session.execute(
-                    'SELECT movie_rank FROM movie_genres WHERE genre_rank = :genre_rank ORDER BY movie_rank ASC',
-                    {'genre_rank': genre_rank}
-            ).fetchall()
-            movie_ranks = [rank[0] for rank in movie_ranks]
+    def get_movies_page(self, entity: str, name: str, after_rank: int = None, limit: int = 3,
+                        descending: bool = False, fetch_plan: str = None) -> List[Movie]:
+        if entity not in ENTITY_LINKS:
+            raise RepositoryException('Unknown entity ' + entity)
+        entity_table, link_table, link_column = ENTITY_LINKS[entity]
+
+        # Keyset pagination: seek past after_rank on the association table rather than counting off an offset.
+        query = (
+            f'SELECT l.movie_rank FROM {link_table} l JOIN {entity_table} e ON e.id = l.{link_column} '
+            f'WHERE e.name = :name'
+        )
+        if after_rank is not None:
+            query += ' AND l.movie_rank < :after_rank' if descending else ' AND l.movie_rank > :after_rank'
+        query += ' ORDER BY l.movie_rank DESC' if descending else ' ORDER BY l.movie_rank ASC'
+        query += ' LIMIT :limit'
+
+        rows = self._session_cm.session.execute(
+            query, {'name': name, 'after_rank': after_rank, 'limit': limit}
+        ).fetchall()
+        page_ranks = [row[0] for row in rows]
+
+        movies = self._query_movies(fetch_plan).filter(Movie._Movie__rank.in_(page_ranks)).all()
+        movies.sort(key=lambda movie: page_ranks.index(movie.rank))
+        return movies
 
-        return movie_ranks
+    def get_number_of_movies_for(self, entity: str, name: str) -> int:
+        if entity not in ENTITY_LINKS:
+            raise RepositoryException('Unknown entity ' + entity)
+
+        key = (entity, name)
+        versions = (self.get_entity_version('movie'), self.get_entity_version(entity))
+        cached = self._movie_counts.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+
+        entity_table, link_table, link_column = ENTITY_LINKS[entity]
+        row = self._session_cm.session.execute(
+            f'SELECT COUNT(*) FROM {link_table} l JOIN {entity_table} e ON e.id = l.{link_column} '
+            f'WHERE e.name = :name',
+            {'name': name}
+        ).fetchone()
+        if row[0] > 0:
+            # Names without movies, such as made up ones, aren't kept.
+            self._movie_counts[key] = (versions, row[0])
+        return row[0]
 
     def get_year_of_previous_movie(self, movie: Movie):
         result = None
-        prev = self._session_cm.session.query(Movie).filter(Movie.year < movie.year).order_by(desc(Movie.year)).first()
+        prev = self._session_cm.session.query(Movie).filter(Movie._Movie__year < movie.year).order_by(desc(Movie._Movie__year)).first()
 
         if prev is not None:
             result = prev.year
@@ -149,7 +421,7 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def get_year_of_next_movie(self, movie: Movie):
         result = None
-        next = self._session_cm.session.query(Movie).filter(Movie.year > movie.year).order_by(asc(Movie.year)).first()
+        next = self._session_cm.session.query(Movie).filter(Movie._Movie__year > movie.year).order_by(asc(Movie._Movie__year)).first()
 
         if next is not None:
             result = next.year
@@ -161,98 +433,104 @@ class SqlAlchemyRepository(AbstractRepository):
         return genres
 
     def add_genre(self, genre: Genre):
-        with self._session_cm as scm:
-            scm.session.add(genre)
-            scm.commit()
+        self._add(genre)
 
     def get_actor(self) -> List[Actor]:
         actors = self._session_cm.session.query(Actor).all()
         return actors
 
     def add_actor(self, actor: Actor):
-        with self._session_cm as scm:
-            scm.session.add(actor)
-            scm.commit()
+        self._add(actor)
 
     def get_director(self) -> List[Director]:
         directors = self._session_cm.session.query(Director).all()
         return directors
 
     def add_director(self, director: Director):
-        with self._session_cm as scm:
-            scm.session.add(director)
-            scm.commit()
+        self._add(director)
 
 
+    def search_movie_ranks(self, query: str) -> List[int]:
+        return self._search_index.search(query)
+
     def get_reviews(self) -> List[Review]:
         reviews = self._session_cm.session.query(Review).all()
         return reviews
 
     def add_review(self, review: Review):
         super().add_review(review)
-        with self._session_cm as scm:
-            scm.session.add(review)
-            scm.commit()
-
-def movie_record_generator(filename: str):
-    with open(filename, mode='r', encoding='utf-8-sig') as infile:
-        reader = csv.reader(infile)
-        # Read first line of the CSV file.
-        headers = next(reader)
-
-        # Read remaining rows from the CSV file.
-        for row in reader:
-            movie_data = row
-            movie_key = movie_data[0]
-            # Strip any leading/trailing white space from data read.
-            movie_data = [item.strip() for item in movie_data]
-            number_of_genres = len(movie_data)-2
-            movie_genres = movie_data[-number_of_genres:-number_of_genres+1]
-            # Add any new tags; associate the current article with tags.
-            for genre in movie_genres:
-                if genre not in genres.keys():
-                    genres[genre] = list()
-                genres[genre].append(movie_key)
-            del movie_data[-number_of_genres:-number_of_genres+1]
-
-            number_of_actors = len(movie_data) - 4
-            movie_actors = movie_data[-number_of_actors:-number_of_actors+1]
-            for actor in movie_actors:
-                if actor not in actors.keys():
-                    actors[actor] = list()
-                actors[actor].append(movie_key)
-            del movie_data[-number_of_actors:-number_of_actors+1]
-
-            number_of_director = len(movie_data) - 3
-            movie_director = movie_data[-number_of_director:-number_of_director + 1]
-            for director in movie_director:
-                if director not in directors.keys():
-                    directors[director] = list()
-                directors[director].append(movie_key)
-            del movie_data[-number_of_director:-number_of_director + 1]
-
-            yield movie_data
-
-
-def get_genre_records():
-    genre_records = list()
-    genre_key = 0
-
-    for genre in genres.keys():
-        genre_key = genre_key + 1
-        genre_records.append((genre_key, genre))
-    return genre_records
-
-
-def movie_genres_generator():
-    movie_genres_key = 0
-    genre_key = 0
-
-    for genre in genres.keys():
-        genre_key = genre_key + 1
-        for movie_key in genres[genre]:
-            movie_genres_key = movie_genres_key + 1
-            yield movie_genres_key, movie_key, genre_key
+        self._add(review)
+
+
+def _has_related_objects(obj) -> bool:
+    # Whether obj refers to other objects through its relationships; bulk saves ignore relationships.
+    state = inspect(obj)
+    return any(state.dict.get(relationship.key) for relationship in state.mapper.relationships)
+
+
+def select_movie_rows(connection, rank_list) -> List[MovieRow]:
+    """ Reads MovieRows for the Movies whose ranks are in rank_list, in the order of rank_list.
+
+    connection is anything with an execute() method, such as a Session or a Connection. The rows are read with four
+    column-only statements, whatever the number of Movies, and no mapped objects are created.
+    """
+    movies, genres, movie_genres, reviews, users = orm.movies, orm.genres, orm.movie_genres, orm.reviews, orm.users
+
+    rank_list = list(dict.fromkeys(rank_list))
+    movie_columns = {
+        rank: (year, title) for rank, year, title in connection.execute(
+            select([movies.c.rank, movies.c.year, movies.c.title]).where(movies.c.rank.in_(rank_list))
+        )
+    }
+    if len(movie_columns) == 0:
+        return []
+    ranks = list(movie_columns)
+
+    # The genres of each Movie, in the order they were linked.
+    genre_ids = {rank: list() for rank in ranks}
+    genre_names = dict()
+    for movie_rank, genre_id, name in connection.execute(
+            select([movie_genres.c.movie_rank, genres.c.id, genres.c.name])
+            .select_from(movie_genres.join(genres, movie_genres.c.genre_id == genres.c.id))
+            .where(movie_genres.c.movie_rank.in_(ranks))
+            .order_by(movie_genres.c.id)
+    ):
+        genre_ids[movie_rank].append(genre_id)
+        genre_names[genre_id] = name
+
+    # The ranks of all the Movies of those genres.
+    genre_ranks = {genre_id: list() for genre_id in genre_names}
+    if len(genre_names) > 0:
+        for genre_id, movie_rank in connection.execute(
+                select([movie_genres.c.genre_id, movie_genres.c.movie_rank])
+                .where(movie_genres.c.genre_id.in_(list(genre_names)))
+                .order_by(movie_genres.c.id)
+        ):
+            genre_ranks[genre_id].append(movie_rank)
+
+    movie_reviews = {rank: list() for rank in ranks}
+    for username, movie_rank, review_text, timestamp, rating in connection.execute(
+            select([users.c.username, reviews.c.movie_rank, reviews.c.review, reviews.c.timestamp, reviews.c.rating])
+            .select_from(reviews.outerjoin(users, reviews.c.user_id == users.c.id))
+            .where(reviews.c.movie_rank.in_(ranks))
+            .order_by(reviews.c.id)
+    ):
+        movie_reviews[movie_rank].append(ReviewRow(username, movie_rank, review_text, timestamp, rating))
+
+    return [
+        MovieRow(
+            rank, movie_columns[rank][0], movie_columns[rank][1],
+            tuple(GenreRow(genre_names[genre_id], tuple(genre_ranks[genre_id])) for genre_id in genre_ids[rank]),
+            tuple(movie_reviews[rank])
+        )
+        for rank in rank_list if rank in movie_columns
+    ]
+
+
+def movie_table_row(record: MovieRecord):
+    # Rank, title, description, year, runtime, rating, votes, revenue and metascore. The movies table has no NULLs, so
+    # missing measures are stored as 'N/A', as the file writes them.
+    return tuple('N/A' if value is None else value for value in record[:9])
 
 
 def generic_generator(filename, post_process=None):
@@ -272,54 +550,132 @@ def generic_generator(filename, post_process=None):
             yield row
 
 
-def process_user(user_row):
-    user_row[2] = generate_password_hash(user_row[2])
-    return user_row
-
-
-def populate(engine: Engine, data_path: str):
+def user_record_generator(filename: str, hash_processes: int = None):
+    # Yields user rows with the password replaced by its hash, hashing across a process pool if requested.
+    user_rows, password_rows = tee(generic_generator(filename))
+    password_hashes = hash_passwords((user_row[2] for user_row in password_rows), hash_processes)
+
+    for user_row, password_hash in zip(user_rows, password_hashes):
+        user_row[2] = password_hash
+        yield user_row
+
+
+def review_record(review_row):
+    # The last column of reviews.csv is either a rating or a timestamp. Reviews without a timestamp are stamped with
+    # the time they're loaded.
+    if review_row[4].isdigit():
+        return review_row + [datetime.now()]
+    return review_row[:4] + [None, review_row[4]]
+
+
+def add_missing_versions(session_factory):
+    # Gives every kind a row in the versions table, e.g. of a database upgraded from a schema without it.
+    session = session_factory()
+    try:
+        existing = {kind for kind, in session.execute(select([orm.versions.c.kind]))}
+        missing = [kind for kind in VERSION_KINDS.values() if kind not in existing]
+        if missing:
+            session.execute(orm.versions.insert(), [{'kind': kind, 'version': 0} for kind in missing])
+            session.commit()
+    except IntegrityError:
+        # Another process added them first.
+        session.rollback()
+    finally:
+        session.close()
+
+
+def build_search_index(session_factory) -> SearchIndex:
+    # Indexes the movies in the database, from a single scan of the movies table.
+    search_index = SearchIndex()
+    session = session_factory()
+    try:
+        for rank, title, description in session.execute('SELECT rank, title, discription FROM movies'):
+            search_index.add(rank, title, description)
+    finally:
+        session.close()
+    return search_index
+
+
+def populate(engine: Engine, data_path: str, hash_processes: int = None) -> SearchIndex:
+    # Returns a search index of the movies loaded, to hand to the SqlAlchemyRepository.
+    search_index = SearchIndex()
     conn = engine.raw_connection()
     cursor = conn.cursor()
 
-    global genres
-    genres = dict()
-    global actors
-    actors = dict()
-    global directors
-    directors = dict()
-
     insert_movies = """
         INSERT INTO movies (
         rank, title, discription, year, runtime, rating, votes, revenue, metascore)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-    cursor.executemany(insert_movies, movie_record_generator(os.path.join(data_path, 'Data1000Movies.csv')))
 
-    insert_genres = """
-        INSERT INTO genres (
-        id, name)
-        VALUES (?, ?)"""
-    cursor.executemany(insert_genres, get_genre_records())
+    # Load the movie file a batch at a time, with the genres, actors and directors first seen in each batch.
+    for batch in read_movie_batches(os.path.join(data_path, 'Data1000Movies.csv')):
+        cursor.executemany(insert_movies, [movie_table_row(record) for record in batch.movies])
+        for record in batch.movies:
+            search_index.add(record.rank, record.title, record.description)
 
-    insert_movie_genres = """
-        INSERT INTO movie_genres (
-        id, movie_rank, genre_id)
-        VALUES (?, ?, ?)"""
-    cursor.executemany(insert_movie_genres, movie_genres_generator())
+        for entity in ('genre', 'actor', 'director'):
+            insert_entities(cursor, entity, batch.entities[entity], batch.links[entity])
 
     insert_users = """
         INSERT INTO users (
         id, username, password)
         VALUES (?, ?, ?)"""
-    cursor.executemany(insert_users, generic_generator(os.path.join(data_path, 'users.csv'), process_user))
+    cursor.executemany(insert_users, user_record_generator(os.path.join(data_path, 'users.csv'), hash_processes))
 
     insert_reviews = """
         INSERT INTO reviews (
-        id, user_id, movie_rank, review, timestamp)
-        VALUES (?, ?, ?, ?, ?)"""
-    cursor.executemany(insert_reviews, generic_generator(os.path.join(data_path, 'reviews.csv')))
+        id, user_id, movie_rank, review, rating, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)"""
+    cursor.executemany(insert_reviews, generic_generator(os.path.join(data_path, 'reviews.csv'), review_record))
 
     conn.commit()
     conn.close()
+    return search_index
+
+
+def backfill_entities(engine: Engine, data_path: str):
+    """ Fills the entity tables an existing database has no rows in from the movie file.
+
+    upgrade_schema creates the tables that a database made by an earlier version lacks, such as actors and directors,
+    but leaves them empty. Only the movies in the movies table are linked, and only the entities linked to them added.
+    """
+    kinds = [entity for entity, (entity_table, _, _) in ENTITY_LINKS.items()
+             if engine.execute(f'SELECT 1 FROM {entity_table} LIMIT 1').first() is None]
+    if not kinds:
+        return
+
+    ranks = {rank for rank, in engine.execute('SELECT rank FROM movies')}
+    entities = {entity: list() for entity in kinds}
+    links = {entity: list() for entity in kinds}
+    for batch in read_movie_batches(os.path.join(data_path, 'Data1000Movies.csv')):
+        for entity in kinds:
+            entities[entity].extend(batch.entities[entity])
+            links[entity].extend(link for link in batch.links[entity] if link[0] in ranks)
+
+    conn = engine.raw_connection()
+    cursor = conn.cursor()
+    for entity in kinds:
+        linked_ids = {entity_id for _, entity_id in links[entity]}
+        insert_entities(cursor, entity, [row for row in entities[entity] if row[0] in linked_ids], links[entity])
+    conn.commit()
+    conn.close()
+
+
+def insert_entities(cursor, entity: str, entities, links):
+    # Inserts (id, name) rows of entity, and the (movie rank, id) rows linking movies to them.
+    entity_table, link_table, link_column = ENTITY_LINKS[entity]
+
+    insert_entity_rows = f"""
+        INSERT INTO {entity_table} (
+        id, name)
+        VALUES (?, ?)"""
+    cursor.executemany(insert_entity_rows, entities)
+
+    insert_movie_entities = f"""
+        INSERT INTO {link_table} (
+        movie_rank, {link_column})
+        VALUES (?, ?)"""
+    cursor.executemany(insert_movie_entities, links)
 
 '''
 defpopulate(session_factory, data_path, data_filename):filename = os.path.join(data_path, data_filename)movie_file_reader= MovieFileReader(filename)movie_file_reader.read_csv_file()session = session_factory()# This takes all movies from the csv file (represented as domain model objects) and adds them to the # database. If the uniqueness of directors, actors, genres is correctly handled, and the relationships# are correctly set up in the ORM mapper, then all associations will be dealt with as well!formovie inmovie_file_reader.dataset_of_movies:session.add(movie)session.commit()
@@ -0,0 +1,183 @@
+import array
+import json
+import mmap
+import os
+
+import numpy as np
+
+FROZEN_MAGIC = b'MOVIEFRZ'
+FROZEN_VERSION = 1
+
+# Arrays start on cache line boundaries in the file.
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_arrays(filename: str, arrays, checksum: bytes):
+    """ Writes the named NumPy arrays to filename, for read_arrays to map into memory.
+
+    The file holds a header describing each array, followed by the arrays' bytes. It is written under a temporary name
+    and then moved into place, so that processes opening filename never see a partial file.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    layout = dict()
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps(layout).encode('utf-8')
+    prefix = FROZEN_MAGIC + FROZEN_VERSION.to_bytes(2, 'big') + checksum + len(header).to_bytes(8, 'big') + header
+
+    # Each process writes its own temporary file, as several workers may rebuild a stale file at once.
+    temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    with open(temp_filename, 'wb') as outfile:
+        outfile.write(prefix)
+        start = _aligned(len(prefix))
+        for name, array in arrays.items():
+            outfile.write(b'\0' * (start + layout[name][2] - outfile.tell()))
+            outfile.write(array.tobytes())
+    os.replace(temp_filename, filename)
+
+
+def read_arrays(filename: str, checksum: bytes):
+    """ Maps the arrays written to filename by write_arrays into memory, read-only.
+
+    Returns a dict of arrays backed by the file's pages, or None if the file is missing, was written from other data
+    (checksum) or by another version.
+    """
+    try:
+        with open(filename, 'rb') as infile:
+            buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    expected = FROZEN_MAGIC + FROZEN_VERSION.to_bytes(2, 'big') + checksum
+    if buffer[:len(expected)] != expected:
+        return None
+    header_length = int.from_bytes(buffer[len(expected):len(expected) + 8], 'big')
+    header_end = len(expected) + 8 + header_length
+    layout = json.loads(buffer[len(expected) + 8:header_end].decode('utf-8'))
+
+    start = _aligned(header_end)
+    arrays = dict()
+    for name, (dtype, shape, offset) in layout.items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if count == 0:
+            array = np.empty(shape, dtype=dtype)
+            array.flags.writeable = False
+        else:
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + offset).reshape(shape)
+        arrays[name] = array
+    return arrays
+
+
+class StringColumn:
+    # A read-only sequence of strings held as one UTF-8 byte array and the offset of each string in it, so that a
+    # frozen repository doesn't keep a Python object per string.
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    @staticmethod
+    def arrays(strings):
+        """ Returns the (offsets, data) arrays holding strings. """
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[self._offsets[i]:self._offsets[i + 1]].tobytes().decode('utf-8')
+
+
+class GrowingStringColumn(StringColumn):
+    # A StringColumn that strings can be appended to. Its bytes are held in a bytearray and its offsets in an array,
+    # which keep room to spare at the end as a list does.
+
+    def __init__(self):
+        super().__init__(array.array('q', [0]), bytearray())
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._data[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    def append(self, string: str):
+        self._data += string.encode('utf-8')
+        self._offsets.append(len(self._data))
+
+
+class KeyIndex:
+    # A read-only mapping from the keys of a sequence to their positions in it, found by binary search through the
+    # positions in key order rather than held in a dict.
+
+    def __init__(self, keys, order):
+        self._keys = keys
+        self._order = order
+
+    def _search(self, key) -> int:
+        # The index in the order of the first position whose key isn't less than key.
+        low, high = 0, len(self._order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._keys[int(self._order[middle])] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, key, default=None):
+        low = self._search(key)
+        if low < len(self._order) and self._keys[int(self._order[low])] == key:
+            return int(self._order[low])
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+
+class GrowingKeyIndex(KeyIndex):
+    # A KeyIndex over a sequence that keys are appended to, e.g. a GrowingStringColumn. Keys added since the order was
+    # last merged are held in a dict until merge() is called, so that adding one doesn't move the whole order.
+
+    def __init__(self, keys):
+        super().__init__(keys, np.empty(0, dtype=np.int64))
+        self._recent = dict()
+
+    def get(self, key, default=None):
+        position = self._recent.get(key)
+        if position is not None:
+            return position
+        return super().get(key, default)
+
+    def add(self, key, position: int):
+        """ Records that key is at position of the sequence; keys must not be added twice. """
+        self._recent[key] = position
+
+    def merge(self):
+        """ Merges the keys added since the last merge into the order. """
+        if len(self._recent) * 64 >= len(self._order):
+            # Many keys: sort them all.
+            positions = list(self._recent.values()) + self._order.tolist()
+            self._order = np.array(sorted(positions, key=self._keys.__getitem__), dtype=np.int64)
+        elif self._recent:
+            # A few keys: each is placed by a binary search.
+            keys = sorted(self._recent)
+            self._order = np.insert(self._order, [self._search(key) for key in keys],
+                                    [self._recent[key] for key in keys])
+        self._recent.clear()
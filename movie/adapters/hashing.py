@@ -0,0 +1,19 @@
+from multiprocessing import Pool
+from typing import Iterable
+
+from werkzeug.security import generate_password_hash
+
+
+def hash_passwords(passwords: Iterable[str], processes: int = None, chunksize: int = 8):
+    """ Yields the hash of each password, in the order the passwords are given.
+
+    With more than one process the hashing is spread across a process pool; otherwise the passwords are hashed
+    one at a time in the calling process.
+    """
+    if processes is None or processes <= 1:
+        for password in passwords:
+            yield generate_password_hash(password)
+        return
+
+    with Pool(processes) as pool:
+        yield from pool.imap(generate_password_hash, passwords, chunksize)
@@ -0,0 +1,88 @@
+import csv
+from collections import namedtuple
+from itertools import islice
+from typing import Iterator
+
+# Rows parsed per batch. Memory use while ingesting is bounded by the batch size and the number of distinct names.
+BATCH_SIZE = 1000
+
+# Columns of Data1000Movies.csv holding comma separated lists of names, by entity.
+ENTITY_COLUMNS = (('genre', 2), ('director', 4), ('actor', 5))
+
+MovieRecord = namedtuple('MovieRecord', [
+    'rank', 'title', 'description', 'year', 'runtime', 'rating', 'votes', 'revenue', 'metascore',
+    'genres', 'directors', 'actors'
+])
+
+# movies: MovieRecords of the batch, in file order.
+# entities: per entity, the (id, name) pairs first seen in the batch. Ids count from 1 in the order names are seen.
+# links: per entity, (movie rank, entity id) pairs, in file order with each movie's names sorted.
+MovieBatch = namedtuple('MovieBatch', ['movies', 'entities', 'links'])
+
+
+def to_number(value: str, convert):
+    try:
+        return convert(value)
+    except ValueError:
+        # Values such as 'N/A' are read as missing.
+        return None
+
+
+def split_names(value: str):
+    return tuple(sorted({name.strip() for name in value.split(',')} - {''}))
+
+
+def movie_record(row) -> MovieRecord:
+    # int() and float() ignore surrounding white space, so only the text columns are stripped.
+    return MovieRecord(
+        rank=int(row[0]),
+        title=row[1].strip(),
+        description=row[3].strip(),
+        year=to_number(row[6], int),
+        runtime=to_number(row[7], int),
+        rating=to_number(row[8], float),
+        votes=to_number(row[9], int),
+        revenue=to_number(row[10], float),
+        metascore=to_number(row[11], int),
+        genres=split_names(row[2]),
+        directors=split_names(row[4]),
+        actors=split_names(row[5])
+    )
+
+
+def read_movie_batches(filename: str, batch_size: int = BATCH_SIZE) -> Iterator[MovieBatch]:
+    """ Yields the movies of a Data1000Movies.csv file as MovieBatches of at most batch_size movies.
+
+    The file is read one batch at a time, and each genre, director and actor name is given an id the first time it
+    is seen, so callers can load movies, entities and the links between them batch by batch.
+    """
+    entity_ids = {entity: dict() for entity, _ in ENTITY_COLUMNS}
+
+    with open(filename, encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+
+        # Skip the header line.
+        next(reader)
+
+        while True:
+            movies = [movie_record(row) for row in islice(reader, batch_size)]
+            if not movies:
+                return
+
+            entities = {entity: list() for entity in entity_ids}
+            links = {entity: list() for entity in entity_ids}
+            for movie in movies:
+                for entity, ids in entity_ids.items():
+                    for name in getattr(movie, entity + 's'):
+                        entity_id = ids.get(name)
+                        if entity_id is None:
+                            entity_id = ids[name] = len(ids) + 1
+                            entities[entity].append((entity_id, name))
+                        links[entity].append((movie.rank, entity_id))
+            yield MovieBatch(movies, entities, links)
+
+
+def read_movie_records(filename: str, batch_size: int = BATCH_SIZE) -> Iterator[MovieRecord]:
+    """ Yields the movies of a Data1000Movies.csv file as MovieRecords, in file order. """
+    for batch in read_movie_batches(filename, batch_size):
+        yield from batch.movies
@@ -1,13 +1,20 @@
 import csv
+import functools
+import hashlib
 import os
+import pickle
+import threading
 from datetime import date, datetime
 from typing import List
 
-from bisect import insort_left, bisect_left
+from bisect import insort_left, bisect_left, bisect_right
+from contextlib import contextmanager
+from itertools import tee
 
-from werkzeug.security import generate_password_hash
-
-from movie.adapters.repository import AbstractRepository
+from movie.adapters.hashing import hash_passwords
+from movie.adapters.ingest import read_movie_batches
+from movie.adapters.repository import AbstractRepository, RepositoryException, LruDict, MAX_CACHED_ENTITIES
+from movie.adapters.search_index import SearchIndex
 from movie.domain.model import User, Movie, Actor, Genre, Review, Director, make_genre_association, make_actor_association, make_review, make_director_association
 
 
@@ -15,28 +22,63 @@ class MemoryRepository(AbstractRepository):
     # Articles ordered by date, not id. id is assumed unique.
 
     def __init__(self):
+        super().__init__()
         self._movies = list()
         self._movies_index = dict()
+        self._movies_by_year = dict()
+        self._years = list()
         self._genres = list()
+        self._genres_index = dict()
         self._actors = list()
+        self._actors_index = dict()
         self._directors = list()
+        self._directors_index = dict()
         self._users = list()
+        self._users_index = dict()
         self._reviews = list()
+        self._search_index = SearchIndex()
+
+        # Sorted movie ranks per (entity, name) of the most recently used names with movies, built on demand and
+        # dropped whenever movies or entities are added.
+        self._entity_ranks = LruDict(MAX_CACHED_ENTITIES)
 
     def rr(self):
         return self._movies[0]
 
+    @contextmanager
+    def unit_of_work(self):
+        # Objects are stored as they are added, so there is nothing to defer.
+        yield self
+
+    def catalogue_loaded(self):
+        # Called by the loaders once the movies, genres, actors and directors are in, before the users and reviews.
+        pass
+
     def add_user(self, user: User):
         self._users.append(user)
+        # Keep the first User registered under a username, as a linear search would.
+        self._users_index.setdefault(user.user_name, user)
+        self._changed()
 
     def get_user(self, username) -> User:
-        return next((user for user in self._users if user.user_name == username), None)
+        return self._users_index.get(username)
 
     def add_movie(self, movie: Movie):
         insort_left(self._movies, movie)
         self._movies_index[movie.rank] = movie
+        self._entity_ranks.clear()
 
-    def get_movie(self, rank: int) -> Movie:
+        # Bucket the Movie by year, keeping each bucket in the same order as self._movies.
+        if movie.year not in self._movies_by_year:
+            self._movies_by_year[movie.year] = list()
+            if movie.year is not None:
+                insort_left(self._years, movie.year)
+        insort_left(self._movies_by_year[movie.year], movie)
+
+        self._search_index.add(movie.rank, movie.title, movie.description)
+        self._entity_added('movie')
+
+    def get_movie(self, rank: int, fetch_plan: str = None) -> Movie:
         movie = None
 
         try:
@@ -47,26 +89,15 @@ class MemoryRepository(AbstractRepository):
         return movie
 
     def get_movies_by_year(self, y) -> List[Movie]:
-        target_movie = Movie(
-            name=None,
-            year1=y,
-            rank=None,
-        )
-        matching_movie = list()
-
-        try:
-            for movie in self._movies:
-                if movie.year == y:
-                    matching_movie.append(movie)
-        except ValueError:
-            # No articles for specified date. Simply return an empty list.
-            pass
-
-        return matching_movie
+        # Return a copy of the year's bucket; an empty list if there are no Movies for year y.
+        return list(self._movies_by_year.get(y, ()))
 
     def get_number_of_movies(self):
         return len(self._movies)
 
+    def get_movie_ranks(self) -> List[int]:
+        return sorted(self._movies_index)
+
     def get_first_movie(self):
         movie = None
 
@@ -81,7 +112,10 @@ class MemoryRepository(AbstractRepository):
             movie = self._movies[-1]
         return movie
 
-    def get_movies_by_rank(self, rank_list):
+    def keeps_movies(self) -> bool:
+        return True
+
+    def get_movies_by_rank(self, rank_list, fetch_plan: str = None):
         # Strip out any ids in id_list that don't represent Article ids in the repository.
         existing_ranks = [rank for rank in rank_list if rank in self._movies_index]
 
@@ -91,13 +125,16 @@ class MemoryRepository(AbstractRepository):
 
     def add_genre(self, genre: Genre):
         self._genres.append(genre)
+        self._genres_index.setdefault(genre.genre_name, genre)
+        self._entity_added('genre')
+        self._entity_ranks.clear()
 
     def get_genre(self) -> List[Genre]:
         return self._genres
 
     def get_movie_ranks_for_genre(self, genre_name: str):
-        # Linear search, to find the first occurrence of a Tag with the name tag_name.
-        genre = next((genre for genre in self._genres if genre.genre_name == genre_name), None)
+        # Look up the first Genre added with the name genre_name.
+        genre = self._genres_index.get(genre_name)
 
         # Retrieve the ids of articles associated with the Tag.
         if genre is not None:
@@ -110,13 +147,16 @@ class MemoryRepository(AbstractRepository):
 
     def add_actor(self, actor:Actor):
         self._actors.append(actor)
+        self._actors_index.setdefault(actor.actor_full_name, actor)
+        self._entity_added('actor')
+        self._entity_ranks.clear()
 
     def get_actor(self) -> List[Actor]:
         return self._actors
 
     def get_movie_ranks_for_actor(self, actor_name: str):
-        # Linear search, to find the first occurrence of a Tag with the name tag_name.
-        actor = next((actor for actor in self._actors if actor.actor_full_name == actor_name), None)
+        # Look up the first Actor added with the name actor_name.
+        actor = self._actors_index.get(actor_name)
 
         # Retrieve the ids of articles associated with the Tag.
         if actor is not None:
@@ -129,14 +169,16 @@ class MemoryRepository(AbstractRepository):
 
     def add_director(self, director: Director):
         self._directors.append(director)
+        self._directors_index.setdefault(director.director_full_name, director)
+        self._entity_added('director')
+        self._entity_ranks.clear()
 
     def get_director(self) -> List[Director]:
         return self._directors
 
     def get_movie_ranks_for_director(self, director_name: str):
-        # Linear search, to find the first occurrence of a Tag with the name tag_name.
-        director = next((director for director in self._directors if director.director_full_name == director_name),
-                        None)
+        # Look up the first Director added with the name director_name.
+        director = self._directors_index.get(director_name)
 
         # Retrieve the ids of articles associated with the Tag.
         if director is not None:
@@ -147,34 +189,55 @@ class MemoryRepository(AbstractRepository):
 
         return movie_ranks
 
+    def _sorted_ranks_for(self, entity: str, name: str):
+        key = (entity, name)
+        ranks = self._entity_ranks.get(key)
+        if ranks is None:
+            if entity == 'genre':
+                ranks = self.get_movie_ranks_for_genre(name)
+            elif entity == 'actor':
+                ranks = self.get_movie_ranks_for_actor(name)
+            elif entity == 'director':
+                ranks = self.get_movie_ranks_for_director(name)
+            else:
+                raise RepositoryException('Unknown entity ' + entity)
+            ranks = sorted(ranks)
+            if ranks:
+                # Names without movies, such as made up ones, aren't kept.
+                self._entity_ranks[key] = ranks
+        return ranks
+
+    def get_movies_page(self, entity: str, name: str, after_rank: int = None, limit: int = 3,
+                        descending: bool = False, fetch_plan: str = None) -> List[Movie]:
+        ranks = self._sorted_ranks_for(entity, name)
+
+        if not descending:
+            start = 0 if after_rank is None else bisect_right(ranks, after_rank)
+            page_ranks = ranks[start:start + limit]
+        else:
+            end = len(ranks) if after_rank is None else bisect_left(ranks, after_rank)
+            page_ranks = ranks[max(0, end - limit):end][::-1]
+
+        return [self._movies_index[rank] for rank in page_ranks]
+
+    def get_number_of_movies_for(self, entity: str, name: str) -> int:
+        return len(self._sorted_ranks_for(entity, name))
+
     def get_year_of_previous_movie(self, movie: Movie):
         max_year = None
-        prev_year_list = []
-        try:
-            for stored_movie in self._movies:
-                if stored_movie.year < movie.year:
-                    prev_year_list.append(stored_movie.year)
-                    # break
-            if len(prev_year_list) > 0:
-                max_year = max(prev_year_list)
-        except ValueError:
-            # No earlier articles, so return None.
-            pass
+
+        # self._years holds the distinct years in ascending order.
+        index = bisect_left(self._years, movie.year)
+        if index > 0:
+            max_year = self._years[index - 1]
         return max_year
 
     def get_year_of_next_movie(self, movie: Movie):
         min_year = None
-        next_year_list = []
-        try:
-            for stored_movie in self._movies:
-                if stored_movie.year > movie.year:
-                    next_year_list.append(stored_movie.year)
-                    #break
-            if len(next_year_list)>0:
-                min_year = min(next_year_list)
-        except ValueError:
-            # No earlier articles, so return None.
-            pass
+
+        index = bisect_right(self._years, movie.year)
+        if index < len(self._years):
+            min_year = self._years[index]
         return min_year
 
     def movie_index(self, movie: Movie):
@@ -185,25 +248,130 @@ class MemoryRepository(AbstractRepository):
 
     def get_movies_by_director(self, d) -> List[Director]:
         matching_movie = list()
-        try:
-            for director in self._directors:
-                if director.director_full_name == d:
-                    for movie in director.directed_movie:
-                        matching_movie.append(movie)
-        except ValueError:
-            # No articles for specified date. Simply return an empty list.
-            pass
+
+        director = self._directors_index.get(d)
+        if director is not None:
+            matching_movie = list(director.directed_movie)
 
         return matching_movie
 
+    def search_movie_ranks(self, query: str) -> List[int]:
+        return self._search_index.search(query)
+
     def add_review(self, review: Review):
         super().add_review(review)
         self._reviews.append(review)
+        self._changed()
 
     def get_reviews(self):
         return self._reviews
 
 
+class LazyMemoryRepository(MemoryRepository):
+    """ A MemoryRepository filled by a loader, either in a background thread or by the first caller to use it.
+
+    The application can start serving before the data is loaded. Loading is done in two stages: the movies, genres,
+    actors and directors first, then the users and reviews. Methods that only read the former wait for the first stage,
+    so listings are served while users and reviews load, showing the reviews loaded so far. Every other method waits
+    for loading to finish. is_ready() tells whether the whole repository is loaded.
+    """
+
+    def __init__(self, loader):
+        super().__init__()
+        # Called with the repository to fill it, e.g. populate with the data path bound.
+        self._loader = loader
+        self._loaded = threading.Event()
+        self._catalogue_loaded = threading.Event()
+        self._loading_lock = threading.Lock()
+        self._loading_thread = None
+        self._load_error = None
+
+    def start_loading(self):
+        """ Starts loading the repository in a background thread, unless loading has already started. """
+        with self._loading_lock:
+            if self._loading_thread is None:
+                self._loading_thread = threading.Thread(target=self._load, name='repository-loader', daemon=True)
+                self._loading_thread.start()
+
+    def is_ready(self) -> bool:
+        return self._loaded.is_set() and self._load_error is None
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """ Waits up to timeout seconds (forever if None) for loading to finish, and returns is_ready(). """
+        self._loaded.wait(timeout)
+        return self.is_ready()
+
+    def catalogue_loaded(self):
+        self._catalogue_loaded.set()
+
+    def _load(self):
+        try:
+            self._loader(self)
+        except Exception as error:
+            self._load_error = error
+        finally:
+            self._catalogue_loaded.set()
+            self._loaded.set()
+
+    def _ensure_loaded(self, loaded: threading.Event = None):
+        # Waits for loaded, by default the end of loading. The loader's own calls go straight through.
+        if loaded is None:
+            loaded = self._loaded
+        if not loaded.is_set() and threading.current_thread() is not self._loading_thread:
+            with self._loading_lock:
+                load_here = self._loading_thread is None
+                if load_here:
+                    self._loading_thread = threading.current_thread()
+            if load_here:
+                # Nothing started loading in the background, so the first caller loads the repository.
+                self._load()
+            loaded.wait()
+
+        if self._load_error is not None:
+            raise RepositoryException('The repository could not be loaded') from self._load_error
+
+
+# The methods of a LazyMemoryRepository that only read movies, genres, actors and directors.
+CATALOGUE_METHODS = frozenset((
+    'get_version', 'get_last_modified', 'get_entity_version', 'keeps_movies', 'get_movie', 'get_movies_by_year',
+    'get_number_of_movies', 'get_movie_ranks', 'get_first_movie', 'get_last_movie', 'get_movies_by_rank',
+    'get_movie_rows', 'get_genre', 'get_movie_ranks_for_genre', 'get_actor', 'get_movie_ranks_for_actor',
+    'get_director', 'get_movie_ranks_for_director', 'get_movies_page', 'get_number_of_movies_for',
+    'get_year_of_previous_movie', 'get_year_of_next_movie', 'movie_index', 'get_movies_by_director',
+    'search_movie_ranks',
+))
+
+
+def _after_loading(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._ensure_loaded()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _after_loading_catalogue(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._ensure_loaded(self._catalogue_loaded)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Every public repository method of a LazyMemoryRepository waits for loading to finish, or for its first stage.
+for _name, _method in list(vars(AbstractRepository).items()) + list(vars(MemoryRepository).items()):
+    if callable(_method) and not _name.startswith('_') and _name not in vars(LazyMemoryRepository):
+        _wrap = _after_loading_catalogue if _name in CATALOGUE_METHODS else _after_loading
+        setattr(LazyMemoryRepository, _name, _wrap(getattr(MemoryRepository, _name)))
+
+
+ENTITY_ASSOCIATIONS = (
+    ('genre', Genre, make_genre_association),
+    ('actor', Actor, make_actor_association),
+    ('director', Director, make_director_association)
+)
+
+
 def read_csv_file(filename: str):
     with open(filename, encoding='utf-8-sig') as infile:
         reader = csv.reader(infile)
@@ -219,69 +387,38 @@ def read_csv_file(filename: str):
 
 
 def load_movies_and_genres_and_actors_and_directors(data_path: str, repo: MemoryRepository):
-    genres = dict()
-    actors = dict()
-    directors = dict()
-    for data_row in read_csv_file(os.path.join(data_path, 'Data1000Movies.csv')):
-
-        movie_key = int(data_row[0])
-        number_of_genres = 2
-        movie_genres = sorted(data_row[number_of_genres].strip().split(','))
-        number_of_actors = 5
-        movie_actors = sorted(data_row[number_of_actors].strip().split(','))
-        number_of_directors = 4
-        movie_directors = sorted(data_row[number_of_directors].strip().split(','))
-
-        # Add any new tags; associate the current article with tags.
-        for genre in movie_genres:
-            if genre not in genres.keys():
-                genres[genre] = list()
-            genres[genre].append(movie_key)
-        #del data_row[-number_of_genres:]
-        for actor in movie_actors:
-            if actor not in actors.keys():
-                actors[actor] = list()
-            actors[actor].append(movie_key)
-
-        for director in movie_directors:
-            if director not in directors.keys():
-                directors[director] = list()
-            directors[director].append(movie_key)
-        # Create Article object.
-
-        movie = Movie(name=data_row[1], year1=int(data_row[6]), rank=int(data_row[0]))
-
-        # Add the Article to the repository.
-        repo.add_movie(movie)
-
-    # Create Tag objects, associate them with Articles and add them to the repository.
-    for genre_name in genres.keys():
-        genre = Genre(genre_name)
-        for movie_rank in genres[genre_name]:
-            movie = repo.get_movie(movie_rank)
-            make_genre_association(movie, genre)
+    # Genres, actors and directors by id, created when they're first seen and added once every Movie is linked.
+    entities = {'genre': dict(), 'actor': dict(), 'director': dict()}
+
+    for batch in read_movie_batches(os.path.join(data_path, 'Data1000Movies.csv')):
+        for record in batch.movies:
+            movie = Movie(name=record.title, year1=record.year, rank=record.rank)
+            movie.description = record.description
+            repo.add_movie(movie)
+
+        for entity, entity_class, make_association in ENTITY_ASSOCIATIONS:
+            for entity_id, name in batch.entities[entity]:
+                entities[entity][entity_id] = entity_class(name)
+            for movie_rank, entity_id in batch.links[entity]:
+                make_association(repo.get_movie(movie_rank), entities[entity][entity_id])
+
+    for genre in entities['genre'].values():
         repo.add_genre(genre)
-
-    for actor_name in actors.keys():
-        actor = Actor(actor_name)
-        for movie_rank in actors[actor_name]:
-            movie = repo.get_movie(movie_rank)
-            make_actor_association(movie, actor)
+    for actor in entities['actor'].values():
         repo.add_actor(actor)
-
-    for director_name in directors.keys():
-        director = Director(director_name)
-        for movie_rank in directors[director_name]:
-            movie = repo.get_movie(movie_rank)
-            make_director_association(movie, director)
+    for director in entities['director'].values():
         repo.add_director(director)
 
 
-def load_users(data_path: str, repo: MemoryRepository):
+def load_users(data_path: str, repo: MemoryRepository, hash_processes: int = None):
     users = dict()
 
-    for data_row in read_csv_file(os.path.join(data_path, 'users.csv')):
-        user = User(name=data_row[1], password=generate_password_hash(data_row[2]))
+    # Hash the passwords, possibly across a process pool, while still adding users in file order.
+    data_rows, password_rows = tee(read_csv_file(os.path.join(data_path, 'users.csv')))
+    password_hashes = hash_passwords((data_row[2] for data_row in password_rows), hash_processes)
+
+    for data_row, password_hash in zip(data_rows, password_hashes):
+        user = User(name=data_row[1], password=password_hash)
         repo.add_user(user)
         users[data_row[0]] = user
     return users
@@ -298,12 +435,130 @@ def load_reviews(data_path: str, repo: MemoryRepository, users):
         repo.add_review(review)
 
 
-def populate(data_path: str, repo: MemoryRepository):
+def populate(data_path: str, repo: MemoryRepository, hash_processes: int = None):
     # Load articles and tags into the repository.
     load_movies_and_genres_and_actors_and_directors(data_path, repo)
+    repo.catalogue_loaded()
 
     # Load users into the repository.
-    users = load_users(data_path, repo)
+    users = load_users(data_path, repo, hash_processes)
 
     # Load comments into the repository.
     load_reviews(data_path, repo, users)
+
+
+# ============================================
+# Snapshots of a populated repository
+# ============================================
+
+SNAPSHOT_MAGIC = b'MOVIEREPO'
+SNAPSHOT_VERSION = 3
+DATA_FILES = ('Data1000Movies.csv', 'users.csv', 'reviews.csv')
+
+
+def data_checksum(data_path: str) -> bytes:
+    # Digest of the source CSV files; a snapshot is only valid for the files it was built from.
+    digest = hashlib.sha256()
+    for filename in DATA_FILES:
+        with open(os.path.join(data_path, filename), 'rb') as infile:
+            digest.update(infile.read())
+    return digest.digest()
+
+
+def save_snapshot(repo: MemoryRepository, filename: str, checksum: bytes):
+    # Flatten the object graph into plain tuples, so that loading doesn't recurse through the associations.
+    payload = {
+        'movies': [(movie.rank, movie.title, movie.year, movie.description, movie.runtime_minutes)
+                   for movie in repo._movies],
+        'genres': [(genre.genre_name, [movie.rank for movie in genre.genre_movie]) for genre in repo._genres],
+        'actors': [(actor.actor_full_name, [movie.rank for movie in actor.actor_movie]) for actor in repo._actors],
+        'directors': [(director.director_full_name, [movie.rank for movie in director.directed_movie])
+                      for director in repo._directors],
+        'users': [(user.user_name, user.password) for user in repo._users],
+        'reviews': [(review.user.user_name, review.movie.rank, review.review_text, review.rating, review.timestamp)
+                    for review in repo._reviews],
+    }
+
+    # Write to a temporary file first, so that other workers never read a partial snapshot. Each process writes its
+    # own temporary file, as several workers may rebuild a stale snapshot at once.
+    temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        with open(temp_filename, 'wb') as outfile:
+            outfile.write(SNAPSHOT_MAGIC)
+            outfile.write(SNAPSHOT_VERSION.to_bytes(2, 'big'))
+            outfile.write(checksum)
+            pickle.dump(payload, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+def load_snapshot(filename: str, checksum: bytes, repo: MemoryRepository) -> bool:
+    # Returns False, leaving repo untouched, if the snapshot is missing, stale or from another version.
+    try:
+        with open(filename, 'rb') as infile:
+            header = infile.read(len(SNAPSHOT_MAGIC) + 2 + len(checksum))
+            if header != SNAPSHOT_MAGIC + SNAPSHOT_VERSION.to_bytes(2, 'big') + checksum:
+                return False
+            payload = pickle.load(infile)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False
+
+    for rank, title, year, description, runtime in payload['movies']:
+        movie = Movie(name=title, year1=year, rank=rank)
+        movie.description = description
+        if runtime is not None:
+            movie.runtime_minutes = runtime
+        repo.add_movie(movie)
+
+    # The associations were checked when the snapshot was taken, so link both sides directly.
+    for genre_name, ranks in payload['genres']:
+        genre = Genre(genre_name)
+        for rank in ranks:
+            movie = repo.get_movie(rank)
+            movie.add_genre(genre)
+            genre.add_genre_movie(movie)
+        repo.add_genre(genre)
+
+    for actor_name, ranks in payload['actors']:
+        actor = Actor(actor_name)
+        for rank in ranks:
+            movie = repo.get_movie(rank)
+            movie.add_actor(actor)
+            actor.add_actor_movie(movie)
+        repo.add_actor(actor)
+
+    for director_name, ranks in payload['directors']:
+        director = Director(director_name)
+        for rank in ranks:
+            movie = repo.get_movie(rank)
+            movie.add_director(director)
+            director.add_movie(movie)
+        repo.add_director(director)
+    repo.catalogue_loaded()
+
+    for user_name, password in payload['users']:
+        repo.add_user(User(name=user_name, password=password))
+
+    for user_name, rank, review_text, rating, timestamp in payload['reviews']:
+        review = make_review(
+            review_text=review_text,
+            user=repo.get_user(user_name),
+            movie=repo.get_movie(rank),
+            review_num=rating if rating is not None else 0,
+            timestamp=timestamp
+        )
+        repo.add_review(review)
+
+    return True
+
+
+def populate_from_snapshot(data_path: str, repo: MemoryRepository, filename: str, hash_processes: int = None):
+    # Load the snapshot if it was built from the current CSV files, otherwise populate from the CSV files and
+    # write a fresh snapshot.
+    checksum = data_checksum(data_path)
+    if not load_snapshot(filename, checksum, repo):
+        populate(data_path, repo, hash_processes)
+        save_snapshot(repo, filename, checksum)
@@ -1,6 +1,8 @@
+import types
+
 from sqlalchemy import (
     Table, MetaData, Column, Integer, String, Date, DateTime,
-    ForeignKey
+    ForeignKey, Index, event, inspect
 )
 from sqlalchemy.orm import mapper, relationship
 
@@ -21,6 +23,7 @@ reviews = Table(
     Column('user_id', ForeignKey('users.id')),
     Column('movie_rank', ForeignKey('movies.rank')),
     Column('review', String(1024), nullable=False),
+    Column('rating', Integer),
     Column('timestamp', DateTime, nullable=False)
 )
 
@@ -50,28 +53,140 @@ movie_genres = Table(
     Column('genre_id', ForeignKey('genres.id'))
 )
 
+actors = Table(
+    'actors', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(255), nullable=False)
+)
+
+movie_actors = Table(
+    'movie_actors', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('movie_rank', ForeignKey('movies.rank')),
+    Column('actor_id', ForeignKey('actors.id'))
+)
+
+directors = Table(
+    'directors', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(255), nullable=False)
+)
+
+movie_directors = Table(
+    'movie_directors', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('movie_rank', ForeignKey('movies.rank')),
+    Column('director_id', ForeignKey('directors.id'))
+)
+
+# A version per kind of row, raised by the repository in the transaction that inserts rows of that kind, so that
+# every process can tell what has changed from a few rows rather than the tables themselves.
+versions = Table(
+    'versions', metadata,
+    Column('kind', String(16), primary_key=True),
+    Column('version', Integer, nullable=False)
+)
+
+# Indexes for the lookups the repository makes. Each composite index also serves lookups on its first column, and
+# lets the query read the second column from the index: movie_genres by genre in rank order, and by movie.
+Index('ix_movies_year', movies.c.year)
+Index('ix_genres_name', genres.c.name)
+Index('ix_movie_genres_genre_id_movie_rank', movie_genres.c.genre_id, movie_genres.c.movie_rank)
+Index('ix_movie_genres_movie_rank_genre_id', movie_genres.c.movie_rank, movie_genres.c.genre_id)
+Index('ix_actors_name', actors.c.name)
+Index('ix_movie_actors_actor_id_movie_rank', movie_actors.c.actor_id, movie_actors.c.movie_rank)
+Index('ix_movie_actors_movie_rank_actor_id', movie_actors.c.movie_rank, movie_actors.c.actor_id)
+Index('ix_directors_name', directors.c.name)
+Index('ix_movie_directors_director_id_movie_rank', movie_directors.c.director_id, movie_directors.c.movie_rank)
+Index('ix_movie_directors_movie_rank_director_id', movie_directors.c.movie_rank, movie_directors.c.director_id)
+Index('ix_reviews_movie_rank', reviews.c.movie_rank)
+Index('ix_reviews_user_id', reviews.c.user_id)
+
+
+def upgrade_schema(engine):
+    """ Brings the schema of an existing database up to date with metadata.
+
+    Missing tables, columns and indexes are created and everything else is left as it is, so this is safe to run on
+    every start. Columns are added without constraints, so new columns of existing tables must be nullable.
+    """
+    metadata.create_all(engine)  # Creates missing tables, along with their indexes.
+
+    inspector = inspect(engine)
+    for table in metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                engine.execute(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'
+                )
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(engine)
+
+
+# The __slots__ descriptors of the mapped domain classes. Mapping replaces those named below with instrumented
+# attributes, and disposing of the mappers (clear_mappers) deletes them, which would leave the classes storing their
+# fields in __dict__. They are put back when each class is uninstrumented.
+_SLOT_DESCRIPTORS = {
+    cls: {name: value for name, value in vars(cls).items() if isinstance(value, types.MemberDescriptorType)}
+    for cls in (model.User, model.Review, model.Movie, model.Genre, model.Actor, model.Director)
+}
+
+
+def _restore_slots(cls):
+    for name, descriptor in _SLOT_DESCRIPTORS[cls].items():
+        if name not in vars(cls):
+            setattr(cls, name, descriptor)
+
+
+for _cls in _SLOT_DESCRIPTORS:
+    event.listen(_cls, 'class_uninstrument', _restore_slots)
+
 
 def map_model_to_tables():
+    # Properties are keyed by the domain classes' private (name-mangled) attribute names, so that the loaded values and
+    # collections are the ones the domain properties read. Loader options in database_repository refer to them too.
     mapper(model.User, users, properties={
-        '_username': users.c.username,
-        '_password': users.c.password,
-        '_reviews': relationship(model.Review, backref='_user')
+        '_User__user_name': users.c.username,
+        '_User__password': users.c.password,
+        '_User__reviews': relationship(model.Review, backref='_Review__user_name')
     })
     mapper(model.Review, reviews, properties={
-        '_review': reviews.c.review,
-        '_timestamp': reviews.c.timestamp
+        '_Review__review_text': reviews.c.review,
+        '_Review__rating': reviews.c.rating,
+        '_Review__timestamp': reviews.c.timestamp
     })
     movies_mapper = mapper(model.Movie, movies, properties={
-        '_rank': movies.c.rank,
-        '_year': movies.c.year,
-        '_title': movies.c.title,
-        '_reviews': relationship(model.Review, backref='_movie')
+        '_Movie__rank': movies.c.rank,
+        '_Movie__year': movies.c.year,
+        '_Movie__title': movies.c.title,
+        '_Movie__description': movies.c.discription,
+        '_Movie__runtime_minutes': movies.c.runtime,
+        '_Movie__reviews': relationship(model.Review, backref='_Review__movie')
     })
     mapper(model.Genre, genres, properties={
-        '_genre_name': genres.c.name,
-        '_genred_movie': relationship(
+        '_Genre__genre_name': genres.c.name,
+        '_Genre__movie_list': relationship(
             movies_mapper,
             secondary=movie_genres,
-            backref="_genres"
+            backref="_Movie__genres"
+        )
+    })
+    mapper(model.Actor, actors, properties={
+        '_Actor__actor_name': actors.c.name,
+        '_Actor__movie_list': relationship(
+            movies_mapper,
+            secondary=movie_actors,
+            backref="_Movie__actors"
+        )
+    })
+    mapper(model.Director, directors, properties={
+        '_Director__name': directors.c.name,
+        '_Director__movie_list': relationship(
+            movies_mapper,
+            secondary=movie_directors,
+            backref="_Movie__director"
         )
     })
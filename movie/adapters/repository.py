@@ -1,6 +1,9 @@
 import abc
+import itertools
+import threading
+from collections import namedtuple, OrderedDict
 from typing import List
-from datetime import date
+from datetime import date, datetime
 
 from movie.domain.model import User, Movie, Genre, Actor, Review, Director
 
@@ -14,8 +17,119 @@ class RepositoryException(Exception):
         pass
 
 
+# Plain rows holding what listing pages show of a Movie, so that they can be read without building domain objects.
+ReviewRow = namedtuple('ReviewRow', ['username', 'movie_rank', 'review_text', 'timestamp', 'rating'])
+GenreRow = namedtuple('GenreRow', ['name', 'movie_ranks'])
+MovieRow = namedtuple('MovieRow', ['rank', 'year', 'title', 'genres', 'reviews'])
+
+
+def movie_row(movie: Movie) -> MovieRow:
+    return MovieRow(
+        movie.rank, movie.year, movie.title,
+        tuple(GenreRow(genre.genre_name, tuple(genre_movie.rank for genre_movie in genre.genre_movie)) for genre in movie.genres),
+        tuple(ReviewRow(review.user.user_name, movie.rank, review.review_text, review.timestamp, review.rating)
+              for review in movie.reviews)
+    )
+
+
+# The most names whose movie ranks or counts a repository keeps.
+MAX_CACHED_ENTITIES = 1024
+
+
+class LruDict:
+    # A dict of at most capacity entries, dropping the least recently used to make room, for caches keyed by names
+    # that come from requests.
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _utc_now() -> datetime:
+    # HTTP dates have a resolution of one second.
+    return datetime.utcnow().replace(microsecond=0)
+
+
 class AbstractRepository(abc.ABC):
 
+    def __init__(self):
+        self._entity_versions = {'movie': 0, 'genre': 0, 'actor': 0, 'director': 0}
+        # next() on a count is atomic, so concurrent adds each get a new version.
+        self._versions = itertools.count(1)
+        self._version = 0
+        self._last_modified = _utc_now()
+
+    def get_version(self) -> int:
+        """ Returns a counter that changes whenever anything is added to the repository.
+
+        Callers can tell from it whether data they read from the repository earlier is still current.
+        """
+        return self._version
+
+    def get_last_modified(self) -> datetime:
+        """ Returns when the repository last changed, or was created, as a naive UTC datetime to the second. """
+        return self._last_modified
+
+    def _changed(self):
+        # Called by every add_* once the object is stored, so that a reader seeing the new version sees the object.
+        self._last_modified = _utc_now()
+        self._version = next(self._versions)
+
+    def get_entity_version(self, kind: str) -> int:
+        """ Returns a counter for the entities of kind ('movie', 'genre', 'actor' or 'director') in the repository.
+
+        The counter changes whenever an entity of that kind is added, so callers can cache data derived from them.
+        """
+        return self._entity_versions[kind]
+
+    def _entity_added(self, kind: str):
+        self._entity_versions[kind] += 1
+        self._changed()
+
+    def is_ready(self) -> bool:
+        """ Returns whether the repository has loaded its data, so that calls to it won't wait for loading. """
+        return True
+
+    def keeps_movies(self) -> bool:
+        """ Returns whether the repository returns the same Movie objects for as long as it lives.
+
+        What is derived from such Movies can be memoised. Repositories that build Movies on each read return False.
+        """
+        return False
+
+    @abc.abstractmethod
+    def unit_of_work(self):
+        """ Returns a context manager that groups the adds made within it into one write.
+
+        Repositories that write to storage store the objects added inside the block together when it exits, and
+        discard them if it raises; the objects can be used as usual afterwards. Repositories held in memory store each
+        object as it is added, and keep it even if the block raises. Units of work may be nested, in which case the
+        inner ones join the outermost.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_user(self, user: User):
         """" Adds a User to the repository. """
@@ -35,10 +149,11 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_movie(self, rank: int) -> Movie:
+    def get_movie(self, rank: int, fetch_plan: str = None) -> Movie:
         """ Returns Article with id from the repository.
 
-        If there is no Article with the given id, this method returns None.
+        If there is no Article with the given id, this method returns None. fetch_plan names the related objects to
+        load along with the Movie; repositories that hold their objects in memory ignore it.
         """
         raise NotImplementedError
 
@@ -55,6 +170,11 @@ class AbstractRepository(abc.ABC):
         """ Returns the number of Articles in the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_movie_ranks(self) -> List[int]:
+        """ Returns the ranks of all the Movies in the repository, in ascending order. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_first_movie(self) -> Movie:
         """ Returns the first Article, ordered by date, from the repository.
@@ -72,13 +192,21 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_movies_by_rank(self, rank_list):
+    def get_movies_by_rank(self, rank_list, fetch_plan: str = None):
         """ Returns a list of Articles, whose ids match those in id_list, from the repository.
 
-        If there are no matches, this method returns an empty list.
+        If there are no matches, this method returns an empty list. fetch_plan is as for get_movie.
         """
         raise NotImplementedError
 
+    def get_movie_rows(self, rank_list) -> List[MovieRow]:
+        """ Returns a MovieRow for each Movie whose rank is in rank_list, in the order of rank_list.
+
+        Ranks that don't represent Movies in the repository are skipped. By default the rows are copied from the
+        repository's Movies; a repository backed by a database can read the columns directly instead.
+        """
+        return [movie_row(movie) for movie in self.get_movies_by_rank(rank_list, fetch_plan='listing')]
+
     @abc.abstractmethod
     def add_genre(self, genre: Genre):
         """ Adds a Tag to the repository. """
@@ -134,6 +262,22 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_movies_page(self, entity: str, name: str, after_rank: int = None, limit: int = 3,
+                        descending: bool = False, fetch_plan: str = None) -> List[Movie]:
+        """ Returns up to limit Movies linked to the 'genre', 'actor' or 'director' entity called name.
+
+        Movies are returned in ascending rank order starting after after_rank, or with descending=True, in descending
+        rank order starting before after_rank. If after_rank is None, the page starts at the first (or last) Movie.
+        fetch_plan is as for get_movie.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_number_of_movies_for(self, entity: str, name: str) -> int:
+        """ Returns the number of Movies linked to the 'genre', 'actor' or 'director' entity called name. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_year_of_previous_movie(self, movie: Movie):
         """ Returns the date of an Article that immediately precedes article.
@@ -160,6 +304,14 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def search_movie_ranks(self, query: str) -> List[int]:
+        """ Returns the ranks of Movies whose title or description match query, most relevant first.
+
+        If no Movies match, this method returns an empty list.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_review(self, review: Review):
         """ Adds a Comment to the repository.
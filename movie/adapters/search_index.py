@@ -0,0 +1,317 @@
+import heapq
+import math
+import re
+from typing import List
+
+import numpy as np
+
+from movie.adapters.frozen import StringColumn, KeyIndex
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Each title token counts this many times, so that title matches outrank description matches.
+TITLE_WEIGHT = 3
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+# A GrowingSearchIndex merges the movies added to it into its arrays once they number this fraction of the movies
+# already there, or MIN_MERGE, whichever is more.
+MERGE_FRACTION = 1 / 8
+MIN_MERGE = 256
+
+
+def tokenise(text: str) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _ranked(scores, limit: int = None) -> List[int]:
+    # Ranks ordered by descending score, then by rank.
+    if limit is None:
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    else:
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [rank for rank, score in ranked]
+
+
+class SearchIndex:
+    # An inverted index over movie titles and descriptions. Each term maps to a posting list of
+    # {movie rank: term frequency}, and queries are ranked with Okapi BM25.
+
+    def __init__(self):
+        self._postings = dict()
+        self._document_lengths = dict()
+        self._document_terms = dict()
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._document_lengths)
+
+    def add(self, rank: int, title: str, description: str = ''):
+        # Re-indexing a movie replaces its previous entry.
+        if rank in self._document_lengths:
+            self.remove(rank)
+
+        frequencies = dict()
+        for term in tokenise(title):
+            frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+        for term in tokenise(description):
+            frequencies[term] = frequencies.get(term, 0) + 1
+
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, dict())[rank] = frequency
+
+        length = sum(frequencies.values())
+        self._document_lengths[rank] = length
+        self._document_terms[rank] = tuple(frequencies)
+        self._total_length += length
+
+    def remove(self, rank: int):
+        length = self._document_lengths.pop(rank, None)
+        if length is None:
+            return
+
+        for term in self._document_terms.pop(rank):
+            posting = self._postings[term]
+            del posting[rank]
+            if len(posting) == 0:
+                del self._postings[term]
+        self._total_length -= length
+
+    def search(self, query: str, limit: int = None) -> List[int]:
+        """ Returns the ranks of movies matching any term of query, most relevant first.
+
+        Movies with equal scores are ordered by rank.
+        """
+        number_of_documents = len(self._document_lengths)
+        if number_of_documents == 0:
+            return []
+        average_length = self._total_length / number_of_documents
+
+        scores = dict()
+        for term in set(tokenise(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+
+            idf = math.log(1 + (number_of_documents - len(posting) + 0.5) / (len(posting) + 0.5))
+            for rank, frequency in posting.items():
+                length_norm = 1 - B + B * self._document_lengths[rank] / average_length
+                score = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                scores[rank] = scores.get(rank, 0.0) + score
+
+        return _ranked(scores, limit)
+
+    def arrays(self):
+        """ Returns the index as a dict of NumPy arrays, from which a FrozenSearchIndex can be built. """
+        terms = sorted(self._postings)
+        indptr = [0]
+        ranks = list()
+        frequencies = list()
+        for term in terms:
+            posting = self._postings[term]
+            ranks.extend(posting.keys())
+            frequencies.extend(posting.values())
+            indptr.append(len(ranks))
+
+        term_offsets, term_data = StringColumn.arrays(terms)
+        return {
+            'term_offsets': term_offsets,
+            'terms': term_data,
+            'indptr': np.array(indptr, dtype=np.int64),
+            'ranks': np.array(ranks, dtype=np.int64),
+            'frequencies': np.array(frequencies, dtype=np.int64),
+            'lengths': np.array([self._document_lengths[rank] for rank in ranks], dtype=np.int64),
+            'totals': np.array([len(self._document_lengths), self._total_length], dtype=np.int64),
+        }
+
+
+class FrozenSearchIndex:
+    # A read-only SearchIndex held in NumPy arrays. Terms are sorted; the posting of term i is ranks[indptr[i]:
+    # indptr[i + 1]], with the term's frequency in each movie and the length of each movie's document alongside.
+
+    def __init__(self, arrays):
+        self._terms = StringColumn(arrays['term_offsets'], arrays['terms'])
+        self._term_ids = KeyIndex(self._terms, np.arange(len(self._terms)))
+        self._indptr = arrays['indptr']
+        self._ranks = arrays['ranks']
+        self._frequencies = arrays['frequencies']
+        self._lengths = arrays['lengths']
+        self._number_of_documents, self._total_length = (int(total) for total in arrays['totals'])
+
+    def __len__(self):
+        return self._number_of_documents
+
+    def search(self, query: str, limit: int = None) -> List[int]:
+        """ Returns the ranks of movies matching any term of query, most relevant first, as SearchIndex.search does. """
+        if self._number_of_documents == 0:
+            return []
+        average_length = self._total_length / self._number_of_documents
+
+        scores = dict()
+        for term in set(tokenise(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+
+            start, end = int(self._indptr[term_id]), int(self._indptr[term_id + 1])
+            idf = math.log(1 + (self._number_of_documents - (end - start) + 0.5) / ((end - start) + 0.5))
+            frequency = self._frequencies[start:end].astype(np.float64)
+            length_norm = 1 - B + B * self._lengths[start:end] / average_length
+            term_scores = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+            for rank, score in zip(self._ranks[start:end].tolist(), term_scores.tolist()):
+                scores[rank] = scores.get(rank, 0.0) + score
+
+        return _ranked(scores, limit)
+
+
+class GrowingSearchIndex:
+    # A SearchIndex held in NumPy arrays, as a FrozenSearchIndex is, that movies can still be added to. Movies added
+    # since the arrays were last built are indexed in a SearchIndex beside them until there are enough of them to be
+    # worth merging in; a movie added again hides its postings in the arrays until then.
+
+    def __init__(self):
+        self._recent = SearchIndex()
+        self._replaced = set()
+        self._set_arrays(SearchIndex().arrays(), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def _set_arrays(self, arrays, documents, document_lengths):
+        self._arrays = arrays
+        self._terms = StringColumn(arrays['term_offsets'], arrays['terms'])
+        self._term_ids = KeyIndex(self._terms, np.arange(len(self._terms)))
+        # The ranks of the movies in the arrays, sorted, with the length of each one's document.
+        self._documents = documents
+        self._document_lengths = document_lengths
+
+    def __len__(self):
+        return len(self._documents) - len(self._replaced) + len(self._recent)
+
+    def _in_arrays(self, rank: int) -> bool:
+        i = np.searchsorted(self._documents, rank)
+        return i < len(self._documents) and self._documents[i] == rank
+
+    def add(self, rank: int, title: str, description: str = ''):
+        # Re-indexing a movie replaces its previous entry.
+        if self._in_arrays(rank):
+            self._replaced.add(rank)
+        self._recent.add(rank, title, description)
+        if len(self._recent) >= max(MIN_MERGE, len(self._documents) * MERGE_FRACTION):
+            self.compact()
+
+    def search(self, query: str, limit: int = None) -> List[int]:
+        """ Returns the ranks of movies matching any term of query, most relevant first, as SearchIndex.search does. """
+        number_of_documents = len(self)
+        if number_of_documents == 0:
+            return []
+        replaced = np.fromiter(self._replaced, dtype=np.int64, count=len(self._replaced))
+        total_length = (int(self._arrays['totals'][1]) + self._recent._total_length
+                        - int(self._document_lengths[np.searchsorted(self._documents, replaced)].sum()))
+        average_length = total_length / number_of_documents
+
+        scores = dict()
+        for term in set(tokenise(query)):
+            ranks, frequency, lengths = self._posting(term)
+            if len(replaced) > 0:
+                kept = ~np.isin(ranks, replaced)
+                ranks, frequency, lengths = ranks[kept], frequency[kept], lengths[kept]
+            recent_posting = self._recent._postings.get(term, {})
+            document_frequency = len(ranks) + len(recent_posting)
+            if document_frequency == 0:
+                continue
+
+            idf = math.log(1 + (number_of_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+            frequency = frequency.astype(np.float64)
+            length_norm = 1 - B + B * lengths / average_length
+            term_scores = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+            for rank, score in zip(ranks.tolist(), term_scores.tolist()):
+                scores[rank] = scores.get(rank, 0.0) + score
+            for rank, frequency in recent_posting.items():
+                length_norm = 1 - B + B * self._recent._document_lengths[rank] / average_length
+                score = idf * frequency * (K1 + 1) / (frequency + K1 * length_norm)
+                scores[rank] = scores.get(rank, 0.0) + score
+
+        return _ranked(scores, limit)
+
+    def _posting(self, term: str):
+        # The ranks, frequencies and document lengths of the term's posting in the arrays.
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            start = end = 0
+        else:
+            start, end = int(self._arrays['indptr'][term_id]), int(self._arrays['indptr'][term_id + 1])
+        return (self._arrays['ranks'][start:end], self._arrays['frequencies'][start:end],
+                self._arrays['lengths'][start:end])
+
+    def compact(self):
+        """ Merges the movies added since the last merge into the arrays. """
+        if len(self._recent) == 0:
+            return
+        old, recent = self._arrays, self._recent.arrays()
+        term_offsets, term_data, old_term_ids, recent_term_ids = self._merged_terms(recent)
+        number_of_terms = len(term_offsets) - 1
+
+        # Each posting, labelled with its term's new id; postings of replaced movies are dropped.
+        postings = list()
+        for ids, arrays in ((old_term_ids, old), (recent_term_ids, recent)):
+            postings.append((np.repeat(ids, np.diff(arrays['indptr'])), arrays['ranks'], arrays['frequencies'],
+                             arrays['lengths']))
+        replaced = np.fromiter(self._replaced, dtype=np.int64, count=len(self._replaced))
+        kept = ~np.isin(old['ranks'], replaced)
+        postings[0] = tuple(array[kept] for array in postings[0])
+        term_column, ranks, frequencies, lengths = (np.concatenate(arrays) for arrays in zip(*postings))
+        order = np.lexsort((ranks, term_column))
+
+        indptr = np.zeros(number_of_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_column, minlength=number_of_terms), out=indptr[1:])
+        recent_documents = np.array(sorted(self._recent._document_lengths), dtype=np.int64)
+        recent_lengths = np.array([self._recent._document_lengths[rank] for rank in recent_documents.tolist()],
+                                  dtype=np.int64)
+        kept = ~np.isin(self._documents, replaced)
+        documents = np.concatenate((self._documents[kept], recent_documents))
+        document_lengths = np.concatenate((self._document_lengths[kept], recent_lengths))
+        document_order = np.argsort(documents, kind='stable')
+
+        self._set_arrays({
+            'term_offsets': term_offsets,
+            'terms': term_data,
+            'indptr': indptr,
+            'ranks': ranks[order],
+            'frequencies': frequencies[order],
+            'lengths': lengths[order],
+            'totals': np.array([len(documents), int(document_lengths.sum())], dtype=np.int64),
+        }, documents[document_order], document_lengths[document_order])
+        self._recent = SearchIndex()
+        self._replaced = set()
+
+    def _merged_terms(self, recent):
+        # The sorted terms of the arrays and of recent, as the offsets and data of a StringColumn, and the new ids of
+        # the terms of each. The terms are sorted as fixed-width byte strings, which UTF-8 keeps in the order of the
+        # strings, so that none is decoded.
+        old_offsets, recent_offsets = self._arrays['term_offsets'], recent['term_offsets']
+        width = max(1, int(np.diff(old_offsets).max(initial=0)), int(np.diff(recent_offsets).max(initial=0)))
+        terms, ids = np.unique(np.concatenate((
+            _fixed_width(old_offsets, self._arrays['terms'], width),
+            _fixed_width(recent_offsets, recent['terms'], width))), return_inverse=True)
+
+        lengths = np.char.str_len(terms)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = terms.view(np.uint8).reshape(-1, width)[np.arange(width) < lengths[:, np.newaxis]]
+        return offsets, data, ids[:len(old_offsets) - 1], ids[len(old_offsets) - 1:]
+
+    def arrays(self):
+        """ Returns the index as a dict of NumPy arrays, from which a FrozenSearchIndex can be built. """
+        self.compact()
+        return self._arrays
+
+
+def _fixed_width(offsets, data, width: int):
+    # The strings of a StringColumn's arrays as an array of byte strings width bytes wide, padded with zeros.
+    lengths = np.diff(offsets)
+    strings = np.zeros((len(lengths), width), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    strings[rows, np.arange(len(rows)) - offsets[rows]] = data[:offsets[-1]]
+    return strings.view('S%d' % width).ravel()
@@ -42,8 +42,6 @@ def register():
         handler_url=url_for('authentication_bp.register'),
         selected_movies=utilities.get_selected_movies(),
         genre_urls=utilities.get_genres_and_urls(),
-        actor_urls=utilities.get_actors_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
 
     )
 
@@ -85,8 +83,6 @@ def login():
         form=form,
         selected_movies=utilities.get_selected_movies(),
         genre_urls=utilities.get_genres_and_urls(),
-        actor_urls=utilities.get_actors_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
     )
 
 
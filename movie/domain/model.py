@@ -1,7 +1,18 @@
 import csv
 from datetime import datetime
 from typing import List, Iterable
+# The domain classes declare __slots__ for their fields. '__dict__' is kept for the ORM, which stores its instance
+# state there, but CPython only allocates it on first use. Collections start as the shared _EMPTY list and are
+# allocated on first write, so _EMPTY itself is never modified. (The ORM needs collections to be list-like, so None
+# won't do; it copies _EMPTY into a collection of its own.)
+
+_EMPTY = []
+
+
 class User:
+    __slots__ = ('__user_name', '__password', '__watched_movies', '__reviews',
+                 '__time_spent_watching_movies_minutes', '__dict__', '__weakref__')
+
     def __init__(self, name, password):
         if name != "" and type(name) == str:
             self.__user_name = name.strip()
@@ -9,8 +20,8 @@ class User:
         if password != "" and type(password) == str:
             self.__password = password.strip()
 
-        self.__watched_movies = []
-        self.__reviews = []
+        self.__watched_movies = _EMPTY
+        self.__reviews = _EMPTY
         self.__time_spent_watching_movies_minutes = 0
 
     def __repr__(self):
@@ -29,23 +40,27 @@ class User:
         return hash(self.__user_name)
 
     def watch_movie(self, movie):
-        self.__watched_movies.append(movie)
+        self.watched_movies.append(movie)
         self.__time_spent_watching_movies_minutes += movie.runtime_minutes
 
     def add_review(self, r):
+        if self.__reviews is _EMPTY:
+            self.__reviews = []
         self.__reviews.append(r)
 
 
     @property
     def watched_movies(self):
+        if self.__watched_movies is _EMPTY:
+            self.__watched_movies = []
         return self.__watched_movies
 
     @property
     def reviews(self) -> Iterable['Review']:
-        return iter(self.__reviews)
+        return iter(self.__reviews or ())
 
     def add_command(self, review: 'Review'):
-        self.__reviews.append(review)
+        self.add_review(review)
 
     @property
     def time_spent_watching_movies_minutes(self):
@@ -60,14 +75,17 @@ class User:
         return self.__password
 
 class Review:
-    def __init__(self, movie, text, rating, user):
+    __slots__ = ('__movie', '__review_text', '__rating', '__timestamp', '__user_name', '__dict__', '__weakref__')
+
+    def __init__(self, movie, text, rating, user, timestamp: datetime = None):
         self.__movie = movie
         self.__review_text = text
         if 1 <= rating < 10:
             self.__rating = rating
         else:
             self.__rating = None
-        self.__timestamp = datetime.today()
+        # A review restored from storage keeps the time it was written.
+        self.__timestamp = datetime.today() if timestamp is None else timestamp
         self.__user_name = user
 
     def __repr__(self):
@@ -205,14 +223,18 @@ class MovieFileCSVReader:
 
 
 class Director:
+    __slots__ = ('__name', '__movie_list', '__dict__', '__weakref__')
+
     def __init__(self, name):
         if name == "" and type(name) != str:
             self.__name = None
         else:
             self.__name = name.strip()
-            self.__movie_list: List[Movie] = []
+            self.__movie_list: List[Movie] = _EMPTY
 
     def add_movie(self, movie:'Movie'):
+        if self.__movie_list is _EMPTY:
+            self.__movie_list = []
         self.__movie_list.append(movie)
 
     @property
@@ -221,13 +243,13 @@ class Director:
 
     @property
     def directed_movie(self) -> Iterable['Movie']:
-        return iter(self.__movie_list)
+        return iter(self.__movie_list or ())
     @property
     def number_of_actor_movie(self) -> int:
-        return len(self.__movie_list)
+        return len(self.__movie_list or ())
 
     def is_applied_to(self, movie:'Movie') -> bool:
-        return movie in self.__movie_list
+        return movie in (self.__movie_list or ())
 
     def __repr__(self):
         return '<Director ' + str(self.__name) + '>'
@@ -242,6 +264,9 @@ class Director:
         return hash(self.__name)
 
 class Movie:
+    __slots__ = ('__title', '__year', '__description', '__director', '__actors', '__genres', '__runtime_minutes',
+                 '__rank', '__reviews', '__dict__', '__weakref__')
+
     def __init__(self, name, year1,rank):
         if type(name) == str and name != '':
             self.__title = name.strip()
@@ -254,13 +279,13 @@ class Movie:
             self.__year = None
 
         self.__description = ""
-        self.__director = []
-        self.__actors = []
+        self.__director = _EMPTY
+        self.__actors = _EMPTY
 
-        self.__genres = []
+        self.__genres = _EMPTY
         self.__runtime_minutes = None
         self.__rank= rank
-        self.__reviews = []
+        self.__reviews = _EMPTY
 
     def __repr__(self):
         return '<Movie ' + self.__title + ', ' + str(self.__year) + '>'
@@ -298,39 +323,44 @@ class Movie:
 
     @property
     def director(self):
+        if self.__director is _EMPTY:
+            self.__director = []
         return self.__director
 
     @property
     def actors(self) -> Iterable['Actor']:
-        return iter(self.__actors)
+        return iter(self.__actors or ())
 
     @property
     def number_of_actors(self):
-        return len(self.__actors)
+        return len(self.__actors or ())
 
     def is_acted(self) -> bool:
-        return len(self.__actors) > 0
+        return self.number_of_actors > 0
 
     def is_acted_by(self, actor: 'Actor'):
-        return actor in self.__actors
+        return actor in (self.__actors or ())
 
     @property
     def genres(self):
+        if self.__genres is _EMPTY:
+            self.__genres = []
         return self.__genres
 
     @property
     def number_of_genres(self):
-        return len(self.__genres)
+        return len(self.__genres or ())
 
     def is_genred_by(self, genre: 'Genre'):
-        return genre in self.__genres
+        return genre in (self.__genres or ())
 
     def is_genred(self) -> bool:
-        return len(self.__genres) > 0
+        return self.number_of_genres > 0
 
     @property
     def first_genre(self):
-        return self.__genres[0]
+        # None when the movie has no genres.
+        return self.__genres[0] if self.__genres else None
 
     @property
     def rank(self):
@@ -338,11 +368,11 @@ class Movie:
 
     @property
     def reviews(self) -> Iterable[Review]:
-        return iter(self.__reviews)
+        return iter(self.__reviews or ())
 
     @property
     def number_of_reviews(self) -> int:
-        return len(self.__reviews)
+        return len(self.__reviews or ())
 
     @description.setter
     def description(self, value):
@@ -363,41 +393,46 @@ class Movie:
 
     def add_actor(self, actor):
         if isinstance(actor, Actor):
+            if self.__actors is _EMPTY:
+                self.__actors = []
             if actor not in self.__actors:
                 self.__actors.append(actor)
 
     def remove_actor(self, actor):
         if isinstance(actor, Actor):
-            if actor in self.__actors:
+            if actor in (self.__actors or ()):
                 index = self.__actors.index(actor)
                 del self.__actors[index]
 
     def add_genre(self, g):
         if isinstance(g, Genre):
-            if g not in self.__genres:
+            if g not in self.genres:
                 self.__genres.append(g)
 
     def remove_genre(self, g1):
         if isinstance(g1, Genre):
-            if g1 in self.__genres:
+            if g1 in (self.__genres or ()):
                 index = self.__genres.index(g1)
                 del self.__genres[index]
 
     def add_review(self, r):
+        if self.__reviews is _EMPTY:
+            self.__reviews = []
         self.__reviews.append(r)
 
     def add_director(self, director):
-        self.__director.append(director)
+        self.director.append(director)
 
 class Actor:
+    __slots__ = ('__colleaguelist', '__actor_name', '__movie_list', '__dict__', '__weakref__')
 
     def __init__(self, name):
-        self.__colleaguelist = []
+        self.__colleaguelist = _EMPTY
         if name == '' or type(name) != str:
             self.__actor_name = None
         else:
             self.__actor_name = name.strip()
-        self.__movie_list: List[Movie] = []
+        self.__movie_list: List[Movie] = _EMPTY
 
     def __repr__(self):
         return '<Actor ' + str(self.__actor_name) + '>'
@@ -408,14 +443,14 @@ class Actor:
 
     @property
     def actor_movie(self) -> Iterable[Movie]:
-        return iter(self.__movie_list)
+        return iter(self.__movie_list or ())
 
     @property
     def number_of_actor_movie(self):
-        return len(self.__movie_list)
+        return len(self.__movie_list or ())
 
     def is_applied_to(self,movie:Movie) -> bool:
-        return movie in self.__movie_list
+        return movie in (self.__movie_list or ())
 
 
     def __eq__(self, other):
@@ -429,26 +464,32 @@ class Actor:
 
     def add_actor_colleague(self, other):
         if isinstance(other, Actor):
+            if self.__colleaguelist is _EMPTY:
+                self.__colleaguelist = []
             self.__colleaguelist.append(other)
 
     def check_if_this_actor_worked_with(self, other_actor):
         if isinstance(other_actor, Actor):
-            if other_actor in self.__colleaguelist:
+            if other_actor in (self.__colleaguelist or ()):
                 return True
             else:
                 return False
 
     def add_actor_movie(self,movie:Movie):
+        if self.__movie_list is _EMPTY:
+            self.__movie_list = []
         self.__movie_list.append(movie)
 
 
 class Genre:
+    __slots__ = ('__genre_name', '__movie_list', '__dict__', '__weakref__')
+
     def __init__(self, movie_genre):
         if movie_genre == "" and type(movie_genre) != str:
             self.__genre_name = None
         else:
             self.__genre_name = movie_genre.strip()
-        self.__movie_list:List[Movie] = []
+        self.__movie_list:List[Movie] = _EMPTY
 
     @property
     def genre_name(self) -> str:
@@ -456,16 +497,18 @@ class Genre:
 
     @property
     def genre_movie(self) -> Iterable[Movie]:
-        return iter(self.__movie_list)
+        return iter(self.__movie_list or ())
 
     @property
     def number_of_genre_movie(self):
-        return len(self.__movie_list)
+        return len(self.__movie_list or ())
 
     def is_applied_to(self,movie:Movie)->bool:
-        return movie in self.__movie_list
+        return movie in (self.__movie_list or ())
 
     def add_genre_movie(self, movie:Movie):
+        if self.__movie_list is _EMPTY:
+            self.__movie_list = []
         self.__movie_list.append(movie)
 
     def __repr__(self):
@@ -492,8 +535,8 @@ class WatchList:
 class ModelException(Exception):
     pass
 
-def make_review(review_text: str, user: User, movie: Movie,review_num: int):
-    review = Review(movie, review_text,review_num, user)
+def make_review(review_text: str, user: User, movie: Movie,review_num: int, timestamp: datetime = None):
+    review = Review(movie, review_text,review_num, user, timestamp)
     user.add_review(review)
     movie.add_review(review)
     return review
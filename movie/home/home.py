@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template
 
+import movie.adapters.repository as repo
 import movie.utilities.utilities as utilities
+from movie.utilities.page_cache import cached_page
 
 
 home_blueprint = Blueprint(
@@ -8,11 +10,18 @@ home_blueprint = Blueprint(
 
 
 @home_blueprint.route('/', methods=['GET'])
+@cached_page
 def home():
     return render_template(
         'home/home.html',
         selected_movies=utilities.get_selected_movies(),
         genre_urls=utilities.get_genres_and_urls(),
-        actor_urls=utilities.get_actors_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
     )
+
+
+@home_blueprint.route('/ready', methods=['GET'])
+def ready():
+    # Readiness check: 503 until the repository has loaded its data.
+    if repo.repo_instance.is_ready():
+        return 'ready'
+    return 'loading', 503
@@ -1,7 +1,7 @@
 from datetime import date
 
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
+from flask import request, render_template, redirect, url_for, session, current_app
 
 from better_profanity import profanity
 from flask_wtf import FlaskForm
@@ -12,6 +12,9 @@ import movie.adapters.repository as repo
 import movie.utilities.utilities as utilities
 import movie.news.services as services
 
+from movie.utilities.conditional import conditional_get
+from movie.utilities.page_cache import cached_page, lists_movies
+
 from movie.authentication.authentication import login_required
 
 
@@ -20,174 +23,101 @@ news_blueprint = Blueprint(
     'news_bp', __name__)
 
 @news_blueprint.route('/movies_by_genre', methods=['GET'])
+@conditional_get
+@cached_page
 def movies_by_genre():
-    movies_per_page = 3
-
-    # Read query parameters.
     genre_name = request.args.get('genre')
+    return render_movies_page('genre', genre_name, 'news_bp.movies_by_genre', 'genre')
 
-    cursor = request.args.get('cursor')
-    movie_to_show_reviews = request.args.get('view_reviews_for')
-
-    if movie_to_show_reviews is None:
-        # No view-comments query parameter, so set to a non-existent article id.
-        movie_to_show_reviews = -1
-    else:
-        # Convert article_to_show_comments from string to int.
-        movie_to_show_reviews = int(movie_to_show_reviews)
-
-    if cursor is None:
-        # No cursor query parameter, so initialise cursor to start at the beginning.
-        cursor = 0
-    else:
-        # Convert cursor from string to int.
-        cursor = int(cursor)
-
-    # Retrieve article ids for articles that are tagged with tag_name.
-    movie_ranks = services.get_movie_ranks_for_genre(genre_name, repo.repo_instance)
-
-    # Retrieve the batch of articles to display on the Web page.
-    movies = services.get_movies_by_rank(movie_ranks[cursor:cursor + movies_per_page], repo.repo_instance)
 
-    first_movie_url = None
-    last_movie_url = None
-    next_movie_url = None
-    prev_movie_url = None
-
-    if cursor > 0:
-        # There are preceding articles, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_movie_url = url_for('news_bp.movies_by_genre', genre=genre_name, cursor=cursor - movies_per_page)
-        first_movie_url = url_for('news_bp.movies_by_genre', genre=genre_name)
-
-    if cursor + movies_per_page < len(movie_ranks):
-        # There are further articles, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_movie_url = url_for('news_bp.movies_by_genre', genre=genre_name, cursor=cursor + movies_per_page)
+@news_blueprint.route('/movies_by_actor', methods=['GET'])
+@conditional_get
+@cached_page
+def movies_by_actor():
+    actor_name = request.args.get('actor')
+    return render_movies_page('actor', actor_name, 'news_bp.movies_by_actor', 'actor')
 
-        last_cursor = movies_per_page * int(len(movie_ranks) / movies_per_page)
-        if len(movie_ranks) % movies_per_page == 0:
-            last_cursor -= movies_per_page
-        last_movie_url = url_for('news_bp.movies_by_genre', genre=genre_name, cursor=last_cursor)
 
-    # Construct urls for viewing article comments and adding comments.
-    for movie in movies:
-        movie['view_review_url'] = url_for('news_bp.movies_by_genre', genre=genre_name, cursor=cursor, view_reviews_for=movie['rank'])
-        movie['add_review_url'] = url_for('news_bp.review_on_movie', movie=movie['rank'])
-    # Generate the webpage to display the articles.
-    return render_template(
-        'news/articles.html',
-        title='Movie',
-        movies_title='Movies of ' + genre_name,
-        movies=movies,
-        selected_movies=utilities.get_selected_movies(len(movies) * 2),
-        actor_urls=utilities.get_actors_and_urls(),
-        genre_urls=utilities.get_genres_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
-        first_movie_url=first_movie_url,
-        last_movie_url=last_movie_url,
-        prev_movie_url=prev_movie_url,
-        next_movie_url=next_movie_url,
-        show_reviews_for_movie=movie_to_show_reviews
-    )
+@news_blueprint.route('/movies_by_director', methods=['GET'])
+@conditional_get
+@cached_page
+def movies_by_director():
+    director_name = request.args.get('director')
+    return render_movies_page('director', director_name, 'news_bp.movies_by_director', 'director')
 
 
-@news_blueprint.route('/movies_by_actor', methods=['GET'])
-def movies_by_actor():
+def render_movies_page(entity, name, endpoint, name_arg):
+    # Render one page of the movies linked to a genre, actor or director. Pages are addressed by keyset cursors:
+    # 'after' and 'before' hold the rank of a movie on the neighbouring page, and 'last' requests the final page.
     movies_per_page = 3
+    cache = current_app.extensions.get('cache')
 
     # Read query parameters.
-    actor_name = request.args.get('actor')
-    cursor = request.args.get('cursor')
-    movie_to_show_reviews = request.args.get('view_reviews_for')
-
-    if movie_to_show_reviews is None:
-        # No view-comments query parameter, so set to a non-existent article id.
-        movie_to_show_reviews = -1
+    after_rank = request.args.get('after', type=int)
+    before_rank = request.args.get('before', type=int)
+    last_page = 'last' in request.args
+
+    # Retrieve the batch of movies to display, reading one extra movie to find out whether another page follows.
+    if before_rank is not None:
+        movies = services.get_movies_page(entity, name, before_rank, movies_per_page + 1, True, repo.repo_instance,
+                                          cache)
+        has_previous = len(movies) > movies_per_page
+        movies = movies[-movies_per_page:]
+        has_next = True
+        page_args = {'before': before_rank}
+    elif last_page:
+        # Align the last page with the pages reached by paging forwards from the first.
+        number_of_movies = services.get_number_of_movies_for(entity, name, repo.repo_instance, cache)
+        last_page_size = number_of_movies % movies_per_page or movies_per_page
+        movies = services.get_movies_page(entity, name, None, last_page_size, True, repo.repo_instance, cache)
+        has_previous = number_of_movies > last_page_size
+        has_next = False
+        page_args = {'last': 1}
     else:
-        # Convert article_to_show_comments from string to int.
-        movie_to_show_reviews = int(movie_to_show_reviews)
-
-    if cursor is None:
-        # No cursor query parameter, so initialise cursor to start at the beginning.
-        cursor = 0
-    else:
-        # Convert cursor from string to int.
-        cursor = int(cursor)
-
-    # Retrieve article ids for articles that are tagged with tag_name.
-    movie_ranks = services.get_movie_ranks_for_actor(actor_name, repo.repo_instance)
-
-    # Retrieve the batch of articles to display on the Web page.
-    movies = services.get_movies_by_rank(movie_ranks[cursor:cursor + movies_per_page], repo.repo_instance)
+        movies = services.get_movies_page(entity, name, after_rank, movies_per_page + 1, False, repo.repo_instance,
+                                          cache)
+        has_next = len(movies) > movies_per_page
+        movies = movies[:movies_per_page]
+        has_previous = after_rank is not None
+        page_args = {} if after_rank is None else {'after': after_rank}
 
     first_movie_url = None
     last_movie_url = None
     next_movie_url = None
     prev_movie_url = None
 
-    if cursor > 0:
-        # There are preceding articles, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_movie_url = url_for('news_bp.movies_by_actor', actor=actor_name, cursor=cursor - movies_per_page)
-        first_movie_url = url_for('news_bp.movies_by_actor', actor=actor_name)
+    if has_previous:
+        # There are preceding movies, so generate URLs for the 'previous' and 'first' navigation buttons.
+        first_movie_url = url_for(endpoint, **{name_arg: name})
+        prev_movie_url = first_movie_url
+        if len(movies) > 0:
+            prev_movie_url = url_for(endpoint, **{name_arg: name}, before=movies[0]['rank'])
 
-    if cursor + movies_per_page < len(movie_ranks):
-        # There are further articles, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_movie_url = url_for('news_bp.movies_by_actor', actor=actor_name, cursor=cursor + movies_per_page)
+    if has_next and len(movies) > 0:
+        # There are further movies, so generate URLs for the 'next' and 'last' navigation buttons.
+        next_movie_url = url_for(endpoint, **{name_arg: name}, after=movies[-1]['rank'])
+        last_movie_url = url_for(endpoint, **{name_arg: name}, last=1)
 
-        last_cursor = movies_per_page * int(len(movie_ranks) / movies_per_page)
-        if len(movie_ranks) % movies_per_page == 0:
-            last_cursor -= movies_per_page
-        last_movie_url = url_for('news_bp.movies_by_actor', actor=actor_name, cursor=last_cursor)
+    def view_review_url(rank):
+        return url_for(endpoint, **{name_arg: name}, **page_args, view_reviews_for=rank)
 
-    # Construct urls for viewing article comments and adding comments.
-    for movie in movies:
-        movie['view_review_url'] = url_for('news_bp.movies_by_actor', actor=actor_name, cursor=cursor, view_reviews_for=movie['rank'])
-        movie['add_review_url'] = url_for('news_bp.review_on_movie', movie=movie['rank'])
+    return render_movies('Movies of ' + name, movies, view_review_url,
+                         first_movie_url, last_movie_url, prev_movie_url, next_movie_url)
 
-    # Generate the webpage to display the articles.
-    return render_template(
-        'news/articles.html',
-        title='Movie',
-        movies_title='Movies of ' + actor_name,
-        movies=movies,
-        selected_movies=utilities.get_selected_movies(len(movies) * 2),
-        actor_urls=utilities.get_actors_and_urls(),
-        genre_urls=utilities.get_genres_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
-        first_movie_url=first_movie_url,
-        last_movie_url=last_movie_url,
-        prev_movie_url=prev_movie_url,
-        next_movie_url=next_movie_url,
-        show_reviews_for_movie=movie_to_show_reviews
-    )
 
-@news_blueprint.route('/movies_by_director', methods=['GET'])
-def movies_by_director():
+@news_blueprint.route('/search', methods=['GET'])
+@conditional_get
+def search():
+    # Results are ordered by relevance rather than rank, so pages are addressed by their position in the results.
     movies_per_page = 3
+    cache = current_app.extensions.get('cache')
 
     # Read query parameters.
-    director_name = request.args.get('director')
-    cursor = request.args.get('cursor')
-    movie_to_show_reviews = request.args.get('view_reviews_for')
+    query = request.args.get('q', '')
+    cursor = max(0, request.args.get('cursor', 0, type=int))
 
-    if movie_to_show_reviews is None:
-        # No view-comments query parameter, so set to a non-existent article id.
-        movie_to_show_reviews = -1
-    else:
-        # Convert article_to_show_comments from string to int.
-        movie_to_show_reviews = int(movie_to_show_reviews)
-
-    if cursor is None:
-        # No cursor query parameter, so initialise cursor to start at the beginning.
-        cursor = 0
-    else:
-        # Convert cursor from string to int.
-        cursor = int(cursor)
-
-    # Retrieve article ids for articles that are tagged with tag_name.
-    movie_ranks = services.get_movie_ranks_for_director(director_name, repo.repo_instance)
-
-    # Retrieve the batch of articles to display on the Web page.
-    movies = services.get_movies_by_rank(movie_ranks[cursor:cursor + movies_per_page], repo.repo_instance)
+    # Retrieve the batch of movies to display on the Web page, most relevant first.
+    movies, number_of_results = services.get_search_page(query, cursor, movies_per_page, repo.repo_instance, cache)
 
     first_movie_url = None
     last_movie_url = None
@@ -196,33 +126,44 @@ def movies_by_director():
 
     if cursor > 0:
         # There are preceding articles, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_movie_url = url_for('news_bp.movies_by_director', director=director_name, cursor=cursor - movies_per_page)
-        first_movie_url = url_for('news_bp.movies_by_director', director=director_name)
+        prev_movie_url = url_for('news_bp.search', q=query, cursor=max(0, cursor - movies_per_page))
+        first_movie_url = url_for('news_bp.search', q=query)
 
-    if cursor + movies_per_page < len(movie_ranks):
+    if cursor + movies_per_page < number_of_results:
         # There are further articles, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_movie_url = url_for('news_bp.movies_by_director', director=director_name, cursor=cursor + movies_per_page)
+        next_movie_url = url_for('news_bp.search', q=query, cursor=cursor + movies_per_page)
+        last_movie_url = url_for('news_bp.search', q=query,
+                                 cursor=(number_of_results - 1) // movies_per_page * movies_per_page)
+
+    def view_review_url(rank):
+        return url_for('news_bp.search', q=query, cursor=cursor, view_reviews_for=rank)
+
+    return render_movies('Search results for ' + query, movies, view_review_url,
+                         first_movie_url, last_movie_url, prev_movie_url, next_movie_url)
+
+
+def render_movies(movies_title, movies, view_review_url, first_movie_url, last_movie_url, prev_movie_url,
+                  next_movie_url):
+    # Render a page of movies with its navigation buttons, for the listings and the search results. view_review_url
+    # returns the URL of the page showing the reviews of the movie with a given rank.
+    movie_to_show_reviews = request.args.get('view_reviews_for', -1, type=int)
 
-        last_cursor = movies_per_page * int(len(movie_ranks) / movies_per_page)
-        if len(movie_ranks) % movies_per_page == 0:
-            last_cursor -= movies_per_page
-        last_movie_url = url_for('news_bp.movies_by_director', director=director_name, cursor=last_cursor)
+    # The page shows the reviews of these movies, so it changes when they are reviewed.
+    lists_movies(movie['rank'] for movie in movies)
 
-    # Construct urls for viewing article comments and adding comments.
+    # Construct urls for viewing movie reviews and adding reviews.
     for movie in movies:
-        movie['view_review_url'] = url_for('news_bp.movies_by_director', director=director_name, cursor=cursor, view_reviews_for=movie['rank'])
+        movie['view_review_url'] = view_review_url(movie['rank'])
         movie['add_review_url'] = url_for('news_bp.review_on_movie', movie=movie['rank'])
 
-    # Generate the webpage to display the articles.
+    # Generate the webpage to display the movies.
     return render_template(
         'news/articles.html',
         title='Movie',
-        movies_title='Movies of ' + director_name,
+        movies_title=movies_title,
         movies=movies,
         selected_movies=utilities.get_selected_movies(len(movies) * 2),
-        actor_urls=utilities.get_actors_and_urls(),
         genre_urls=utilities.get_genres_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
         first_movie_url=first_movie_url,
         last_movie_url=last_movie_url,
         prev_movie_url=prev_movie_url,
@@ -247,13 +188,17 @@ def review_on_movie():
         movie_rank = int(form.movie_rank.data)
 
         # Use the service layer to store the new comment.
-        services.add_review(movie_rank, form.review.data, username, repo.repo_instance,int(form.review2.data))
+        services.add_review(movie_rank, form.review.data, username, repo.repo_instance,int(form.review2.data),
+                            current_app.extensions.get('page_cache'), current_app.extensions.get('cache'))
 
         # Retrieve the article in dict form.
         movie = services.get_movie(movie_rank, repo.repo_instance)
 
         # Cause the web browser to display the page of all articles that have the same date as the commented article,
-        # and display all comments, including the new comment.
+        # and display all comments, including the new comment. A movie without a genre is shown among the search
+        # results for its title instead.
+        if movie['genre'] is None:
+            return redirect(url_for('news_bp.search', q=movie['title'], view_reviews_for=movie_rank))
         return redirect(url_for('news_bp.movies_by_genre', genre = movie['genre'].genre_name, view_reviews_for=movie_rank))
 
     if request.method == 'GET':
@@ -279,8 +224,6 @@ def review_on_movie():
         handler_url=url_for('news_bp.review_on_movie'),
         selected_movies=utilities.get_selected_movies(),
         genre_urls=utilities.get_genres_and_urls(),
-        actor_urls=utilities.get_actors_and_urls(),
-        director_urls=utilities.get_directors_and_urls(),
     )
 
 
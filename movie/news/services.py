@@ -1,6 +1,8 @@
+import weakref
 from typing import List, Iterable
 
-from movie.adapters.repository import AbstractRepository
+from movie.adapters.cache import AbstractCache
+from movie.adapters.repository import AbstractRepository, MovieRow, ReviewRow
 from movie.domain.model import make_review, Movie, Review, Genre, Actor, Director
 
 
@@ -12,7 +14,8 @@ class UnknownUserException(Exception):
     pass
 
 
-def add_review(movie_rank: int, review_text: str, username: str, repo: AbstractRepository, review_int: int):
+def add_review(movie_rank: int, review_text: str, username: str, repo: AbstractRepository, review_int: int,
+               page_cache=None, cache: AbstractCache = None):
     # Check that the article exists.
     movie = repo.get_movie(movie_rank)
     if movie is None:
@@ -27,10 +30,17 @@ def add_review(movie_rank: int, review_text: str, username: str, repo: AbstractR
 
     # Update the repository.
     repo.add_review(review)
+    movie_dicts.mark_dirty(movie)
+
+    # Drop the cached pages and dicts showing the movie's reviews.
+    if page_cache is not None:
+        page_cache.invalidate_movie(movie_rank)
+    if cache is not None:
+        cache.bump_tag(movie_tag(movie_rank))
 
 
 def get_movie(movie_rank: int, repo: AbstractRepository):
-    movie = repo.get_movie(movie_rank)
+    movie = repo.get_movie(movie_rank, fetch_plan='listing')
 
     if movie is None:
         raise NonExistentArticleException
@@ -85,17 +95,100 @@ def get_movie_ranks_for_director(director_name, repo: AbstractRepository):
 
     return movie_ranks
 
-def get_movies_by_rank(rank_list, repo: AbstractRepository):
-    movies = repo.get_movies_by_rank(rank_list)
+def get_movies_page(entity, name, after_rank, limit, descending, repo: AbstractRepository,
+                    cache: AbstractCache = None):
+    def read_ranks():
+        return [movie.rank for movie in repo.get_movies_page(
+            entity, name, after_rank, limit, descending, fetch_plan='lazy')]
+
+    if cache is not None:
+        movie_ranks = cache.get_or_set(
+            ('movies_page', catalogue_version(repo), entity, name, after_rank, limit, descending), read_ranks)
+    else:
+        movie_ranks = read_ranks()
+
+    # Returns the page of movies in ascending rank order, whichever direction it was read in.
+    if descending:
+        movie_ranks = movie_ranks[::-1]
+    return get_movies_by_rank(movie_ranks, repo, cache)
+
+
+def get_number_of_movies_for(entity, name, repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None:
+        return cache.get_or_set(('number_of_movies', catalogue_version(repo), entity, name),
+                                lambda: repo.get_number_of_movies_for(entity, name))
+
+    return repo.get_number_of_movies_for(entity, name)
+
+
+def get_movie_ranks_for_search(query, repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None:
+        return cache.get_or_set(('search', catalogue_version(repo), query), lambda: repo.search_movie_ranks(query))
+
+    movie_ranks = repo.search_movie_ranks(query)
+
+    return movie_ranks
+
+def get_search_page(query, cursor, limit, repo: AbstractRepository, cache: AbstractCache = None):
+    # Returns the dicts of up to limit movies matching query from position cursor in the results, most relevant first,
+    # and the number of results.
+    movie_ranks = get_movie_ranks_for_search(query, repo, cache)
+
+    return get_movies_by_rank(movie_ranks[cursor:cursor + limit], repo, cache), len(movie_ranks)
+
+
+def get_movies_by_rank(rank_list, repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None and not repo.keeps_movies():
+        return get_cached_movies(rank_list, repo, cache)
+
+    # Movies the repository keeps are converted through movie_dicts, which keeps their dicts current without a cache.
+    return movies_to_dict(read_movies(rank_list, repo))
+
+
+def read_movies(rank_list, repo: AbstractRepository):
+    # Returns what movies_to_dict converts for the movies with ranks in rank_list: the Movies of a repository that
+    # keeps them, or else plain rows, as only what the listing shows is needed and Movies would be built for each read.
+    if repo.keeps_movies():
+        return repo.get_movies_by_rank(rank_list, fetch_plan='listing')
+    return repo.get_movie_rows(rank_list)
+
+
+def catalogue_version(repo: AbstractRepository):
+    # Listings, counts, search results and the genre lists in movie dicts change only when movies, genres, actors or
+    # directors are added, so cache keys for them carry these versions and are left behind when one is added. A
+    # database repository reads them from the database, so they mean the same in every process sharing the cache.
+    return tuple(repo.get_entity_version(kind) for kind in ('movie', 'genre', 'actor', 'director'))
+
+
+def movie_tag(movie_rank: int):
+    # The cache tag of what shows a movie's reviews.
+    return ('movie', movie_rank)
+
+
+def get_cached_movies(rank_list, repo: AbstractRepository, cache: AbstractCache):
+    # Returns the dicts of the movies with ranks in rank_list, as get_movies_by_rank does, keeping each movie's dict in
+    # the cache under its own tag so that a review makes only that movie's dict stale.
+    version = catalogue_version(repo)
+    movies = dict()
+    for rank in rank_list:
+        movie = cache.get(('movie_dict', version, rank))
+        if movie is not None:
+            movies[rank] = movie
 
-    # Convert Articles to dictionary form.
-    movies_as_dict = movies_to_dict(movies)
+    missing_ranks = [rank for rank in rank_list if rank not in movies]
+    if len(missing_ranks) > 0:
+        # Take the tag versions before reading, so that a review added meanwhile leaves the dicts stale.
+        versions = cache.tag_versions(movie_tag(rank) for rank in missing_ranks)
+        for movie in movies_to_dict(read_movies(missing_ranks, repo)):
+            tag = movie_tag(movie['rank'])
+            cache.set(('movie_dict', version, movie['rank']), movie, tags={tag: versions[tag]})
+            movies[movie['rank']] = movie
 
-    return movies_as_dict
+    return [movies[rank] for rank in rank_list if rank in movies]
 
 
 def get_reviews_for_movie(movie_rank, repo: AbstractRepository):
-    movie = repo.get_movie(movie_rank)
+    movie = repo.get_movie(movie_rank, fetch_plan='reviews')
 
     if movie is None:
         raise NonExistentArticleException
@@ -108,21 +201,108 @@ def get_reviews_for_movie(movie_rank, repo: AbstractRepository):
 # ============================================
 
 def movie_to_dict(movie: Movie):
+    if isinstance(movie, MovieRow):
+        return movie_row_to_dict(movie)
+    return movie_dicts.movie_dict(movie)
+
+
+def build_movie_dict(movie: Movie, genre_dict=None):
+    # movie_to_dict without the memo, which passes its own genre_dict.
+    if genre_dict is None:
+        genre_dict = genre_to_dict
     movie_dict = {
         'rank': movie.rank,
         'year': movie.year,
         'title': movie.title,
         'reviews': reviews_to_dict(movie.reviews),
-        'genres': genres_to_dict(movie.genres),
+        'genres': [genre_dict(genre) for genre in movie.genres],
         'genre': movie.first_genre
     }
     return movie_dict
 
 
+class MovieDictCache:
+    # Memoises the dict form of Movies. A movie's data only changes when a review is added or it joins a genre, and
+    # its dict lists every movie of each of its genres, so rebuilding it on every call costs far more than reading it.
+    #
+    # Each dict is kept with the state it was built from: the number of the movie's reviews and, for each of its
+    # genres, the genre and its number of movies. Reviews and genre links are only ever added, by make_review and
+    # make_genre_association, so a dict whose state has changed is dirty and is rebuilt when next used; add_review also
+    # marks the reviewed movie dirty. Genre dicts are memoised the same way and shared by the dicts of their movies.
+    # Entries last as long as their Movie or Genre, which the memo refers to weakly.
+
+    def __init__(self):
+        # id(object) -> (weak reference to the object, state, dict).
+        self._movies = dict()
+        self._genres = dict()
+
+    def movie_dict(self, movie: Movie) -> dict:
+        genres = movie.genres
+        state = (movie.number_of_reviews, tuple((id(genre), genre.number_of_genre_movie) for genre in genres))
+        entry = self._movies.get(id(movie))
+        if entry is None or entry[0]() is not movie or entry[1] != state:
+            movie_dict = build_movie_dict(movie, self.genre_dict)
+            # The memo holds plain values only, as a Genre would keep its movies and everything linked to them alive.
+            del movie_dict['genre']
+            entry = (self._reference(self._movies, movie), state, movie_dict)
+            self._movies[id(movie)] = entry
+
+        # Callers add URLs to the dict, so each gets a copy of it; the lists within are shared, and only read.
+        return dict(entry[2], genre=movie.first_genre)
+
+    def genre_dict(self, genre: Genre) -> dict:
+        state = genre.number_of_genre_movie
+        entry = self._genres.get(id(genre))
+        if entry is None or entry[0]() is not genre or entry[1] != state:
+            entry = (self._reference(self._genres, genre), state, genre_to_dict(genre))
+            self._genres[id(genre)] = entry
+        return entry[2]
+
+    def mark_dirty(self, movie: Movie):
+        self._movies.pop(id(movie), None)
+
+    @staticmethod
+    def _reference(entries: dict, obj):
+        key = id(obj)
+
+        def forget(reference):
+            # Another object may have the id by now.
+            entry = entries.get(key)
+            if entry is not None and entry[0] is reference:
+                entries.pop(key, None)
+
+        return weakref.ref(obj, forget)
+
+
+movie_dicts = MovieDictCache()
+
+
 def movies_to_dict(movies: Iterable[Movie]):
+    # Every page of movies is converted here, from Movies or from the MovieRows read for them.
     return [movie_to_dict(movie) for movie in movies]
 
 
+def movie_row_to_dict(movie_row: MovieRow):
+    # The same shape as movie_to_dict.
+    movie_dict = {
+        'rank': movie_row.rank,
+        'year': movie_row.year,
+        'title': movie_row.title,
+        'reviews': [review_row_to_dict(review_row) for review_row in movie_row.reviews],
+        'genres': [{'name': name, 'genred_movies': list(movie_ranks)} for name, movie_ranks in movie_row.genres],
+        'genre': Genre(movie_row.genres[0].name) if len(movie_row.genres) > 0 else None
+    }
+    return movie_dict
+
+
+def movie_rows_to_dict(movie_rows: Iterable[MovieRow]):
+    return [movie_row_to_dict(movie_row) for movie_row in movie_rows]
+
+
+def review_row_to_dict(review_row: ReviewRow):
+    return review_row._asdict()
+
+
 def review_to_dict(review: Review):
     review_dict = {
         'username': review.user.user_name,
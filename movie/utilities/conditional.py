@@ -0,0 +1,61 @@
+import functools
+import hashlib
+from datetime import datetime
+
+from flask import current_app, make_response, request, session
+
+import movie.adapters.repository as repo
+
+
+def page_etag(endpoint: str, args, username, version: int) -> str:
+    """ Returns the entity tag of the page endpoint renders for the query args, as seen by username.
+
+    A page depends on nothing else than these and the repository's contents, which change only with its version.
+    """
+    key = repr((endpoint, sorted(args.items(multi=True)), username, version))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_get(view):
+    """ Makes a view that only reads the repository answer conditional GET requests.
+
+    The response carries an ETag derived from the request and the repository's version, and the time the repository
+    last changed as Last-Modified once that second has passed. A request whose If-None-Match or If-Modified-Since shows
+    that the client holds the current page is answered with 304 Not Modified before the view is called, so no services
+    are used. Clients are asked to revalidate every time.
+    """
+    @functools.wraps(view)
+    def conditional_view(*args, **kwargs):
+        # The navigation bar greets users by name, so each user sees their own page.
+        username = session.get('username')
+        etag = page_etag(request.endpoint, request.args, username, repo.repo_instance.get_version())
+        last_modified = repo.repo_instance.get_last_modified()
+        # Another write within the second the repository last changed would leave Last-Modified as it is, so until
+        # that second has passed the date is neither sent nor compared, and clients revalidate with the ETag.
+        if last_modified >= datetime.utcnow().replace(microsecond=0):
+            last_modified = None
+
+        if request.if_none_match:
+            # If-None-Match takes precedence over If-Modified-Since, and is compared weakly for GET requests.
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = last_modified is not None and request.if_modified_since is not None and \
+                last_modified <= request.if_modified_since
+
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+
+        # The Editor's picks differ between renderings, so pages are only weakly equivalent.
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        if username is None:
+            response.cache_control.public = True
+        else:
+            response.cache_control.private = True
+        return response
+
+    return conditional_view
@@ -0,0 +1,142 @@
+import functools
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g, request, session
+
+import movie.adapters.repository as repo
+
+
+class PageCache:
+    # A bounded LRU cache of rendered pages. Each page records the ranks of the movies it lists, so that adding a
+    # review to a movie drops exactly the pages showing it. Pages are also dropped, all at once, when the generation
+    # they were rendered in changes.
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._lock = threading.Lock()
+
+        # Key -> (page, movie ranks), least recently used first, and movie rank -> keys of the pages listing it.
+        self._pages = OrderedDict()
+        self._keys_by_rank = dict()
+        self._generation = None
+
+        # Counts invalidations, so that a page rendered while one of its movies changed isn't stored.
+        self._epoch = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def epoch(self) -> int:
+        """ Returns a token to pass to put() for a page about to be rendered. """
+        return self._epoch
+
+    def get(self, key, generation):
+        """ Returns the page stored under key, or None if there is none for generation. """
+        with self._lock:
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+            entry = self._pages.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, generation, page: str, movie_ranks, epoch: int):
+        """ Stores page under key, unless generation has passed or a movie was invalidated since epoch(). """
+        if self._capacity <= 0:
+            return
+        with self._lock:
+            if generation != self._generation or epoch != self._epoch:
+                return
+            self._remove(key)
+            self._pages[key] = (page, frozenset(movie_ranks))
+            for rank in movie_ranks:
+                self._keys_by_rank.setdefault(rank, set()).add(key)
+            while len(self._pages) > self._capacity:
+                self._remove(next(iter(self._pages)))
+                self._evictions += 1
+
+    def invalidate_movie(self, rank: int):
+        """ Drops the pages listing the movie with rank. """
+        with self._lock:
+            self._epoch += 1
+            for key in list(self._keys_by_rank.get(rank, ())):
+                self._remove(key)
+                self._invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'capacity': self._capacity,
+                'size': len(self._pages),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+    def _remove(self, key):
+        entry = self._pages.pop(key, None)
+        if entry is None:
+            return
+        for rank in entry[1]:
+            keys = self._keys_by_rank[rank]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_rank[rank]
+
+    def _clear(self):
+        self._pages.clear()
+        self._keys_by_rank.clear()
+        self._epoch += 1
+
+
+def page_generation(repository, shared: bool = False):
+    # Adding movies, genres, actors or directors may change any listing or the navigation, unlike adding a review.
+    # Reviews added by other processes sharing the repository never reach this process's invalidate_movie(), so for a
+    # shared repository any write makes a new generation.
+    generation = (repository,) + tuple(repository.get_entity_version(kind)
+                                       for kind in ('movie', 'genre', 'actor', 'director'))
+    if shared:
+        generation += (repository.get_version(),)
+    return generation
+
+
+def lists_movies(ranks):
+    """ Records that the page being rendered lists the movies with ranks. """
+    if 'page_movie_ranks' in g:
+        g.page_movie_ranks.update(ranks)
+
+
+def cached_page(view):
+    """ Serves anonymous requests for a view from the application's PageCache, keyed by the sorted query arguments.
+
+    Views call lists_movies() with the movies on the page, whose reviews they show.
+    """
+    @functools.wraps(view)
+    def caching_view(*args, **kwargs):
+        cache = current_app.extensions.get('page_cache')
+        if cache is None or 'username' in session or not repo.repo_instance.is_ready():
+            # Logged in users are greeted by name, and pages rendered while the repository loads may lack reviews.
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+        generation = page_generation(repo.repo_instance, current_app.config.get('REPOSITORY') == 'database')
+        page = cache.get(key, generation)
+        if page is None:
+            epoch = cache.epoch()
+            g.page_movie_ranks = set()
+            page = view(*args, **kwargs)
+            if isinstance(page, str):
+                cache.put(key, generation, page, g.page_movie_ranks, epoch)
+        return page
+
+    return caching_view
@@ -0,0 +1,38 @@
+from bisect import bisect_left
+from typing import Iterable, List
+
+
+class PrefixIndex:
+    # A sorted array of case-folded keys, searched with bisect. Each name is keyed by every word it contains from
+    # that word to the end, so 'pra' finds 'Chris Pratt' as well as 'Pratt Chris'.
+
+    def __init__(self, names: Iterable[str]):
+        entries = set()
+        for name in names:
+            words = name.casefold().split()
+            for start in range(len(words)):
+                entries.add((' '.join(words[start:]), name))
+
+        entries = sorted(entries)
+        self._keys = [key for key, name in entries]
+        self._names = [name for key, name in entries]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """ Returns up to limit names with a word starting with prefix, in alphabetical order of the matched text. """
+        prefix = ' '.join(prefix.casefold().split())
+        if prefix == '' or limit <= 0:
+            return []
+
+        matches = list()
+        seen = set()
+        index = bisect_left(self._keys, prefix)
+        while index < len(self._keys) and self._keys[index].startswith(prefix):
+            name = self._names[index]
+            if name not in seen:
+                seen.add(name)
+                matches.append(name)
+                if len(matches) == limit:
+                    break
+            index += 1
+
+        return matches
@@ -0,0 +1,51 @@
+import random
+import time
+from typing import Callable, List
+
+
+class MovieSampler:
+    # Draws distinct random movies for the Editor's picks. The repository's movie ranks are kept in a dense tuple, so
+    # drawing k movies is random.sample over the tuple, O(k) however sparse the ranks are. The tuple is fetched again
+    # when the repository's movie version changes or refresh_seconds have passed.
+    #
+    # With a pool_size, draws of up to pool_size movies are taken from a pool of that many random movies, already
+    # loaded, which is replaced once refresh_seconds have passed; draws between replacements don't use the repository.
+
+    def __init__(self, pool_size: int = 0, refresh_seconds: float = 60, clock=time.monotonic,
+                 rng: random.Random = None):
+        self._pool_size = pool_size
+        self._refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._random = rng if rng is not None else random.Random()
+
+        # (repository, movie version, expiry time, ranks) and (repository, expiry time, movies). Each is replaced
+        # whole, so concurrent requests at worst build one twice.
+        self._ranks = None
+        self._pool = None
+
+    def ranks(self, repo) -> tuple:
+        """ Returns the ranks of the movies in repo, in ascending order. """
+        version = repo.get_entity_version('movie')
+        now = self._clock()
+        cached = self._ranks
+        if cached is None or cached[0] is not repo or cached[1] != version or now >= cached[2]:
+            cached = (repo, version, now + self._refresh_seconds, tuple(repo.get_movie_ranks()))
+            self._ranks = cached
+        return cached[3]
+
+    def sample_ranks(self, repo, quantity: int) -> List[int]:
+        """ Returns up to quantity distinct random ranks of movies in repo. """
+        ranks = self.ranks(repo)
+        return self._random.sample(ranks, min(quantity, len(ranks)))
+
+    def sample(self, repo, quantity: int, load: Callable[[List[int]], list]) -> list:
+        """ Returns up to quantity distinct random movies from repo, as load returns them for a list of ranks. """
+        if quantity > self._pool_size:
+            return load(self.sample_ranks(repo, quantity))
+
+        now = self._clock()
+        pool = self._pool
+        if pool is None or pool[0] is not repo or now >= pool[1]:
+            pool = (repo, now + self._refresh_seconds, load(self.sample_ranks(repo, self._pool_size)))
+            self._pool = pool
+        return self._random.sample(pool[2], min(quantity, len(pool[2])))
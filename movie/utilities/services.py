@@ -1,43 +1,51 @@
 from typing import Iterable
-import random
 
+from movie.adapters.cache import AbstractCache
 from movie.adapters.repository import AbstractRepository
 from movie.domain.model import Movie
+from movie.utilities.sampler import MovieSampler
 
 
-def get_genre_names(repo: AbstractRepository):
+def get_genre_names(repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None:
+        return cache.get_or_set(('genre_names', repo.get_entity_version('genre')), lambda: get_genre_names(repo))
+
     genres = repo.get_genre()
     genre_names = [genre.genre_name for genre in genres]
 
     return genre_names
 
 
-def get_actor_names(repo: AbstractRepository):
+def get_actor_names(repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None:
+        return cache.get_or_set(('actor_names', repo.get_entity_version('actor')), lambda: get_actor_names(repo))
+
     actors = repo.get_actor()
     actor_names = [actor.actor_full_name for actor in actors]
 
     return actor_names
 
 
-def get_director_names(repo: AbstractRepository):
+def get_director_names(repo: AbstractRepository, cache: AbstractCache = None):
+    if cache is not None:
+        return cache.get_or_set(('director_names', repo.get_entity_version('director')),
+                                lambda: get_director_names(repo))
+
     directors = repo.get_director()
     director_names = [director.director_full_name for director in directors]
 
     return director_names
 
 
-def get_random_movies(quantity, repo: AbstractRepository):
-    movie_count = repo.get_number_of_movies()
-
-    if quantity >= movie_count:
-        # Reduce the quantity of ids to generate if the repository has an insufficient number of articles.
-        quantity = movie_count - 1
+def get_random_movies(quantity, repo: AbstractRepository, sampler: MovieSampler = None):
+    if sampler is None:
+        sampler = MovieSampler()
 
-    # Pick distinct and random articles.
-    random_ranks = random.sample(range(1, movie_count), quantity)
-    movies = repo.get_movies_by_rank(random_ranks)
+    def load(random_ranks):
+        return movies_to_dict(repo.get_movies_by_rank(random_ranks, fetch_plan='summary'))
 
-    return movies_to_dict(movies)
+    # Pick distinct and random movies, or as many as the repository has.
+    return sampler.sample(repo, quantity, load)
 
 
 # ============================================
@@ -1,7 +1,8 @@
-from flask import Blueprint, request, render_template, redirect, url_for, session
+from flask import Blueprint, request, render_template, redirect, url_for, session, jsonify, current_app
 
 import movie.adapters.repository as repo
 import movie.utilities.services as services
+from movie.utilities.prefix_index import PrefixIndex
 
 
 # Configure Blueprint.
@@ -9,33 +10,117 @@ utilities_blueprint = Blueprint(
     'utilities_bp', __name__)
 
 
+# Name -> URL maps for the navigation sidebar, and prefix indexes over the names, keyed by entity kind. Each entry
+# records the repository and entity version it was built from, and is rebuilt when either changes.
+navigation_cache = dict()
+completion_cache = dict()
+
+MAX_COMPLETIONS = 50
+
+
+def get_cached(cache: dict, kind: str, build):
+    entity_version = repo.repo_instance.get_entity_version(kind)
+    cached = cache.get(kind)
+    if cached is None or cached[0] is not repo.repo_instance or cached[1] != entity_version:
+        cached = (repo.repo_instance, entity_version, build())
+        cache[kind] = cached
+
+    return cached[2]
+
+
 def get_genres_and_urls():
-    genre_names = services.get_genre_names(repo.repo_instance)
-    genre_urls = dict()
-    for genre_name in genre_names:
-        genre_urls[genre_name] = url_for('news_bp.movies_by_genre', genre=genre_name)
+    def build_genre_urls():
+        genre_names = services.get_genre_names(repo.repo_instance, current_app.extensions.get('cache'))
+        genre_urls = dict()
+        for genre_name in genre_names:
+            genre_urls[genre_name] = url_for('news_bp.movies_by_genre', genre=genre_name)
+
+        return genre_urls
 
-    return genre_urls
+    return get_cached(navigation_cache, 'genre', build_genre_urls)
 
 
 def get_actors_and_urls():
-    actor_names = services.get_actor_names(repo.repo_instance)
-    actor_urls = dict()
-    for actor_name in actor_names:
-        actor_urls[actor_name] = url_for('news_bp.movies_by_actor', actor=actor_name)
+    def build_actor_urls():
+        actor_names = services.get_actor_names(repo.repo_instance, current_app.extensions.get('cache'))
+        actor_urls = dict()
+        for actor_name in actor_names:
+            actor_urls[actor_name] = url_for('news_bp.movies_by_actor', actor=actor_name)
 
-    return actor_urls
+        return actor_urls
+
+    return get_cached(navigation_cache, 'actor', build_actor_urls)
 
 
 def get_directors_and_urls():
-    director_names = services.get_director_names(repo.repo_instance)
-    director_urls = dict()
-    for director_name in director_names:
-        director_urls[director_name] = url_for('news_bp.movies_by_director', director=director_name)
+    def build_director_urls():
+        director_names = services.get_director_names(repo.repo_instance, current_app.extensions.get('cache'))
+        director_urls = dict()
+        for director_name in director_names:
+            director_urls[director_name] = url_for('news_bp.movies_by_director', director=director_name)
+
+        return director_urls
+
+    return get_cached(navigation_cache, 'director', build_director_urls)
+
+
+def get_completions(kind: str, prefix: str, limit: int = 10):
+    urls = get_urls_by_kind[kind]()
+    index = get_cached(completion_cache, kind, lambda: PrefixIndex(urls.keys()))
+
+    return [{'name': name, 'url': urls[name]} for name in index.complete(prefix, limit)]
+
+
+get_urls_by_kind = {
+    'genre': get_genres_and_urls,
+    'actor': get_actors_and_urls,
+    'director': get_directors_and_urls,
+}
+
+
+@utilities_blueprint.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    # Read query parameters.
+    kind = request.args.get('kind', 'actor')
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+
+    if kind not in get_urls_by_kind:
+        return jsonify({'error': 'kind must be one of genre, actor or director'}), 400
+
+    return jsonify(get_completions(kind, prefix, max(0, min(limit, MAX_COMPLETIONS))))
+
+
+@utilities_blueprint.route('/completions', methods=['GET'])
+def completions():
+    # The names matching the prefix as a page of links, for browsers that don't run the navigation's script.
+    kind = request.args.get('kind', 'actor')
+    prefix = request.args.get('q', '')
+
+    if kind not in get_urls_by_kind:
+        return 'kind must be one of genre, actor or director', 400
+
+    return render_template(
+        'utilities/completions.html',
+        kind=kind,
+        prefix=prefix,
+        completions=get_completions(kind, prefix, MAX_COMPLETIONS),
+        selected_movies=get_selected_movies(),
+        genre_urls=get_genres_and_urls(),
+    )
+
+
+@utilities_blueprint.route('/page_cache', methods=['GET'])
+def page_cache_stats():
+    # Hit ratio, size and evictions of the page cache, for tuning PAGE_CACHE_SIZE. Only served if PAGE_CACHE_STATS is
+    # set, as it tells anyone what is being read.
+    page_cache = current_app.extensions.get('page_cache')
+    if page_cache is None or not current_app.config.get('PAGE_CACHE_STATS', False):
+        return jsonify({'error': 'the page cache statistics are disabled'}), 404
 
-    return director_urls
+    return jsonify(page_cache.stats())
 
 
 def get_selected_movies(quantity=3):
-    movies = services.get_random_movies(quantity, repo.repo_instance)
+    movies = services.get_random_movies(quantity, repo.repo_instance, current_app.extensions.get('movie_sampler'))
     return movies
\ No newline at end of file
@@ -1,6 +1,15 @@
+import os
+from datetime import datetime, timedelta
+
 import pytest
 
 from flask import session
+from werkzeug.http import http_date
+
+from movie import create_app
+from movie.adapters import repository
+from movie.domain.model import User
+import movie.news.services as services
 
 
 def test_register(client):
@@ -143,3 +152,156 @@ def test_articles_with_tag(client):
     assert b'Articles tagged by Health' in response.data
     assert b'Coronavirus: First case of virus in New Zealand' in response.data
     assert b'Covid 19 coronavirus: US deaths double in two days, Trump says quarantine not necessary' in response.data
+
+
+def test_ready():
+    # Loading on demand, the repository is loaded by the first request that uses it.
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'REPOSITORY_LOADING': 'on_demand',
+        'REPOSITORY_SNAPSHOT': None,
+        'TEST_DATA_PATH': os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'),
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+
+    assert client.get('/ready').status_code == 503
+    assert client.get('/').status_code == 200
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.data == b'ready'
+
+
+def test_autocomplete():
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'REPOSITORY_SNAPSHOT': None,
+        'TEST_DATA_PATH': os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'),
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+
+    # Names are matched from the start of any of their words, ignoring case.
+    assert client.get('/autocomplete?kind=actor&q=chr').json == [
+        {'name': 'Chris Pratt', 'url': '/movies_by_actor?actor=Chris+Pratt'}]
+    assert client.get('/autocomplete?kind=actor&q=PRATT').json == client.get('/autocomplete?kind=actor&q=chr').json
+    assert client.get('/autocomplete?kind=director&q=scott').json == [
+        {'name': 'Ridley Scott', 'url': '/movies_by_director?director=Ridley+Scott'}]
+    assert len(client.get('/autocomplete?kind=genre&q=a&limit=1').json) == 1
+    assert client.get('/autocomplete?kind=movie&q=a').status_code == 400
+
+    # Pages don't list the directors and actors; without JavaScript, the name typed is submitted for its matches.
+    response = client.get('/')
+    assert b'Ridley Scott' not in response.data
+    assert b'action="/completions"' in response.data
+
+    response = client.get('/completions?kind=director&q=scott')
+    assert response.status_code == 200
+    assert b'href="/movies_by_director?director=Ridley+Scott"' in response.data
+    assert b'No actor name matches' in client.get('/completions?kind=actor&q=zzz').data
+    assert client.get('/completions?kind=movie&q=a').status_code == 400
+
+
+def test_search():
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'REPOSITORY_SNAPSHOT': None,
+        'TEST_DATA_PATH': os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'),
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+
+    # Five movies match, most relevant first, three to a page.
+    response = client.get('/search?q=the')
+    assert response.status_code == 200
+    assert b'Search results for the' in response.data
+    assert [rank for rank in range(1, 6) if b"review?movie=%d'" % rank in response.data] == [1, 2, 5]
+    assert b'cursor=3' in response.data
+
+    response = client.get('/search?q=the&cursor=3')
+    assert [rank for rank in range(1, 6) if b"review?movie=%d'" % rank in response.data] == [3, 4]
+    assert b'cursor=0' in response.data
+
+
+def test_conditional_get(monkeypatch):
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'REPOSITORY_SNAPSHOT': None,
+        'TEST_DATA_PATH': os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'),
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+
+    # The repository was loaded within this second, and may change again within it.
+    loaded = repository.repo_instance.get_last_modified()
+    monkeypatch.setattr(repository.repo_instance, 'get_last_modified', lambda: datetime.utcnow().replace(microsecond=0))
+    response = client.get('/movies_by_genre?genre=Action', headers={'If-Modified-Since': http_date(loaded)})
+    assert response.status_code == 200
+    assert response.last_modified is None
+    monkeypatch.setattr(repository.repo_instance, 'get_last_modified', lambda: loaded - timedelta(seconds=1))
+
+    response = client.get('/movies_by_genre?genre=Action')
+    assert response.status_code == 200
+    etag, _ = response.get_etag()
+    assert response.last_modified == loaded - timedelta(seconds=1)
+    assert response.cache_control.no_cache
+
+    # A client holding the current page is answered without calling the services.
+    def fail(*args, **kwargs):
+        raise AssertionError('service called')
+    monkeypatch.setattr(services, 'get_movies_page', fail)
+    response = client.get('/movies_by_genre?genre=Action', headers={'If-None-Match': 'W/"%s"' % etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.get_etag() == (etag, True)
+    response = client.get('/movies_by_genre?genre=Action', headers={'If-Modified-Since': http_date(loaded)})
+    assert response.status_code == 304
+    monkeypatch.undo()
+
+    # Other arguments make another page.
+    response = client.get('/movies_by_genre?genre=Action&after=1', headers={'If-None-Match': 'W/"%s"' % etag})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+    # Adding to the repository changes every page.
+    version = repository.repo_instance.get_version()
+    repository.repo_instance.add_user(User('fmercury', 'mvNNbc1eLA$i'))
+    assert repository.repo_instance.get_version() != version
+    response = client.get('/movies_by_genre?genre=Action', headers={'If-None-Match': 'W/"%s"' % etag})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_page_cache():
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'REPOSITORY_SNAPSHOT': None,
+        'PAGE_CACHE_SIZE': 8,
+        'PAGE_CACHE_STATS': True,
+        'TEST_DATA_PATH': os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'),
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+    page_cache = app.extensions['page_cache']
+
+    page = client.get('/movies_by_genre?genre=Action').data
+    assert client.get('/movies_by_genre?genre=Action').data == page
+    client.get('/movies_by_genre?genre=Action&after=9')
+    assert page_cache.stats()['hits'] == 1
+    assert page_cache.stats()['size'] == 2
+
+    # A review drops the page listing its movie, and no other.
+    repository.repo_instance.add_user(User('fmercury', 'mvNNbc1eLA$i'))
+    services.add_review(1, 'Great soundtrack', 'fmercury', repository.repo_instance, 8, page_cache,
+                        app.extensions['cache'])
+    assert page_cache.stats()['size'] == 1
+    assert b'Great soundtrack' in client.get('/movies_by_genre?genre=Action&view_reviews_for=1').data
+
+    response = client.get('/page_cache')
+    assert response.json['invalidations'] == 1
+    assert response.json['capacity'] == 8
@@ -1,10 +1,14 @@
 from datetime import date, datetime
 
 import pytest
+from sqlalchemy import event
 
 from movie.adapters.database_repository import SqlAlchemyRepository
-from movie.domain.model import User, Movie, Genre, Review, make_review
+from movie.domain.model import User, Movie, Genre, Actor, Review, make_review
 from movie.adapters.repository import RepositoryException
+from movie.adapters.search_index import SearchIndex
+from movie.adapters.cache import MemoryCache
+import movie.utilities.services as utilities_services
 
 def test_repository_can_add_a_user(session_factory):
     repo = SqlAlchemyRepository(session_factory)
@@ -260,3 +264,147 @@ def test_can_retrieve_a_movie_and_add_a_review_to_it(session_factory):
     assert review in movie_fetched.reviews
     assert review in author_fetched.reviews
 
+
+def test_repository_can_retrieve_movie_ranks_for_actors_and_directors(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_movie_ranks_for_actor('Vin Diesel') == [1]
+    assert repo.get_movie_ranks_for_director('Ridley Scott') == [2]
+    assert repo.get_movie_ranks_for_actor('Rowan Atkinson') == []
+    assert repo.get_number_of_movies_for('actor', 'Chris Pratt') == 1
+
+
+def test_repository_recounts_movies_after_another_process_adds(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    other_repo = SqlAlchemyRepository(session_factory)
+    assert repo.get_number_of_movies_for('genre', 'Sci-Fi') == 2
+    assert repo.get_number_of_movies_for('actor', 'Nobody') == 0
+    assert len(repo._movie_counts) == 1
+
+    # Another Sci-Fi genre, linked to Split, is counted as well once it is added.
+    genre = Genre('Sci-Fi')
+    genre.add_genre_movie(other_repo.get_movie(3))
+    other_repo.add_genre(genre)
+    repo.reset_session()
+
+    assert repo.get_number_of_movies_for('genre', 'Sci-Fi') == 3
+
+
+def test_repository_links_movies_to_actors_and_directors(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    movies = repo.get_movies_by_director('David Ayer')
+    assert [movie.title for movie in movies] == ['Suicide Squad']
+
+    movie = repo.get_movie(1)
+    assert [director.director_full_name for director in movie.director] == ['James Gunn']
+    assert movie.is_acted_by(Actor('Vin Diesel'))
+    assert [genre.genre_name for genre in movie.genres] == ['Action', 'Adventure', 'Sci-Fi']
+
+
+def test_repository_counts_and_orders_movies(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_number_of_movies() == 5
+    assert repo.get_movie_ranks() == [1, 2, 3, 4, 5]
+    assert repo.get_first_movie().title == 'Guardians of the Galaxy'
+    assert repo.get_last_movie().title == 'Suicide Squad'
+
+
+def test_unit_of_work_writes_its_adds_when_it_exits(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    genre_version = repo.get_entity_version('genre')
+    user = User('Dave', '123456789')
+    commits = list()
+    event.listen(session_factory.kw['bind'], 'commit', lambda connection: commits.append(connection))
+
+    with repo.unit_of_work():
+        repo.add_user(user)
+        with repo.unit_of_work():
+            repo.add_user(User('Martin', '123456789'))
+        repo.add_genre(Genre('Western'))
+        repo.add_review(make_review('Not a western', user, repo.get_movie(1), 4))
+
+        # Nothing is committed until the outermost unit of work exits.
+        assert commits == []
+        assert repo.get_entity_version('genre') == genre_version
+
+    assert len(commits) == 1
+    assert session_factory().query(User).count() == 5
+    assert repo.get_user('Martin') == User('Martin', '123456789')
+    assert [review.review_text for review in repo.get_user('Dave').reviews] == ['Not a western']
+    assert repo.get_entity_version('genre') != genre_version
+    assert repo.get_movie_ranks_for_genre('Western') == []
+    assert session_factory().query(Genre).filter(Genre._Genre__genre_name == 'Western').count() == 1
+
+
+def test_unit_of_work_discards_its_adds_when_it_raises(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    with pytest.raises(ValueError):
+        with repo.unit_of_work():
+            repo.add_user(User('Dave', '123456789'))
+            raise ValueError
+
+    assert repo.get_user('Dave') is None
+
+    # Adds outside a unit of work are committed straight away again.
+    repo.add_user(User('Dave', '123456789'))
+    assert session_factory().query(User).count() == 4
+
+
+def test_unit_of_work_leaves_its_adds_usable(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    user = User('Dave', '123456789')
+
+    with repo.unit_of_work():
+        repo.add_user(user)
+        repo.add_user(User('Martin', '123456789'))
+
+    # The bulk inserted User is in the session, so reviewing with it doesn't insert it again.
+    repo.add_review(make_review('Not a western', user, repo.get_movie(1), 4))
+    assert session_factory().query(User).filter(User._User__user_name == 'Dave').count() == 1
+    assert [review.review_text for review in repo.get_user('Dave').reviews] == ['Not a western']
+
+
+def test_repository_searches_the_movies_in_the_database(session_factory):
+    # The index is built when the repository is created, unless populate built it.
+    repo = SqlAlchemyRepository(session_factory)
+    assert repo.search_movie_ranks('galaxy') == [1]
+
+    search_index = SearchIndex()
+    search_index.add(1001, 'Galaxy Quest', 'The cast of a space opera television series are drawn into a conflict.')
+    repo = SqlAlchemyRepository(session_factory, search_index)
+    assert repo.search_movie_ranks('galaxy') == [1001]
+
+
+def test_repository_version_changes_when_another_process_adds(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    statements = list()
+    event.listen(session_factory.kw['bind'], 'before_cursor_execute',
+                 lambda connection, cursor, statement, *args: statements.append(statement))
+    version = repo.get_version()
+    assert repo.get_version() == version
+
+    # The version is read from the versions table alone, once per transaction.
+    assert len(statements) == 1 and 'FROM versions' in statements[0]
+
+    # A write by another process, through its own repository, is seen through the database.
+    SqlAlchemyRepository(session_factory).add_user(User('Dave', '123456789'))
+    repo.reset_session()
+
+    assert repo.get_version() != version
+
+
+def test_entity_versions_are_shared_by_the_processes_of_a_database(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    other_repo = SqlAlchemyRepository(session_factory)
+    cache = MemoryCache(2 ** 20)
+    assert 'Western' not in utilities_services.get_genre_names(repo, cache)
+
+    # A genre added by another process changes the keys of the cached names, which are rebuilt.
+    other_repo.add_genre(Genre('Western'))
+    repo.reset_session()
+
+    assert repo.get_entity_version('genre') == other_repo.get_entity_version('genre')
+    assert 'Western' in utilities_services.get_genre_names(repo, cache)
@@ -0,0 +1,61 @@
+import os
+import threading
+
+import pytest
+from sqlalchemy.orm import clear_mappers
+
+from movie import create_app
+from movie.adapters import repository
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data')
+
+
+@pytest.fixture
+def database_app(tmp_path):
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'TEST_DATA_PATH': DATA_PATH,
+        'WTF_CSRF_ENABLED': False
+    })
+    yield app
+    clear_mappers()
+
+
+def test_concurrent_requests_get_their_own_sessions(database_app):
+    app = database_app
+    session_registry = repository.repo_instance._session_cm.session
+    number_of_clients = 4
+    barrier = threading.Barrier(number_of_clients)
+    sessions = list()
+    leaked = list()
+
+    # Holds every client inside a request at once, so that any session shared between requests would show up.
+    @app.route('/session')
+    def session_of_request():
+        session = session_registry()
+        barrier.wait(timeout=10)
+        sessions.append(session)
+        barrier.wait(timeout=10)
+        return str(session_registry() is session)
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(3):
+            assert test_client.get('/session').data == b'True'
+            assert test_client.get('/movies_by_genre?genre=Action').status_code == 200
+            leaked.append(session_registry.registry.has())
+
+    threads = [threading.Thread(target=client) for _ in range(number_of_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sessions) == 3 * number_of_clients
+    for start in range(0, len(sessions), number_of_clients):
+        assert len({id(session) for session in sessions[start:start + number_of_clients]}) == number_of_clients
+    # Each request's session is removed when the request ends.
+    assert leaked == [False] * 3 * number_of_clients
@@ -3,6 +3,7 @@ import pytest
 import datetime
 
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import clear_mappers
 
 from movie.domain.model import User, Movie, Review, Genre, make_review, make_genre_association
 
@@ -238,4 +239,157 @@ def test_save_commented_movie(empty_session):
     # Check that the comments table has a new record that links to the articles and users
     # tables.
     rows = list(empty_session.execute('SELECT user_id, movie_id, review FROM reviews'))
-    assert rows == [(user_key, movie_key, review_text)]
\ No newline at end of file
+    assert rows == [(user_key, movie_key, review_text)]
+
+
+def insert_listed_movies(empty_session, number_of_movies=12):
+    empty_session.execute('INSERT INTO users (id, username, password) VALUES (1, "thorke", "1234")')
+    empty_session.execute('INSERT INTO genres (id, name) VALUES (1, "Action"), (2, "Drama")')
+    for rank in range(1, number_of_movies + 1):
+        empty_session.execute(
+            'INSERT INTO movies (rank, title, discription, year, runtime, rating, votes, revenue, metascore) VALUES '
+            '(:rank, :title, "", 2016, 100, "7.0", 1, "N/A", 50)', {'rank': rank, 'title': 'Movie ' + str(rank)}
+        )
+        empty_session.execute('INSERT INTO movie_genres (movie_rank, genre_id) VALUES (:rank, :genre_id)',
+                              {'rank': rank, 'genre_id': rank % 2 + 1})
+        empty_session.execute('INSERT INTO reviews (user_id, movie_rank, review, rating, timestamp) VALUES '
+                              '(1, :rank, "Good", 7, "2020-09-29 10:00:00")', {'rank': rank})
+    empty_session.commit()
+
+
+def test_listing_fetch_plan_loads_a_page_in_a_constant_number_of_queries(empty_session):
+    from sqlalchemy import event
+    from movie.adapters.database_repository import FETCH_PLANS
+    from movie.news.services import movies_to_dict
+
+    insert_listed_movies(empty_session)
+
+    statements = list()
+    event.listen(empty_session.bind, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    counts = list()
+    for page_size in (3, 12):
+        empty_session.expunge_all()
+        statements.clear()
+        movies = empty_session.query(Movie).options(*FETCH_PLANS['listing']).filter(
+            Movie._Movie__rank.in_(range(1, page_size + 1))).all()
+        movies_dict = movies_to_dict(movies)
+        counts.append(len(statements))
+
+        assert len(movies_dict) == page_size
+        assert movies_dict[0]['reviews'][0]['username'] == 'thorke'
+        assert len(movies_dict[0]['genres'][0]['genred_movies']) == 6
+
+    assert counts[0] == counts[1]
+
+
+def test_movie_rows_match_loaded_movies(empty_session):
+    from movie.adapters.database_repository import FETCH_PLANS, select_movie_rows
+    from movie.news.services import movies_to_dict, movie_rows_to_dict
+
+    insert_listed_movies(empty_session)
+    ranks = [5, 2, 8]
+
+    movies = empty_session.query(Movie).options(*FETCH_PLANS['listing']).filter(Movie._Movie__rank.in_(ranks)).all()
+    movies.sort(key=lambda movie: ranks.index(movie.rank))
+
+    assert movie_rows_to_dict(select_movie_rows(empty_session, ranks + [99])) == movies_to_dict(movies)
+
+
+def query_plan(empty_session, statement, parameters=None):
+    rows = empty_session.execute('EXPLAIN QUERY PLAN ' + statement, parameters or {}).fetchall()
+    return ' '.join(row[-1] for row in rows)
+
+
+def test_lookups_use_indexes(empty_session):
+    plan = query_plan(empty_session, 'SELECT rank FROM movies WHERE year = :year', {'year': 2016})
+    assert 'INDEX ix_movies_year' in plan
+
+    plan = query_plan(empty_session, 'SELECT id FROM genres WHERE name = :name', {'name': 'Action'})
+    assert 'INDEX ix_genres_name' in plan
+
+    # Ranks of a genre are read in order from the index alone, without a sort.
+    plan = query_plan(empty_session, 'SELECT movie_rank FROM movie_genres WHERE genre_id = :genre_id '
+                                     'ORDER BY movie_rank ASC', {'genre_id': 1})
+    assert 'USING COVERING INDEX ix_movie_genres_genre_id_movie_rank' in plan
+    assert 'TEMP B-TREE' not in plan
+
+    plan = query_plan(empty_session, 'SELECT genre_id FROM movie_genres WHERE movie_rank = :rank', {'rank': 1})
+    assert 'USING COVERING INDEX ix_movie_genres_movie_rank_genre_id' in plan
+
+    plan = query_plan(empty_session, 'SELECT l.movie_rank FROM movie_actors l JOIN actors e ON e.id = l.actor_id '
+                                     'WHERE e.name = :name ORDER BY l.movie_rank', {'name': 'Vin Diesel'})
+    assert 'INDEX ix_actors_name' in plan
+    assert 'USING COVERING INDEX ix_movie_actors_actor_id_movie_rank' in plan
+
+    plan = query_plan(empty_session, 'SELECT l.movie_rank FROM movie_directors l JOIN directors e '
+                                     'ON e.id = l.director_id WHERE e.name = :name', {'name': 'James Gunn'})
+    assert 'INDEX ix_directors_name' in plan
+    assert 'USING COVERING INDEX ix_movie_directors_director_id_movie_rank' in plan
+
+    plan = query_plan(empty_session, 'SELECT * FROM reviews WHERE movie_rank = :rank', {'rank': 1})
+    assert 'INDEX ix_reviews_movie_rank' in plan
+
+    plan = query_plan(empty_session, 'SELECT * FROM reviews WHERE user_id = :user_id', {'user_id': 1})
+    assert 'INDEX ix_reviews_user_id' in plan
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes(tmp_path):
+    from sqlalchemy import create_engine, inspect
+    from movie.adapters.orm import upgrade_schema
+
+    engine = create_engine('sqlite:///' + str(tmp_path / 'movies.db'))
+    engine.execute('CREATE TABLE reviews (id INTEGER PRIMARY KEY, user_id INTEGER, movie_rank INTEGER, '
+                   'review VARCHAR(1024) NOT NULL, timestamp DATETIME NOT NULL)')
+    engine.execute('INSERT INTO reviews (user_id, movie_rank, review, timestamp) '
+                   'VALUES (1, 1, "Good", "2020-09-29 10:00:00")')
+
+    # Upgrading twice is the same as upgrading once.
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    inspector = inspect(engine)
+    assert 'rating' in [column['name'] for column in inspector.get_columns('reviews')]
+    assert {index['name'] for index in inspector.get_indexes('reviews')} == {
+        'ix_reviews_movie_rank', 'ix_reviews_user_id'
+    }
+    assert 'ix_movies_year' in [index['name'] for index in inspector.get_indexes('movies')]
+    assert list(engine.execute('SELECT review, rating FROM reviews')) == [('Good', None)]
+
+
+def test_upgrading_a_database_fills_the_actor_and_director_tables(tmp_path):
+    import os
+    from sqlalchemy import create_engine
+    from movie.adapters import database_repository
+    from movie.adapters.orm import metadata, upgrade_schema
+
+    data_path = os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data')
+    engine = create_engine('sqlite:///' + str(tmp_path / 'movies.db'))
+    metadata.create_all(engine)
+    database_repository.populate(engine, data_path)
+    actor_links = list(engine.execute('SELECT movie_rank, actor_id FROM movie_actors ORDER BY id'))
+    directors = list(engine.execute('SELECT id, name FROM directors ORDER BY id'))
+    number_of_genres = engine.execute('SELECT COUNT(*) FROM genres').scalar()
+
+    # A database made before actors and directors were mapped.
+    for table in ('movie_actors', 'movie_directors', 'actors', 'directors'):
+        engine.execute(f'DROP TABLE {table}')
+
+    upgrade_schema(engine)
+    database_repository.backfill_entities(engine, data_path)
+    database_repository.backfill_entities(engine, data_path)
+
+    assert list(engine.execute('SELECT movie_rank, actor_id FROM movie_actors ORDER BY id')) == actor_links
+    assert list(engine.execute('SELECT id, name FROM directors ORDER BY id')) == directors
+    # Tables that have rows are left as they are.
+    assert engine.execute('SELECT COUNT(*) FROM genres').scalar() == number_of_genres
+
+
+def test_domain_classes_keep_their_slots_when_the_mappers_are_cleared(empty_session):
+    clear_mappers()
+
+    movie = Movie('Split', 2016, 3)
+    user = User('Dave', '123456789')
+    make_review('Tense', user, movie, 7)
+    for entity in (movie, user, next(movie.reviews)):
+        assert entity.__dict__ == {}
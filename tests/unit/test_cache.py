@@ -0,0 +1,161 @@
+import pytest
+
+from movie.adapters.cache import MemoryCache, DiskCache, create_cache
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.model import User, Movie, Genre, make_genre_association
+import movie.news.services as services
+import movie.utilities.services as utilities_services
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def make_cache(request, tmp_path):
+    def make(max_bytes=1024 * 1024, namespace='', default_ttl=None, clock=None):
+        clock = clock or FakeClock()
+        if request.param == 'memory':
+            return MemoryCache(max_bytes, namespace, default_ttl, clock)
+        return DiskCache(str(tmp_path / 'cache.sqlite3'), max_bytes, namespace, default_ttl, clock)
+    return make
+
+
+def test_cache_returns_copies_of_stored_values(make_cache):
+    cache = make_cache()
+    value = {'title': 'Split', 'genres': ['Horror']}
+    cache.set(('movie', 3), value)
+    value['genres'].append('Thriller')
+
+    assert cache.get(('movie', 3)) == {'title': 'Split', 'genres': ['Horror']}
+    cache.get(('movie', 3))['genres'].append('Thriller')
+    assert cache.get(('movie', 3)) == {'title': 'Split', 'genres': ['Horror']}
+
+    cache.delete(('movie', 3))
+    assert cache.get(('movie', 3), 'missing') == 'missing'
+
+
+def test_cache_expires_values(make_cache):
+    clock = FakeClock()
+    cache = make_cache(default_ttl=60, clock=clock)
+    cache.set('short', 1, ttl=10)
+    cache.set('default', 2)
+
+    clock.now += 30
+    assert cache.get('short') is None
+    assert cache.get('default') == 2
+    clock.now += 30
+    assert cache.get('default') is None
+
+
+def test_cache_evicts_least_recently_used_values_beyond_max_bytes(make_cache):
+    clock = FakeClock()
+    cache = make_cache(max_bytes=250, clock=clock)
+    cache.set('a', b'a' * 100)
+    clock.now += 2
+    cache.set('b', b'b' * 100)
+    clock.now += 2
+    assert cache.get('a') == b'a' * 100
+    clock.now += 2
+    cache.set('c', b'c' * 100)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'a' * 100
+    assert cache.get('c') == b'c' * 100
+
+    # Values larger than the cache aren't stored.
+    cache.set('d', b'd' * 1000)
+    assert cache.get('d') is None
+
+
+def test_cache_bumping_a_tag_makes_its_values_stale(make_cache):
+    cache = make_cache()
+    cache.set('page 1', [1, 2, 3], tags=[('movie', 1), ('movie', 2)])
+    cache.set('page 2', [4, 5, 6], tags=[('movie', 4)])
+
+    cache.bump_tag(('movie', 2))
+    assert cache.get('page 1') is None
+    assert cache.get('page 2') == [4, 5, 6]
+
+    # A value built while its tag was bumped is stored stale.
+    versions = cache.tag_versions([('movie', 4)])
+    cache.bump_tag(('movie', 4))
+    cache.set('page 2', [4, 5, 6], tags=versions)
+    assert cache.get('page 2') is None
+
+    assert cache.get_or_set('page 2', lambda: [4, 5], tags=[('movie', 4)]) == [4, 5]
+    assert cache.get_or_set('page 2', lambda: [], tags=[('movie', 4)]) == [4, 5]
+
+
+def test_disk_cache_is_shared_by_files_within_a_namespace(tmp_path):
+    filename = str(tmp_path / 'cache.sqlite3')
+    first = DiskCache(filename, 1024 * 1024, 'movies')
+    second = DiskCache(filename, 1024 * 1024, 'movies')
+    other = DiskCache(filename, 1024 * 1024, 'other movies')
+
+    first.set('page', [1, 2, 3], tags=['movie 1'])
+    assert second.get('page') == [1, 2, 3]
+    assert other.get('page') is None
+
+    second.bump_tag('movie 1')
+    assert first.get('page') is None
+
+
+def test_create_cache_selects_the_backend(tmp_path):
+    assert create_cache({'CACHE_BACKEND': 'none'}) is None
+    assert isinstance(create_cache({'CACHE_BACKEND': 'memory'}), MemoryCache)
+    assert isinstance(create_cache({'CACHE_BACKEND': 'disk', 'CACHE_FILE': str(tmp_path / 'cache.sqlite3')}),
+                      DiskCache)
+    with pytest.raises(ValueError):
+        create_cache({'CACHE_BACKEND': 'redis'})
+
+
+def test_services_serve_pages_from_the_cache_until_a_movie_is_reviewed():
+    repo = MemoryRepository()
+    genre = Genre('Action')
+    for rank in range(1, 5):
+        movie = Movie('Movie %d' % rank, 2016, rank)
+        make_genre_association(movie, genre)
+        repo.add_movie(movie)
+    repo.add_genre(genre)
+    repo.add_user(User('fmercury', 'mvNNbc1eLA$i'))
+    cache = MemoryCache(1024 * 1024)
+
+    page = services.get_movies_page('genre', 'Action', None, 3, True, repo, cache)
+    assert page == services.get_movies_page('genre', 'Action', None, 3, True, repo)
+    assert [movie['rank'] for movie in page] == [2, 3, 4]
+    assert services.get_movies_page('genre', 'Action', None, 3, True, repo, cache) == page
+
+    services.add_review(3, 'Great soundtrack', 'fmercury', repo, 8, cache=cache)
+    page = services.get_movies_page('genre', 'Action', None, 3, True, repo, cache)
+    assert [review['review_text'] for review in page[1]['reviews']] == ['Great soundtrack']
+    assert page == services.get_movies_page('genre', 'Action', None, 3, True, repo)
+
+
+def test_services_do_not_serve_cached_lists_after_an_entity_is_added():
+    repo = MemoryRepository()
+    genre = Genre('Action')
+    for rank in range(1, 3):
+        movie = Movie('Movie %d' % rank, 2016, rank)
+        make_genre_association(movie, genre)
+        repo.add_movie(movie)
+    repo.add_genre(genre)
+    cache = MemoryCache(1024 * 1024)
+
+    assert utilities_services.get_genre_names(repo, cache) == ['Action']
+    assert services.get_number_of_movies_for('genre', 'Action', repo, cache) == 2
+    assert [movie['rank'] for movie in services.get_movies_page('genre', 'Action', None, 3, True, repo, cache)] == [1, 2]
+
+    movie = Movie('Movie 3', 2016, 3)
+    make_genre_association(movie, genre)
+    repo.add_movie(movie)
+    repo.add_genre(Genre('Sci-Fi'))
+
+    assert utilities_services.get_genre_names(repo, cache) == ['Action', 'Sci-Fi']
+    assert services.get_number_of_movies_for('genre', 'Action', repo, cache) == 3
+    assert [movie['rank'] for movie in services.get_movies_page('genre', 'Action', None, 3, True, repo, cache)] == \
+        [1, 2, 3]
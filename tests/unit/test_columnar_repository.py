@@ -0,0 +1,156 @@
+import pytest
+
+from movie.domain.model import User, Movie, Genre, make_review
+from movie.adapters.columnar_repository import ColumnarRepository, FrozenColumnarRepository, frozen_arrays
+from movie.adapters.frozen import read_arrays, write_arrays
+from movie.adapters.repository import RepositoryException
+
+
+@pytest.fixture
+def columnar_repo():
+    repo = ColumnarRepository()
+    repo.append_movie(1, 'Guardians of the Galaxy', year=2014, runtime=121, rating=8.1, metascore=76,
+                      genres=['Action', 'Adventure', 'Sci-Fi'], actors=['Chris Pratt', 'Vin Diesel'],
+                      directors=['James Gunn'])
+    repo.append_movie(2, 'Prometheus', year=2012, runtime=124, rating=7.0, metascore=65,
+                      genres=['Adventure', 'Mystery', 'Sci-Fi'], actors=['Noomi Rapace'],
+                      directors=['Ridley Scott'])
+    repo.append_movie(3, 'Split', year=2016, runtime=117, rating=7.3,
+                      genres=['Horror', 'Thriller'], actors=['James McAvoy'], directors=['M. Night Shyamalan'])
+    return repo
+
+
+def test_repository_builds_movies_on_demand(columnar_repo):
+    movie = columnar_repo.get_movie(2)
+
+    assert movie == Movie('Prometheus', 2012, 2)
+    assert movie.runtime_minutes == 124
+    assert movie.is_genred_by(Genre('Mystery'))
+    assert columnar_repo.get_movie(2) is movie
+    assert columnar_repo.get_movie(4) is None
+
+
+def test_repository_returns_movie_ranks_for_entities(columnar_repo):
+    assert columnar_repo.get_movie_ranks_for_genre('Adventure') == [1, 2]
+    assert columnar_repo.get_movie_ranks_for_actor('Vin Diesel') == [1]
+    assert columnar_repo.get_movie_ranks_for_director('Chun David') == []
+    assert [genre.genre_name for genre in columnar_repo.get_genre()][:3] == ['Action', 'Adventure', 'Sci-Fi']
+
+    adventure = columnar_repo.get_genre()[1]
+    assert [movie.rank for movie in adventure.genre_movie] == [1, 2]
+
+
+def test_repository_navigates_years_of_movies(columnar_repo):
+    assert columnar_repo.get_first_movie().title == 'Guardians of the Galaxy'
+    assert columnar_repo.get_last_movie().title == 'Split'
+    assert columnar_repo.get_year_of_previous_movie(columnar_repo.get_movie(1)) == 2012
+    assert columnar_repo.get_year_of_next_movie(columnar_repo.get_movie(3)) is None
+
+
+def test_repository_filters_and_sorts_columns(columnar_repo):
+    assert columnar_repo.find_movie_ranks(genre='Sci-Fi', order_by='rating', descending=True) == [1, 2]
+    assert columnar_repo.find_movie_ranks(min_rating=7.2, order_by='title') == [1, 3]
+
+    # Split has no metascore, so it sorts last in both directions.
+    assert columnar_repo.find_movie_ranks(order_by='metascore') == [2, 1, 3]
+    assert columnar_repo.find_movie_ranks(order_by='metascore', descending=True, limit=2) == [1, 2]
+
+
+def test_repository_keeps_reviews_of_rebuilt_movies(columnar_repo):
+    user = User('thorke', 'cLQ^C#oFXloS')
+    columnar_repo.add_user(user)
+    columnar_repo.add_review(make_review('Loved it', user, columnar_repo.get_movie(3), 8))
+
+    # A later write invalidates the built Movies, but reviews are re-attached when a Movie is rebuilt.
+    columnar_repo.add_movie(Movie('Sing', 2016, 4))
+
+    assert columnar_repo.get_movie(3).number_of_reviews == 1
+    assert [movie.rank for movie in columnar_repo.get_movies_by_year(2016)] == [4, 3]
+
+
+def test_repository_merges_writes_into_built_arrays(columnar_repo):
+    # Reading builds the arrays; later movies are merged into them, and links to built movies rebuild their kind.
+    assert columnar_repo.get_first_movie().title == 'Guardians of the Galaxy'
+    columnar_repo.append_movie(4, 'Arrival', year=2016, genres=['Sci-Fi', 'Drama'], actors=['Amy Adams'],
+                               directors=['Denis Villeneuve'])
+    columnar_repo.append_movie(5, 'Zootopia', year=2010, genres=['Adventure'], actors=['Chris Pratt'])
+    assert columnar_repo.get_movie_ranks_for_genre('Sci-Fi') == [1, 2, 4]
+    assert columnar_repo.get_movie_ranks_for_actor('Chris Pratt') == [1, 5]
+    assert columnar_repo.get_movie_ranks_for_genre('Drama') == [4]
+
+    prequel = Genre('Prequel')
+    prequel.add_genre_movie(columnar_repo.get_movie(2))
+    columnar_repo.add_genre(prequel)
+
+    assert columnar_repo.get_movie_ranks_for_genre('Prequel') == [2]
+    assert columnar_repo.get_movie_ranks_for_genre('Adventure') == [1, 2, 5]
+    assert columnar_repo.get_first_movie().title == 'Arrival'
+    assert columnar_repo.get_last_movie().title == 'Zootopia'
+    assert columnar_repo.get_year_of_previous_movie(columnar_repo.get_movie(2)) == 2010
+    assert columnar_repo.find_movie_ranks(order_by='title') == [4, 1, 2, 3, 5]
+
+
+def test_repository_finds_movies_and_names_added_after_a_build(columnar_repo):
+    assert columnar_repo.search_movie_ranks('galaxy') == [1]
+    columnar_repo.append_movie(0, 'Galaxy Quest', actors=['Sigourney Weaver', 'Chris Pratt'])
+    columnar_repo.append_movie(2, 'Alien', actors=['Sigourney Weaver'])
+
+    # Before and after the additions are merged into the arrays by a build.
+    for _ in range(2):
+        assert columnar_repo.get_movie(0).title == 'Galaxy Quest'
+        assert columnar_repo.get_movie(2).title == 'Alien'
+        assert columnar_repo.search_movie_ranks('galaxy') == [0, 1]
+        assert columnar_repo.search_movie_ranks('prometheus') == []
+        assert columnar_repo.get_movie_ranks_for_actor('Sigourney Weaver') == [0, 2]
+        assert [actor.actor_full_name for actor in columnar_repo.get_actor()][-1] == 'Sigourney Weaver'
+        columnar_repo.catalogue_loaded()
+
+
+@pytest.fixture
+def frozen_repo(columnar_repo, tmp_path):
+    user = User('thorke', 'cLQ^C#oFXloS')
+    columnar_repo.add_user(user)
+    columnar_repo.add_review(make_review('Loved it', user, columnar_repo.get_movie(3), 8))
+
+    filename = str(tmp_path / 'movie-repository.frozen')
+    write_arrays(filename, frozen_arrays(columnar_repo), b'\0' * 32)
+    return FrozenColumnarRepository(read_arrays(filename, b'\0' * 32))
+
+
+def test_frozen_repository_answers_from_mapped_arrays(frozen_repo):
+    assert not frozen_repo.column('rating').flags.writeable
+    assert not frozen_repo._columns['rank'].flags.writeable
+
+    movie = frozen_repo.get_movie(2)
+    assert movie == Movie('Prometheus', 2012, 2)
+    assert movie.is_genred_by(Genre('Mystery'))
+    assert frozen_repo.get_movie(4) is None
+    assert frozen_repo.get_movie_ranks_for_genre('Adventure') == [1, 2]
+    assert frozen_repo.get_movie_ranks_for_director('Chun David') == []
+    assert frozen_repo.get_last_movie().title == 'Split'
+    assert frozen_repo.find_movie_ranks(order_by='metascore', descending=True, limit=2) == [1, 2]
+    assert frozen_repo.search_movie_ranks('prometheus') == [2]
+
+
+def test_frozen_repository_keeps_users_and_reviews_in_an_overlay(frozen_repo):
+    assert frozen_repo.get_user('thorke') == User('thorke', 'cLQ^C#oFXloS')
+    assert frozen_repo.get_movie(3).number_of_reviews == 1
+
+    user = User('dave', '123456789')
+    frozen_repo.add_user(user)
+    frozen_repo.add_review(make_review('Scary', user, frozen_repo.get_movie(3), 6))
+    assert frozen_repo.get_user('dave') is user
+    assert frozen_repo.get_movie(3).number_of_reviews == 2
+
+    with pytest.raises(RepositoryException):
+        frozen_repo.add_movie(Movie('Sing', 2016, 4))
+    with pytest.raises(RepositoryException):
+        frozen_repo.add_genre(Genre('Musical'))
+
+
+def test_frozen_file_is_ignored_when_the_data_changes(columnar_repo, tmp_path):
+    filename = str(tmp_path / 'movie-repository.frozen')
+    write_arrays(filename, frozen_arrays(columnar_repo), b'\0' * 32)
+
+    assert read_arrays(filename, b'\1' * 32) is None
+    assert read_arrays(str(tmp_path / 'missing.frozen'), b'\0' * 32) is None
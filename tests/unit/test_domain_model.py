@@ -108,3 +108,13 @@ def test_make_genre_associations_with_movie_already_tagged(movie, genre):
 
     with pytest.raises(ModelException):
         make_genre_association(movie, genre)
+
+
+def test_entities_keep_their_fields_in_slots(movie, user, actor, genre):
+    make_genre_association(movie, genre)
+    make_actor_association(movie, actor)
+    make_review('Movie World!', user, movie, 5)
+
+    # Fields live in __slots__, so the instance dictionary (kept for the ORM) stays empty.
+    for entity in (movie, user, actor, genre, next(movie.reviews)):
+        assert entity.__dict__ == {}
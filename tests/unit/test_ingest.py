@@ -0,0 +1,35 @@
+from movie.adapters.ingest import MovieRecord, read_movie_batches, read_movie_records
+
+MOVIES_CSV = '''Rank,Title,Genre,Description,Director,Actors,Year,Runtime (Minutes),Rating,Votes,Revenue (Millions),Metascore
+1,Guardians of the Galaxy,"Action,Adventure,Sci-Fi",A group of criminals.,James Gunn,"Chris Pratt, Vin Diesel",2014,121,8.1,757074,333.13,76
+2,Prometheus,"Adventure,Mystery,Sci-Fi",Following clues.,Ridley Scott,"Noomi Rapace, Michael Fassbender",2012,124,7,485820,N/A,65
+3, Split ,"Horror,Thriller",Three girls.,M. Night Shyamalan,"James McAvoy, Anya Taylor-Joy",2016,117,7.3,157606,138.12,N/A
+'''
+
+
+def write_movies(tmp_path):
+    filename = tmp_path / 'Data1000Movies.csv'
+    filename.write_text(MOVIES_CSV, encoding='utf-8')
+    return str(filename)
+
+
+def test_records_are_typed_and_split(tmp_path):
+    records = list(read_movie_records(write_movies(tmp_path)))
+
+    assert records[0] == MovieRecord(
+        rank=1, title='Guardians of the Galaxy', description='A group of criminals.', year=2014, runtime=121,
+        rating=8.1, votes=757074, revenue=333.13, metascore=76, genres=('Action', 'Adventure', 'Sci-Fi'),
+        directors=('James Gunn',), actors=('Chris Pratt', 'Vin Diesel'))
+    assert records[1].revenue is None
+    assert records[2].title == 'Split' and records[2].metascore is None
+
+
+def test_batches_give_each_name_one_id(tmp_path):
+    batches = list(read_movie_batches(write_movies(tmp_path), batch_size=2))
+
+    assert [[movie.rank for movie in batch.movies] for batch in batches] == [[1, 2], [3]]
+    assert batches[0].entities['genre'] == [(1, 'Action'), (2, 'Adventure'), (3, 'Sci-Fi'), (4, 'Mystery')]
+    assert batches[0].links['genre'] == [(1, 1), (1, 2), (1, 3), (2, 2), (2, 4), (2, 3)]
+    assert batches[1].entities['genre'] == [(5, 'Horror'), (6, 'Thriller')]
+    assert batches[1].entities['director'] == [(3, 'M. Night Shyamalan')]
+    assert batches[1].links['actor'] == [(3, 5), (3, 6)]
@@ -1,10 +1,17 @@
+import os
+import shutil
+import threading
 from datetime import date, datetime
 from typing import List
 
 import pytest
+from werkzeug.security import check_password_hash
 
-from movie.domain.model import User, Movie, Actor,Genre, Review, make_review
+from movie.domain.model import User, Movie, Actor,Genre, Director, Review, make_review, make_director_association, \
+    make_genre_association
 from movie.adapters.repository import RepositoryException
+from movie.adapters import memory_repository
+from movie.adapters.memory_repository import MemoryRepository, LazyMemoryRepository
 
 
 def test_repository_can_add_a_user(in_memory_repo):
@@ -215,3 +222,261 @@ def test_repository_returns_an_empty_list_for_non_existent_director(in_memory_re
     movies = in_memory_repo.get_movies_by_director('Chun David')
 
     assert len(movies) == 0
+
+
+def test_repository_indexes_entities_by_name():
+    repo = MemoryRepository()
+    movie = Movie('Prometheus', 2012, 2)
+    repo.add_movie(movie)
+    director = Director('Ridley Scott')
+    make_director_association(movie, director)
+    repo.add_director(director)
+    repo.add_user(User('dbowie', '1234567890'))
+    repo.add_user(User('dbowie', '0987654321'))
+
+    assert repo.get_user('dbowie').password == '1234567890'
+    assert repo.get_movie_ranks_for_director('Ridley Scott') == [2]
+    assert repo.get_movies_by_director('Ridley Scott') == [movie]
+    assert repo.get_movie_ranks_for_actor('Noomi Rapace') == []
+
+
+def test_repository_navigates_years_of_movies():
+    repo = MemoryRepository()
+    repo.add_movie(Movie('Prometheus', 2012, 2))
+    repo.add_movie(Movie('Split', 2016, 3))
+    repo.add_movie(Movie('Sing', 2016, 5))
+    repo.add_movie(Movie('Guardians of the Galaxy', 2014, 1))
+
+    assert [movie.title for movie in repo.get_movies_by_year(2016)] == ['Sing', 'Split']
+    assert repo.get_movies_by_year(2013) == []
+    assert repo.get_year_of_previous_movie(repo.get_movie(3)) == 2014
+    assert repo.get_year_of_next_movie(repo.get_movie(1)) == 2016
+    assert repo.get_year_of_previous_movie(repo.get_movie(2)) is None
+    assert repo.get_year_of_next_movie(repo.get_movie(5)) is None
+
+
+def test_repository_warm_starts_from_a_snapshot(tmp_path):
+    data_path = str(tmp_path / 'data')
+    shutil.copytree(os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data'), data_path)
+    snapshot = str(tmp_path / 'repository.snapshot')
+
+    repo = MemoryRepository()
+    memory_repository.populate_from_snapshot(data_path, repo, snapshot)
+    warm_repo = MemoryRepository()
+    assert memory_repository.load_snapshot(snapshot, memory_repository.data_checksum(data_path), warm_repo)
+
+    movie = warm_repo.get_movie(1)
+    assert movie.title == 'Guardians of the Galaxy'
+    assert movie.number_of_reviews == repo.get_movie(1).number_of_reviews
+    assert warm_repo.get_movie_ranks_for_genre('Adventure') == repo.get_movie_ranks_for_genre('Adventure')
+    assert warm_repo.get_user('thorke').password == repo.get_user('thorke').password
+    # Reviews keep the time they were written.
+    assert warm_repo.get_reviews() == repo.get_reviews()
+
+    # A snapshot built from other data is ignored.
+    with open(os.path.join(data_path, 'users.csv'), 'a') as outfile:
+        outfile.write('\n4,dbowie,Changes1971')
+    assert not memory_repository.load_snapshot(snapshot, memory_repository.data_checksum(data_path), MemoryRepository())
+
+
+def test_snapshot_is_replaced_whole_or_not_at_all(tmp_path, monkeypatch):
+    data_path = os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data')
+    checksum = memory_repository.data_checksum(data_path)
+    snapshot = str(tmp_path / 'repository.snapshot')
+    repo = MemoryRepository()
+    memory_repository.populate_from_snapshot(data_path, repo, snapshot)
+
+    def fail(*args, **kwargs):
+        raise OSError('No space left on device')
+
+    # A save that fails leaves the last snapshot, and no temporary file.
+    monkeypatch.setattr(memory_repository.pickle, 'dump', fail)
+    with pytest.raises(OSError):
+        memory_repository.save_snapshot(repo, snapshot, checksum)
+    assert os.listdir(str(tmp_path)) == ['repository.snapshot']
+    assert memory_repository.load_snapshot(snapshot, checksum, MemoryRepository())
+
+
+def test_repository_hashes_user_passwords_in_a_process_pool():
+    repo = MemoryRepository()
+    data_path = os.path.join(os.path.dirname(__file__), '..', '..', 'movie', 'adapters', 'data')
+    users = memory_repository.load_users(data_path, repo, hash_processes=2)
+
+    assert [user.user_name for user in users.values()] == ['thorke', 'fmercury', 'mjackson']
+    assert check_password_hash(repo.get_user('fmercury').password, 'mvNNbc1eLA$i')
+
+
+def test_repository_versions_change_when_entities_are_added():
+    repo = MemoryRepository()
+    genre_version = repo.get_entity_version('genre')
+    actor_version = repo.get_entity_version('actor')
+
+    repo.add_genre(Genre('Crime'))
+
+    assert repo.get_entity_version('genre') != genre_version
+    assert repo.get_entity_version('actor') == actor_version
+
+
+def test_repository_pages_through_movies_of_a_genre():
+    repo = MemoryRepository()
+    genre = Genre('Action')
+    for rank in (9, 2, 5, 7, 1):
+        movie = Movie('Movie %d' % rank, 2016, rank)
+        repo.add_movie(movie)
+        make_genre_association(movie, genre)
+    repo.add_genre(genre)
+
+    assert [movie.rank for movie in repo.get_movies_page('genre', 'Action', None, 2)] == [1, 2]
+    assert [movie.rank for movie in repo.get_movies_page('genre', 'Action', 2, 2)] == [5, 7]
+    assert [movie.rank for movie in repo.get_movies_page('genre', 'Action', 5, 2, descending=True)] == [2, 1]
+    assert [movie.rank for movie in repo.get_movies_page('genre', 'Action', None, 1, descending=True)] == [9]
+    assert repo.get_movies_page('genre', 'Action', 9, 2) == []
+    assert repo.get_number_of_movies_for('genre', 'Action') == 5
+    assert repo.get_number_of_movies_for('actor', 'Vin Diesel') == 0
+
+
+def test_repository_keeps_the_ranks_of_a_bounded_number_of_names_with_movies(monkeypatch):
+    monkeypatch.setattr(memory_repository, 'MAX_CACHED_ENTITIES', 2)
+    repo = MemoryRepository()
+    for name in ('Action', 'Drama', 'Horror'):
+        genre = Genre(name)
+        movie = Movie(name + ' movie', 2016, len(repo.get_genre()) + 1)
+        repo.add_movie(movie)
+        make_genre_association(movie, genre)
+        repo.add_genre(genre)
+
+    # Names made up in requests aren't kept, and only the most recently used names are.
+    for rank in range(100):
+        assert repo.get_movies_page('actor', 'Nobody %d' % rank) == []
+    for name in ('Action', 'Drama', 'Horror'):
+        assert len(repo.get_movies_page('genre', name)) == 1
+    assert len(repo._entity_ranks) == 2
+
+
+def test_repository_returns_rows_of_movies_in_rank_list_order():
+    repo = MemoryRepository()
+    user = User('thorke', 'cLQ^C#oFXloS')
+    genre = Genre('Action')
+    for rank in (1, 2):
+        movie = Movie('Movie %d' % rank, 2016, rank)
+        repo.add_movie(movie)
+        make_genre_association(movie, genre)
+    make_review('Loved it', user, repo.get_movie(2), 8)
+
+    rows = repo.get_movie_rows([2, 4, 1])
+
+    assert [row.rank for row in rows] == [2, 1]
+    assert rows[0].genres[0] == ('Action', (1, 2))
+    assert rows[0].reviews[0].username == 'thorke'
+    assert rows[0].reviews[0].rating == 8
+    assert rows[1].reviews == ()
+
+
+def test_repository_unit_of_work_stores_adds_immediately():
+    repo = MemoryRepository()
+
+    with repo.unit_of_work() as unit_of_work:
+        repo.add_user(User('dave', '123456789'))
+        assert unit_of_work is repo
+        assert repo.get_user('dave') == User('dave', '123456789')
+
+
+def test_repository_version_changes_with_every_add():
+    repo = MemoryRepository()
+    user = User('dave', '123456789')
+    movie = Movie('Guardians of the Galaxy', 2014, 1)
+    adds = [
+        lambda: repo.add_user(user),
+        lambda: repo.add_movie(movie),
+        lambda: repo.add_genre(Genre('Action')),
+        lambda: repo.add_actor(Actor('Chris Pratt')),
+        lambda: repo.add_director(Director('James Gunn')),
+        lambda: repo.add_review(make_review('Loved it', user, movie, 8)),
+    ]
+
+    versions = [repo.get_version()]
+    for add in adds:
+        add()
+        versions.append(repo.get_version())
+
+    assert len(set(versions)) == len(versions)
+    assert repo.get_last_modified() <= datetime.utcnow()
+
+
+def test_lazy_repository_waits_for_background_loading():
+    release = threading.Event()
+
+    def load(repo):
+        repo.add_movie(Movie('Guardians of the Galaxy', 2014, 1))
+        release.wait(timeout=10)
+        repo.add_movie(Movie('Prometheus', 2012, 2))
+
+    repo = LazyMemoryRepository(load)
+    repo.start_loading()
+    assert not repo.is_ready()
+    assert not repo.wait_until_ready(timeout=0.01)
+
+    counts = list()
+    reader = threading.Thread(target=lambda: counts.append(repo.get_number_of_movies()))
+    reader.start()
+    release.set()
+    reader.join(timeout=10)
+
+    # The reader waited for the whole repository rather than seeing the first Movie alone.
+    assert counts == [2]
+    assert repo.is_ready()
+
+
+def test_lazy_repository_serves_movies_while_users_and_reviews_load():
+    release = threading.Event()
+
+    def load(repo):
+        repo.add_movie(Movie('Guardians of the Galaxy', 2014, 1))
+        repo.add_genre(Genre('Action'))
+        repo.catalogue_loaded()
+        release.wait(timeout=10)
+        repo.add_user(User('dave', '123456789'))
+
+    repo = LazyMemoryRepository(load)
+    repo.start_loading()
+
+    assert repo.get_movie(1) == Movie('Guardians of the Galaxy', 2014, 1)
+    assert [genre.genre_name for genre in repo.get_genre()] == ['Action']
+    assert not repo.is_ready()
+
+    users = list()
+    reader = threading.Thread(target=lambda: users.append(repo.get_user('dave')))
+    reader.start()
+    release.set()
+    reader.join(timeout=10)
+
+    # Users are only read once loading has finished.
+    assert users == [User('dave', '123456789')]
+    assert repo.is_ready()
+
+
+def test_lazy_repository_loads_on_first_use():
+    loads = list()
+
+    def load(repo):
+        loads.append(threading.current_thread())
+        repo.add_user(User('dave', '123456789'))
+
+    repo = LazyMemoryRepository(load)
+    assert not repo.is_ready()
+
+    assert repo.get_user('dave') == User('dave', '123456789')
+    assert loads == [threading.current_thread()]
+    assert repo.is_ready()
+
+
+def test_lazy_repository_reports_a_failed_load():
+    def load(repo):
+        raise OSError('Data1000Movies.csv not found')
+
+    repo = LazyMemoryRepository(load)
+    repo.start_loading()
+
+    assert not repo.wait_until_ready(timeout=10)
+    with pytest.raises(RepositoryException):
+        repo.get_movie(1)
@@ -0,0 +1,95 @@
+import gc
+
+from movie.adapters.cache import MemoryCache
+from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.repository import movie_row
+from movie.domain.model import User, Movie, Genre, make_genre_association, make_review
+import movie.news.services as services
+from movie.news.services import MovieDictCache, build_movie_dict
+
+
+def make_movies():
+    genre = Genre('Action')
+    movies = [Movie('Movie %d' % rank, 2016, rank) for rank in range(1, 4)]
+    for movie in movies:
+        make_genre_association(movie, genre)
+    return movies, genre
+
+
+def test_movie_dicts_are_built_once_and_copied():
+    movies, genre = make_movies()
+    cache = MovieDictCache()
+
+    movie_dict = cache.movie_dict(movies[0])
+    assert movie_dict == build_movie_dict(movies[0])
+    movie_dict['view_review_url'] = '/movies_by_genre?genre=Action'
+
+    again = cache.movie_dict(movies[0])
+    assert 'view_review_url' not in again
+    assert again['genres'] is movie_dict['genres']
+    # Genre dicts are shared by the dicts of the genre's movies.
+    assert cache.movie_dict(movies[1])['genres'][0] is movie_dict['genres'][0]
+
+
+def test_movie_dicts_are_rebuilt_when_a_review_or_genre_is_added():
+    movies, genre = make_movies()
+    cache = MovieDictCache()
+    cache.movie_dict(movies[0])
+
+    make_review('Loved it', User('dave', '123456789'), movies[0], 8)
+    assert [review['review_text'] for review in cache.movie_dict(movies[0])['reviews']] == ['Loved it']
+
+    make_genre_association(Movie('Movie 4', 2016, 4), genre)
+    assert cache.movie_dict(movies[0])['genres'][0]['genred_movies'] == [1, 2, 3, 4]
+
+    make_genre_association(movies[0], Genre('Comedy'))
+    assert [genre_dict['name'] for genre_dict in cache.movie_dict(movies[0])['genres']] == ['Action', 'Comedy']
+    assert cache.movie_dict(movies[0]) == build_movie_dict(movies[0])
+
+
+def test_movie_and_row_dicts_agree_on_the_first_genre():
+    movies, genre = make_movies()
+    movie = Movie('Movie 4', 2016, 4)
+
+    assert services.movie_to_dict(movies[0])['genre'] == services.movie_row_to_dict(movie_row(movies[0]))['genre']
+    assert services.movie_to_dict(movie)['genre'] is None
+    assert services.movie_row_to_dict(movie_row(movie))['genre'] is None
+
+
+def test_add_review_marks_the_movie_dirty():
+    movies, genre = make_movies()
+    repo = MemoryRepository()
+    for movie in movies:
+        repo.add_movie(movie)
+    repo.add_user(User('fmercury', 'mvNNbc1eLA$i'))
+    assert services.get_movie(2, repo)['reviews'] == []
+
+    services.add_review(2, 'Great soundtrack', 'fmercury', repo, 8)
+    assert [review['review_text'] for review in services.get_movie(2, repo)['reviews']] == ['Great soundtrack']
+
+
+def test_pages_of_a_memory_repository_are_converted_through_the_memo_with_or_without_a_cache():
+    movies, genre = make_movies()
+    repo = MemoryRepository()
+    for movie in movies:
+        repo.add_movie(movie)
+    repo.add_genre(genre)
+    cache = MemoryCache(1024 * 1024)
+
+    page = services.get_movies_page('genre', 'Action', None, 3, False, repo)
+    assert page == [build_movie_dict(movie) for movie in movies]
+    assert services.get_movies_page('genre', 'Action', None, 3, False, repo, cache)[0]['genres'] is page[0]['genres']
+    assert services.get_movies_by_rank([2], repo, cache)[0]['genres'] is page[1]['genres']
+
+
+def test_movie_dicts_are_dropped_with_their_movies():
+    movies, genre = make_movies()
+    cache = MovieDictCache()
+    for movie in movies:
+        cache.movie_dict(movie)
+
+    assert len(cache._movies) == 3
+
+    del movies, movie, genre
+    gc.collect()
+    assert len(cache._movies) == 0
@@ -0,0 +1,63 @@
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.model import User
+from movie.utilities.page_cache import PageCache, page_generation
+
+
+def test_page_cache_evicts_the_least_recently_used_page():
+    cache = PageCache(2)
+    cache.get('a', 1)
+    cache.put('a', 1, 'page a', [1], cache.epoch())
+    cache.put('b', 1, 'page b', [2], cache.epoch())
+
+    assert cache.get('a', 1) == 'page a'
+    cache.put('c', 1, 'page c', [3], cache.epoch())
+
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == 'page a'
+    assert cache.get('c', 1) == 'page c'
+    assert cache.stats() == {
+        'capacity': 2, 'size': 2, 'hits': 3, 'misses': 2, 'hit_ratio': 0.6, 'evictions': 1, 'invalidations': 0
+    }
+
+
+def test_page_cache_drops_only_the_pages_listing_a_reviewed_movie():
+    cache = PageCache(10)
+    cache.get('home', 1)
+    cache.put('home', 1, 'home page', [], cache.epoch())
+    cache.put('action', 1, 'action page', [1, 2, 3], cache.epoch())
+    cache.put('action 2', 1, 'next action page', [4, 5, 6], cache.epoch())
+    cache.put('sci-fi', 1, 'sci-fi page', [1, 7], cache.epoch())
+
+    cache.invalidate_movie(1)
+
+    assert cache.get('action', 1) is None
+    assert cache.get('sci-fi', 1) is None
+    assert cache.get('action 2', 1) == 'next action page'
+    assert cache.get('home', 1) == 'home page'
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_page_cache_does_not_store_a_page_outdated_while_rendering():
+    cache = PageCache(10)
+    cache.get('action', 1)
+
+    epoch = cache.epoch()
+    cache.invalidate_movie(2)
+    cache.put('action', 1, 'action page', [1, 2, 3], epoch)
+    assert cache.get('action', 1) is None
+
+    # A new generation drops every page.
+    cache.put('action', 1, 'action page', [1, 2, 3], cache.epoch())
+    assert cache.get('action', 2) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_page_generation_of_a_shared_repository_changes_with_every_write():
+    repo = MemoryRepository()
+    generation = page_generation(repo)
+    shared_generation = page_generation(repo, shared=True)
+
+    repo.add_user(User('fmercury', 'mvNNbc1eLA$i'))
+
+    assert page_generation(repo) == generation
+    assert page_generation(repo, shared=True) != shared_generation
@@ -0,0 +1,17 @@
+from movie.utilities.prefix_index import PrefixIndex
+
+
+def test_index_completes_any_word_of_a_name():
+    index = PrefixIndex(['Chris Pratt', 'Charlize Theron', 'Christian Bale', 'Vin Diesel'])
+
+    assert index.complete('chr') == ['Chris Pratt', 'Christian Bale']
+    assert index.complete('PRA') == ['Chris Pratt']
+    assert index.complete('chris p') == ['Chris Pratt']
+    assert index.complete('c', limit=2) == ['Charlize Theron', 'Chris Pratt']
+
+
+def test_index_returns_no_completions_for_an_empty_prefix():
+    index = PrefixIndex(['Vin Diesel'])
+
+    assert index.complete('') == []
+    assert index.complete('x') == []
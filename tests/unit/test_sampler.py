@@ -0,0 +1,70 @@
+import random
+
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.model import Movie, Genre, make_genre_association
+from movie.utilities.sampler import MovieSampler
+from movie.utilities.services import get_random_movies
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_repo(ranks):
+    repo = MemoryRepository()
+    genre = Genre('Action')
+    for rank in ranks:
+        movie = Movie('Movie %d' % rank, 2016, rank)
+        make_genre_association(movie, genre)
+        repo.add_movie(movie)
+    return repo
+
+
+def test_sampler_draws_distinct_movies_from_sparse_ranks():
+    repo = make_repo([5, 17, 900])
+
+    movies = get_random_movies(3, repo, MovieSampler(rng=random.Random(1)))
+    assert sorted(movie['title'] for movie in movies) == ['Movie 17', 'Movie 5', 'Movie 900']
+    assert len(get_random_movies(10, repo)) == 3
+
+    repo.add_movie(Movie('Movie 2000', 2016, 2000))
+    sampler = MovieSampler()
+    assert sampler.ranks(repo) == (5, 17, 900, 2000)
+
+
+def test_sampler_serves_picks_from_a_pool_until_it_expires():
+    repo = make_repo(range(1, 101))
+    clock = FakeClock()
+    sampler = MovieSampler(pool_size=10, refresh_seconds=60, clock=clock)
+    loads = list()
+
+    def load(ranks):
+        loads.append(ranks)
+        return list(ranks)
+
+    first = sampler.sample(repo, 3, load)
+    for _ in range(20):
+        picks = sampler.sample(repo, 3, load)
+        assert len(set(picks)) == 3 and set(picks) <= set(loads[0])
+    assert len(loads) == 1 and len(loads[0]) == 10 and set(first) <= set(loads[0])
+
+    clock.now = 60
+    sampler.sample(repo, 3, load)
+    assert len(loads) == 2
+
+    # Draws larger than the pool go to the repository.
+    assert len(sampler.sample(repo, 20, load)) == 20
+    assert len(loads) == 3
+
+
+def test_sampler_fetches_ranks_again_when_movies_are_added():
+    repo = make_repo([1, 2])
+    sampler = MovieSampler()
+    assert sampler.ranks(repo) == (1, 2)
+
+    repo.add_movie(Movie('Movie 3', 2016, 3))
+    assert sampler.ranks(repo) == (1, 2, 3)
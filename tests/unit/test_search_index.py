@@ -0,0 +1,76 @@
+from movie.adapters import search_index
+from movie.adapters.search_index import SearchIndex, FrozenSearchIndex, GrowingSearchIndex, tokenise
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.model import Movie
+
+
+def test_tokenise_lowercases_and_drops_punctuation():
+    assert tokenise("Guardians of the Galaxy: Vol. 2") == ['guardians', 'of', 'the', 'galaxy', 'vol', '2']
+
+
+def test_index_ranks_title_matches_above_description_matches():
+    index = SearchIndex()
+    index.add(1, 'Guardians of the Galaxy', 'A group of intergalactic criminals are forced to work together.')
+    index.add(2, 'Prometheus', 'A team finds a structure on a distant moon in the galaxy.')
+    index.add(3, 'Split', 'Three girls are kidnapped by a man.')
+
+    assert index.search('galaxy') == [1, 2]
+    assert index.search('galaxy moon') == [2, 1]
+    assert index.search('galaxy', limit=1) == [1]
+    assert index.search('zombies') == []
+
+
+def test_index_replaces_and_removes_movies():
+    index = SearchIndex()
+    index.add(1, 'Sing')
+    index.add(1, 'Split')
+    index.add(2, 'Sing')
+
+    assert index.search('sing') == [2]
+
+    index.remove(2)
+    assert index.search('sing') == []
+    assert len(index) == 1
+
+
+def test_repository_indexes_movies_as_they_are_added():
+    repo = MemoryRepository()
+    movie = Movie('Prometheus', 2012, 2)
+    movie.description = 'Following clues to the origin of mankind.'
+    repo.add_movie(movie)
+
+    assert repo.search_movie_ranks('mankind origin') == [2]
+    assert repo.search_movie_ranks('galaxy') == []
+
+
+def test_frozen_index_ranks_as_the_index_it_was_built_from():
+    index = SearchIndex()
+    index.add(1, 'Guardians of the Galaxy', 'A group of intergalactic criminals are forced to work together.')
+    index.add(2, 'Prometheus', 'A team finds a structure on a distant moon in the galaxy.')
+    index.add(3, 'Split', 'Three girls are kidnapped by a man.')
+    frozen_index = FrozenSearchIndex(index.arrays())
+
+    assert len(frozen_index) == 3
+    for query in ('galaxy', 'galaxy moon', 'a man', 'zombies'):
+        assert frozen_index.search(query) == index.search(query)
+    assert frozen_index.search('galaxy', limit=1) == [1]
+
+
+def test_growing_index_ranks_as_an_index_with_the_same_movies(monkeypatch):
+    # Merge after every second movie, so that movies are found in the arrays, in the recent index and in both.
+    monkeypatch.setattr(search_index, 'MIN_MERGE', 2)
+    index = SearchIndex()
+    growing_index = GrowingSearchIndex()
+    for rank, title, description in (
+            (1, 'Guardians of the Galaxy', 'A group of intergalactic criminals are forced to work together.'),
+            (2, 'Prometheus', 'A team finds a structure on a distant moon in the galaxy.'),
+            (3, 'Split', 'Three girls are kidnapped by a man.'),
+            (1, 'Sing', 'A koala holds a singing competition.'),
+            (4, 'Galaxy Quest', '')):
+        index.add(rank, title, description)
+        growing_index.add(rank, title, description)
+        for query in ('galaxy', 'galaxy moon', 'a man', 'sing', 'zombies'):
+            assert growing_index.search(query) == index.search(query)
+
+    assert len(growing_index) == 4
+    assert FrozenSearchIndex(growing_index.arrays()).search('galaxy a') == index.search('galaxy a')